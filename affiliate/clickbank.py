@@ -1,22 +1,20 @@
 from fastapi import APIRouter, Request, HTTPException
-import hmac
-import hashlib
-import os
 
-router = APIRouter()
+from assinaturas import verificador
+from codec_json import RespostaJSONRapida, RotaJSON
 
-CLICKBANK_WEBHOOK_SECRET = os.getenv("CLICKBANK_WEBHOOK_SECRET")
+# Corpo parseado uma única vez (body + json reaproveitam o mesmo parse)
+router = APIRouter(route_class=RotaJSON, default_response_class=RespostaJSONRapida)
 
 @router.post("/webhook/clickbank")
 async def clickbank_webhook(request: Request):
-    if not CLICKBANK_WEBHOOK_SECRET:
+    if not verificador.configurado("CLICKBANK"):
         raise HTTPException(status_code=500)
     signature = request.headers.get("X-ClickBank-Signature")
     if not signature:
         raise HTTPException(status_code=401)
     body = await request.body()
-    expected = hmac.new(CLICKBANK_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
-    if not hmac.compare_digest(expected, signature):
+    if not verificador.verificar("CLICKBANK", body, signature):
         raise HTTPException(status_code=401)
     payload = await request.json()
     return {"status": "ok", "platform": "clickbank", "event": payload}
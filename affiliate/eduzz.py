@@ -1,13 +1,12 @@
 # webhook_eduzz.py
 from fastapi import APIRouter, Request
-import hmac
-import hashlib
-import os
-import json
 
-router = APIRouter()
+from assinaturas import verificador
+from codec_json import RespostaJSONRapida, RotaJSON
+from extratores import extrair_evento
 
-EDUZZ_WEBHOOK_SECRET = os.getenv("EDUZZ_WEBHOOK_SECRET", "")
+# Corpo parseado uma única vez (body + json reaproveitam o mesmo parse)
+router = APIRouter(route_class=RotaJSON, default_response_class=RespostaJSONRapida)
 
 # eventos que REALMENTE importam financeiramente
 EVENTOS_VENDA_APROVADA = {
@@ -17,24 +16,7 @@ EVENTOS_VENDA_APROVADA = {
 }
 
 def validar_assinatura(body: bytes, signature: str) -> bool:
-    if not EDUZZ_WEBHOOK_SECRET:
-        return False
-    expected = hmac.new(
-        EDUZZ_WEBHOOK_SECRET.encode(),
-        body,
-        hashlib.sha256
-    ).hexdigest()
-    return hmac.compare_digest(expected, signature)
-
-
-def identificar_evento(payload: dict) -> str:
-    # Eduzz pode enviar o tipo em locais diferentes
-    return (
-        payload.get("event")
-        or payload.get("type")
-        or payload.get("name")
-        or ""
-    )
+    return verificador.verificar("EDUZZ", body, signature)
 
 
 @router.post("/webhook/eduzz")
@@ -51,13 +33,16 @@ async def eduzz_webhook(request: Request):
         signature = request.headers.get("X-Eduzz-Signature", "")
 
         # valida assinatura (se falhar, ignora mas responde 200)
-        if signature and EDUZZ_WEBHOOK_SECRET:
+        if signature and verificador.configurado("EDUZZ"):
             if not validar_assinatura(body, signature):
                 print("[EDUZZ] [WARN] Assinatura inválida – evento ignorado")
                 return {"status": "ignored", "reason": "invalid_signature"}
 
-        payload = json.loads(body.decode("utf-8"))
-        event_type = identificar_evento(payload)
+        payload = await request.json()
+
+        # Extração declarativa compartilhada com main.py (não assume estrutura fixa)
+        venda, evento = extrair_evento("EDUZZ", payload, estrito=False)
+        event_type = evento["origem_evento"]
 
         # evento que NÃO é venda → ignora
         if event_type not in EVENTOS_VENDA_APROVADA:
@@ -70,21 +55,9 @@ async def eduzz_webhook(request: Request):
 
         print("[EDUZZ] [INFO] Venda aprovada recebida")
 
-        # EXTRACAO DEFENSIVA (não assume estrutura fixa)
-        venda = payload.get("data", payload)
-
-        valor = (
-            venda.get("value")
-            or venda.get("amount")
-            or venda.get("price")
-        )
-
-        comissao = (
-            venda.get("commission")
-            or venda.get("commission_value")
-        )
-
-        produto = venda.get("product_id") or venda.get("product", {}).get("id")
+        valor = venda["gross_value"]
+        comissao = venda["commission_total"]
+        produto = venda["product_id"]
 
         # aqui você pode integrar com Supabase / pipeline interno
         print(f"[EDUZZ] [INFO] Produto={produto} Valor={valor} Comissão={comissao}")
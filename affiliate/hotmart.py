@@ -1,15 +1,15 @@
 from fastapi import APIRouter, Request, HTTPException
-import hmac
-import hashlib
-import os
 
-router = APIRouter()
+from assinaturas import verificador
+from codec_json import RespostaJSONRapida, RotaJSON
+from extratores import extrair_evento
 
-HOTMART_WEBHOOK_SECRET = os.getenv("HOTMART_WEBHOOK_SECRET")
+# Corpo parseado uma única vez (body + json reaproveitam o mesmo parse)
+router = APIRouter(route_class=RotaJSON, default_response_class=RespostaJSONRapida)
 
 @router.post("/webhook/hotmart")
 async def hotmart_webhook(request: Request):
-    if not HOTMART_WEBHOOK_SECRET:
+    if not verificador.configurado("HOTMART"):
         raise HTTPException(status_code=500, detail="Missing HOTMART_WEBHOOK_SECRET")
 
     header = request.headers.get("X-Hotmart-Hmac-SHA256")
@@ -18,21 +18,16 @@ async def hotmart_webhook(request: Request):
 
     body = await request.body()
 
-    calculated = hmac.new(
-        HOTMART_WEBHOOK_SECRET.encode(),
-        body,
-        hashlib.sha256
-    ).hexdigest()
-
-    received = header.replace("sha256=", "")
-
-    if not hmac.compare_digest(calculated, received):
+    # Prefixo "sha256=" normalizado pelo verificador
+    if not verificador.verificar("HOTMART", body, header):
         raise HTTPException(status_code=401, detail="Invalid signature")
 
     payload = await request.json()
+    venda, _ = extrair_evento("HOTMART", payload, estrito=False)
 
     return {
         "status": "ok",
         "platform": "hotmart",
+        "sale": venda,
         "event": payload
     }
@@ -1,22 +1,22 @@
 from fastapi import APIRouter, Request, HTTPException
-import hmac
-import hashlib
-import os
 
-router = APIRouter()
+from assinaturas import verificador
+from codec_json import RespostaJSONRapida, RotaJSON
+from extratores import extrair_evento
 
-MONETIZZE_WEBHOOK_SECRET = os.getenv("MONETIZZE_WEBHOOK_SECRET")
+# Corpo parseado uma única vez (body + json reaproveitam o mesmo parse)
+router = APIRouter(route_class=RotaJSON, default_response_class=RespostaJSONRapida)
 
 @router.post("/webhook/monetizze")
 async def monetizze_webhook(request: Request):
-    if not MONETIZZE_WEBHOOK_SECRET:
+    if not verificador.configurado("MONETIZZE"):
         raise HTTPException(status_code=500)
     signature = request.headers.get("X-Monetizze-Signature")
     if not signature:
         raise HTTPException(status_code=401)
     body = await request.body()
-    expected = hmac.new(MONETIZZE_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
-    if not hmac.compare_digest(expected, signature):
+    if not verificador.verificar("MONETIZZE", body, signature):
         raise HTTPException(status_code=401)
     payload = await request.json()
-    return {"status": "ok", "platform": "monetizze", "event": payload}
+    venda, _ = extrair_evento("MONETIZZE", payload, estrito=False)
+    return {"status": "ok", "platform": "monetizze", "sale": venda, "event": payload}
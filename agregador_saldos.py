@@ -0,0 +1,252 @@
+# agregador_saldos.py — Agregador Write-Behind de Saldos de Parceiros
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# Em lançamentos, um afiliado recebe centenas de vendas por minuto e cada
+# uma virava uma chamada própria ao banco. Aqui os créditos são agrupados
+# por partner_id em memória e descarregados em UMA chamada por parceiro
+# por janela (lancar_comissoes, sql/015_ledger_creditos_lote.sql), com um
+# lançamento por venda e a referência de cada uma.
+#
+# GARANTIAS:
+# - Descarga a cada SALDOS_JANELA_MS e no encerramento do processo
+# - Falha de descarga devolve os créditos ao acumulador (nova tentativa na próxima janela)
+# - Journal local opcional (SALDOS_JOURNAL_DIR): crédito aceito sobrevive a queda
+#   do processo; recuperado e reenviado no próximo boot
+# - Crédito com referência é idempotente no ledger: reenvio não credita duas vezes
+
+import os
+import fcntl
+import threading
+from decimal import Decimal
+from typing import Any, Dict, List, Optional, Tuple
+
+from supabase import Client
+
+import codec_json
+from ledger_service import lancar_comissoes
+
+# ======================================================
+# CONFIGURAÇÕES
+# ======================================================
+
+SALDOS_JANELA_MS = int(os.getenv("SALDOS_JANELA_MS", "1000"))
+SALDOS_JOURNAL_DIR = os.getenv("SALDOS_JOURNAL_DIR", "")
+SALDOS_JOURNAL_FSYNC = os.getenv("SALDOS_JOURNAL_FSYNC", "1") == "1"
+SALDOS_MAX_SLOTS = 64
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[SALDOS] [{nivel}] {mensagem}")
+
+
+class AgregadorSaldos:
+    """
+    Arquivos por slot (um por processo, com flock), quando há journal:
+    - saldos.<slot>.wal        → créditos aceitos desde a última descarga
+    - saldos.<slot>.<n>.lote   → descarga em andamento; linhas "ok" marcam
+                                 parceiros já resolvidos (creditados ou
+                                 devolvidos ao wal)
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        janela_ms: int = SALDOS_JANELA_MS,
+        diretorio_journal: Optional[str] = SALDOS_JOURNAL_DIR or None
+    ):
+        self.supabase = supabase
+        self.janela = max(1, janela_ms) / 1000.0
+        self.diretorio = diretorio_journal
+
+        # partner_id → [(referencia, valor)]
+        self._pendentes: Dict[str, List[Tuple[Optional[str], Decimal]]] = {}
+        self._lock = threading.Lock()
+        self._lock_descarga = threading.Lock()
+        self._parar = threading.Event()
+
+        self.creditos = 0
+        self.incrementos = 0
+        self.falhas = 0
+        self.descargas = 0
+
+        self._wal = None
+        self._numero_lote = 0
+        if self.diretorio:
+            os.makedirs(self.diretorio, exist_ok=True)
+            self.slot, self._trava = self._adquirir_slot()
+            self._base = os.path.join(self.diretorio, f"saldos.{self.slot}")
+            self._recuperar()
+
+        self._thread = threading.Thread(target=self._loop, name="agregador-saldos", daemon=True)
+        self._thread.start()
+
+    # --------------------------------------------------
+    # JOURNAL
+    # --------------------------------------------------
+
+    def _adquirir_slot(self):
+        for slot in range(SALDOS_MAX_SLOTS):
+            trava = open(os.path.join(self.diretorio, f"saldos.{slot}.lock"), "w")
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot, trava
+            except OSError:
+                trava.close()
+        raise RuntimeError("Nenhum slot de journal de saldos disponível")
+
+    def _abrir_wal(self):
+        self._wal = open(self._base + ".wal", "a", encoding="utf-8")
+
+    def _registrar(self, arquivo, registro: Dict[str, Any]):
+        arquivo.write(codec_json.dumps_str(registro) + "\n")
+        arquivo.flush()
+        if SALDOS_JOURNAL_FSYNC:
+            os.fsync(arquivo.fileno())
+
+    @staticmethod
+    def _linha(partner_id: str, referencia: Optional[str], valor: Decimal) -> Dict[str, Any]:
+        return {"partner_id": partner_id, "referencia": referencia, "valor": str(valor)}
+
+    def _ler(self, caminho: str) -> Dict[str, List[Tuple[Optional[str], Decimal]]]:
+        creditos: Dict[str, List[Tuple[Optional[str], Decimal]]] = {}
+        creditados = set()
+        with open(caminho, "r", encoding="utf-8") as f:
+            for linha in f:
+                try:
+                    registro = codec_json.loads(linha)
+                except ValueError:
+                    # Última linha truncada por queda antes do fsync
+                    continue
+                if "ok" in registro:
+                    creditados.add(registro["ok"])
+                else:
+                    creditos.setdefault(registro["partner_id"], []).append(
+                        (registro.get("referencia"), Decimal(registro["valor"]))
+                    )
+        return {p: itens for p, itens in creditos.items() if p not in creditados}
+
+    def _recuperar(self):
+        antigos = sorted(
+            os.path.join(self.diretorio, nome)
+            for nome in os.listdir(self.diretorio)
+            if nome.startswith(f"saldos.{self.slot}.") and nome.endswith((".lote", ".wal"))
+        )
+        for caminho in antigos:
+            for partner_id, itens in self._ler(caminho).items():
+                self._pendentes.setdefault(partner_id, []).extend(itens)
+
+        # Estado recuperado vira o novo wal ANTES de apagar os arquivos antigos
+        tmp = self._base + ".wal.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            for partner_id, itens in self._pendentes.items():
+                for referencia, valor in itens:
+                    f.write(codec_json.dumps_str(self._linha(partner_id, referencia, valor)) + "\n")
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp, self._base + ".wal")
+        for caminho in antigos:
+            if caminho != self._base + ".wal":
+                os.remove(caminho)
+        self._abrir_wal()
+
+        if self._pendentes:
+            log("WARN", f"Slot {self.slot}: {len(self._pendentes)} saldos pendentes recuperados do journal")
+
+    # --------------------------------------------------
+    # ACUMULAÇÃO (CAMINHO DA VENDA)
+    # --------------------------------------------------
+
+    def adicionar(self, partner_id: str, valor, referencia: Optional[str] = None) -> None:
+        """referencia (ex: chave da venda) torna o crédito idempotente no ledger."""
+        delta = valor if isinstance(valor, Decimal) else Decimal(str(valor))
+        with self._lock:
+            if self._wal is not None:
+                self._registrar(self._wal, self._linha(partner_id, referencia, delta))
+            self._pendentes.setdefault(partner_id, []).append((referencia, delta))
+            self.creditos += 1
+
+    # --------------------------------------------------
+    # DESCARGA
+    # --------------------------------------------------
+
+    def _loop(self):
+        while not self._parar.wait(self.janela):
+            self.descarregar()
+
+    def descarregar(self) -> int:
+        """Uma chamada por parceiro pendente. Retorna quantos parceiros foram creditados."""
+        with self._lock_descarga:
+            with self._lock:
+                if not self._pendentes:
+                    return 0
+                lote, self._pendentes = self._pendentes, {}
+                lote_journal = None
+                if self._wal is not None:
+                    # wal atual vira o lote desta descarga; créditos novos vão para um wal novo
+                    self._wal.close()
+                    self._numero_lote += 1
+                    caminho_lote = f"{self._base}.{self._numero_lote:012d}.lote"
+                    os.replace(self._base + ".wal", caminho_lote)
+                    self._abrir_wal()
+                    lote_journal = open(caminho_lote, "a", encoding="utf-8")
+
+            creditados = 0
+            for partner_id, itens in lote.items():
+                try:
+                    lancar_comissoes(self.supabase, partner_id=partner_id, itens=itens)
+                except Exception as e:
+                    self.falhas += 1
+                    log("WARN", f"Falha ao creditar {partner_id} ({len(itens)} créditos); nova tentativa na próxima janela: {e}")
+                    with self._lock:
+                        if self._wal is not None:
+                            for referencia, valor in itens:
+                                self._registrar(self._wal, self._linha(partner_id, referencia, valor))
+                        self._pendentes.setdefault(partner_id, []).extend(itens)
+                    if lote_journal is not None:
+                        # Delta já transferido para o wal novo: o lote não responde mais por ele
+                        self._registrar(lote_journal, {"ok": partner_id})
+                    continue
+
+                creditados += 1
+                if lote_journal is not None:
+                    self._registrar(lote_journal, {"ok": partner_id})
+
+            if lote_journal is not None:
+                lote_journal.close()
+                os.remove(lote_journal.name)
+
+            self.incrementos += creditados
+            self.descargas += 1
+            return creditados
+
+    # --------------------------------------------------
+    # CICLO DE VIDA / MÉTRICAS
+    # --------------------------------------------------
+
+    def encerrar(self):
+        """Para a thread e descarrega o que estiver pendente."""
+        self._parar.set()
+        self._thread.join(timeout=self.janela + 5)
+        self.descarregar()
+        with self._lock:
+            if self._wal is not None:
+                self._wal.close()
+                self._wal = None
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock:
+            parceiros = len(self._pendentes)
+            valor = sum((v for itens in self._pendentes.values() for _, v in itens), Decimal("0"))
+        return {
+            "janela_ms": int(self.janela * 1000),
+            "journal": bool(self.diretorio),
+            "parceiros_pendentes": parceiros,
+            "valor_pendente": float(valor),
+            "creditos": self.creditos,
+            "incrementos": self.incrementos,
+            "creditos_por_incremento": round(self.creditos / self.incrementos, 2) if self.incrementos else 0.0,
+            "falhas": self.falhas,
+            "descargas": self.descargas,
+        }
@@ -0,0 +1,163 @@
+# assinaturas.py — Verificador Único de Assinaturas de Webhook
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# - Estado HMAC-SHA256 pré-computado por segredo (chave já processada);
+#   por requisição apenas copy() + update() — sem hmac.new() a cada webhook
+# - Rotação: segredo ATUAL + segredo ANTERIOR aceitos ao mesmo tempo
+# - Cabeçalhos normalizados: "sha256=<hex>", hex maiúsculo/minúsculo ou base64
+# - Métricas por plataforma: latência de verificação e contagem de falhas
+#
+# CONFIGURAÇÃO (por plataforma):
+#   <PLATAFORMA>_WEBHOOK_SECRET            → segredo atual
+#   <PLATAFORMA>_WEBHOOK_SECRET_ANTERIOR   → segredo anterior (durante a rotação)
+
+import os
+import hmac
+import time
+import base64
+import hashlib
+import binascii
+import threading
+from typing import Dict, Any, List, Optional
+
+PLATAFORMAS_WEBHOOK = ("HOTMART", "EDUZZ", "MONETIZZE", "CLICKBANK")
+
+_TAMANHO_DIGEST = hashlib.sha256().digest_size
+
+
+def normalizar_assinatura(assinatura: Optional[str]) -> Optional[bytes]:
+    """
+    Converte o cabeçalho recebido no digest bruto (32 bytes).
+    Retorna None para formato irreconhecível.
+    """
+    if not assinatura:
+        return None
+
+    valor = assinatura.strip()
+    if valor[:7].lower() == "sha256=":
+        valor = valor[7:]
+
+    if len(valor) == _TAMANHO_DIGEST * 2:
+        try:
+            return bytes.fromhex(valor)
+        except ValueError:
+            return None
+
+    try:
+        digest = base64.b64decode(valor, validate=True)
+    except (binascii.Error, ValueError):
+        return None
+    return digest if len(digest) == _TAMANHO_DIGEST else None
+
+
+class MetricasPlataforma:
+
+    def __init__(self):
+        self.validas = 0
+        self.validas_segredo_anterior = 0
+        self.invalidas = 0
+        self.sem_assinatura = 0
+        self.latencia_total_ns = 0
+        self.latencia_max_ns = 0
+
+    def registrar(self, resultado: str, latencia_ns: int):
+        if resultado == "ATUAL":
+            self.validas += 1
+        elif resultado == "ANTERIOR":
+            self.validas += 1
+            self.validas_segredo_anterior += 1
+        elif resultado == "SEM_ASSINATURA":
+            self.sem_assinatura += 1
+        else:
+            self.invalidas += 1
+
+        self.latencia_total_ns += latencia_ns
+        if latencia_ns > self.latencia_max_ns:
+            self.latencia_max_ns = latencia_ns
+
+    def resumo(self) -> Dict[str, Any]:
+        total = self.validas + self.invalidas + self.sem_assinatura
+        return {
+            "validas": self.validas,
+            "validas_segredo_anterior": self.validas_segredo_anterior,
+            "invalidas": self.invalidas,
+            "sem_assinatura": self.sem_assinatura,
+            "latencia_media_us": round(self.latencia_total_ns / total / 1000, 2) if total else 0.0,
+            "latencia_max_us": round(self.latencia_max_ns / 1000, 2),
+        }
+
+
+class VerificadorAssinaturas:
+
+    def __init__(self):
+        self._estados: Dict[str, List[Any]] = {}
+        self._metricas: Dict[str, MetricasPlataforma] = {}
+        self._lock = threading.Lock()
+
+    def registrar(self, plataforma: str, segredo_atual: str, segredo_anterior: Optional[str] = None):
+        """
+        Pré-computa os estados HMAC (ordem: atual, anterior).
+        Chamar de novo com os segredos novos conclui uma rotação.
+        """
+        estados = [
+            hmac.new(segredo.encode(), digestmod=hashlib.sha256)
+            for segredo in (segredo_atual, segredo_anterior)
+            if segredo
+        ]
+        with self._lock:
+            self._estados[plataforma] = estados
+            self._metricas.setdefault(plataforma, MetricasPlataforma())
+
+    @classmethod
+    def do_ambiente(cls, plataformas=PLATAFORMAS_WEBHOOK) -> "VerificadorAssinaturas":
+        verificador = cls()
+        for plataforma in plataformas:
+            verificador.registrar(
+                plataforma,
+                os.getenv(f"{plataforma}_WEBHOOK_SECRET", ""),
+                os.getenv(f"{plataforma}_WEBHOOK_SECRET_ANTERIOR", "")
+            )
+        return verificador
+
+    def configurado(self, plataforma: str) -> bool:
+        return bool(self._estados.get(plataforma))
+
+    def verificar(self, plataforma: str, corpo: bytes, assinatura: Optional[str]) -> bool:
+        inicio = time.perf_counter_ns()
+        resultado = self._comparar(plataforma, corpo, assinatura)
+        latencia = time.perf_counter_ns() - inicio
+
+        with self._lock:
+            metricas = self._metricas.setdefault(plataforma, MetricasPlataforma())
+            metricas.registrar(resultado, latencia)
+
+        return resultado in ("ATUAL", "ANTERIOR")
+
+    def _comparar(self, plataforma: str, corpo: bytes, assinatura: Optional[str]) -> str:
+        recebido = normalizar_assinatura(assinatura)
+        if recebido is None:
+            return "SEM_ASSINATURA" if not assinatura else "INVALIDA"
+
+        estados = self._estados.get(plataforma) or []
+        for i, estado in enumerate(estados):
+            calculado = estado.copy()
+            calculado.update(corpo)
+            if hmac.compare_digest(calculado.digest(), recebido):
+                return "ATUAL" if i == 0 else "ANTERIOR"
+
+        return "INVALIDA"
+
+    def metricas(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                plataforma: {
+                    "segredos_ativos": len(self._estados.get(plataforma) or []),
+                    **m.resumo()
+                }
+                for plataforma, m in self._metricas.items()
+            }
+
+
+# Instância compartilhada por main.py e affiliate/ (mesmo processo)
+verificador = VerificadorAssinaturas.do_ambiente()
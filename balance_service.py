@@ -1,28 +1,34 @@
 # balance_service.py
 from supabase import Client
 from decimal import Decimal
-from datetime import datetime
+from typing import Optional
 
+from ledger_service import lancar_comissao
 
-def garantir_balance(supabase: Client, partner_id: str):
-    res = (
-        supabase
-        .table("partner_balances")
-        .select("*")
-        .eq("partner_id", partner_id)
-        .single()
-        .execute()
-    )
-
-    if res.data:
-        return res.data
 
-    return (
-        supabase
-        .table("partner_balances")
-        .insert({"partner_id": partner_id})
-        .execute()
-        .data[0]
+def incrementar_saldo_parceiro(
+    supabase: Client,
+    *,
+    partner_id: str,
+    valor: Decimal,
+    referencia: Optional[str] = None
+) -> Optional[int]:
+    """
+    Crédito via ledger (sql/007_ledger_parceiros.sql): um INSERT em
+    partner_ledger, sem travar partner_balances. O saldo aparece em
+    saldo_parceiro na hora e em partner_balances após a compactação.
+    Com referencia (ex: chave da venda), retry não credita duas vezes.
+
+    Retorna o id do lançamento (None = referencia já lançada), não mais a
+    linha de partner_balances com os saldos novos (contrato de sql/002):
+    devolver o saldo exigiria travar ou somar a cauda a cada venda. Quem
+    precisa do saldo lê ledger_service.saldo_parceiro.
+    """
+    return lancar_comissao(
+        supabase,
+        partner_id=partner_id,
+        valor=valor,
+        referencia=referencia
     )
 
 
@@ -30,21 +36,7 @@ def adicionar_comissao(
     supabase: Client,
     *,
     partner_id: str,
-    valor: Decimal
-):
-    balance = garantir_balance(supabase, partner_id)
-
-    novo_total = Decimal(balance["total_generated"]) + valor
-    novo_disponivel = Decimal(balance["available_balance"]) + valor
-
-    return (
-        supabase
-        .table("partner_balances")
-        .update({
-            "total_generated": float(novo_total),
-            "available_balance": float(novo_disponivel),
-            "updated_at": datetime.utcnow().isoformat()
-        })
-        .eq("partner_id", partner_id)
-        .execute()
-    )
+    valor: Decimal,
+    referencia: Optional[str] = None
+) -> Optional[int]:
+    return incrementar_saldo_parceiro(supabase, partner_id=partner_id, valor=valor, referencia=referencia)
@@ -0,0 +1,69 @@
+# bench_codec.py — Codec JSON: orjson x biblioteca padrão
+# Uso: python -m benchmarks.bench_codec [iteracoes]
+#
+# Mede o parse de um corpo de webhook (bytes brutos) e a serialização de
+# uma listagem grande (formato de /b2/produtos e /financeiro/auditoria).
+
+import sys
+import argparse
+import json
+import timeit
+
+import codec_json
+from benchmarks.bench_extratores import PAYLOADS
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+CORPO_WEBHOOK = json.dumps(PAYLOADS["HOTMART"]).encode()
+
+LISTA_GRANDE = [
+    {
+        "id": i,
+        "nome": f"Produto {i} — edição única",
+        "plataforma": "HOTMART",
+        "preco": 197.0 + i,
+        "comissao": 98.5,
+        "nicho": "produtividade",
+        "dor": "falta de foco",
+        "image_url": f"https://cdn.roboglobal.com.br/img/{i}.png",
+        "gul": f"https://roboglobal.com.br/go/{i:012x}",
+        "status": "ativo",
+    }
+    for i in range(1000)
+]
+
+
+def medir(funcao, iteracoes: int) -> float:
+    """Melhor de 5 rodadas, em microssegundos por chamada."""
+    return min(timeit.repeat(funcao, number=iteracoes, repeat=5)) / iteracoes * 1e6
+
+
+def stdlib_dumps(obj):
+    return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Custo de parse/serialização JSON (stdlib x codec_json)")
+    parser.add_argument("iteracoes", nargs="?", type=int, default=2000, help="Chamadas por rodada (padrão: %(default)s)")
+    iteracoes = parser.parse_args(argv).iteracoes
+
+    casos = [
+        ("parse webhook", lambda: json.loads(CORPO_WEBHOOK.decode()), lambda: codec_json.loads(CORPO_WEBHOOK), 50),
+        ("lista 1000 linhas", lambda: stdlib_dumps(LISTA_GRANDE), lambda: codec_json.dumps(LISTA_GRANDE), 1),
+    ]
+
+    print(f"motor ativo: {codec_json.MOTOR}" + ("" if orjson else " (orjson não instalado — fallback)"))
+    print(f"{'caso':<20}{'stdlib µs':>12}{codec_json.MOTOR + ' µs':>14}{'ganho':>10}")
+    for nome, padrao, codec, fator in casos:
+        us_padrao = medir(padrao, iteracoes * fator)
+        us_codec = medir(codec, iteracoes * fator)
+        print(f"{nome:<20}{us_padrao:>12.2f}{us_codec:>14.2f}{us_padrao / us_codec:>9.2f}x")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,133 @@
+# bench_extratores.py — Custo por evento da extração de payload
+# Uso: python -m benchmarks.bench_extratores [iteracoes]
+#
+# Compara a extração LEGADA (indexação manual no handler + normalizar_evento_*
+# com cadeias de .get()) contra os extratores declarativos de extratores.py.
+
+import sys
+import argparse
+import timeit
+
+from extratores import extrair_evento
+
+PAYLOADS = {
+    "HOTMART": {
+        "event": "PURCHASE_APPROVED",
+        "data": {
+            "product": {"id": 123456, "name": "Curso"},
+            "purchase": {
+                "transaction": "HP17000000001",
+                "price": {"value": 197.0, "currency": "BRL"},
+                "commission": {"value": 98.5},
+            },
+            "affiliate": {"affiliate_code": "AFF-001"},
+        },
+    },
+    "EDUZZ": {
+        "event_type": "myeduzz.invoice_paid",
+        "sale": {"id": 991, "value": 97.0, "commission": 48.5, "currency": "BRL"},
+        "product": {"id": 555},
+        "affiliate": {"id": "AFF-002"},
+    },
+    "MONETIZZE": {
+        "tipo": "venda_aprovada",
+        "venda": {"codigo": 7001, "valor": 147.0, "comissao": 70.0},
+        "produto": {"codigo": 321},
+        "afiliado": {"codigo": "AFF-003"},
+        "moeda": "BRL",
+    },
+}
+
+
+# ======================================================
+# REFERÊNCIA LEGADA (cópia fiel do caminho antigo de main.py)
+# ======================================================
+
+def legado_hotmart(payload):
+    venda = dict(
+        platform="HOTMART",
+        external_sale_id=payload["data"]["purchase"]["transaction"],
+        product_id=str(payload["data"]["product"]["id"]),
+        gross_value=float(payload["data"]["purchase"]["price"]["value"]),
+        commission_total=float(payload["data"]["purchase"]["commission"]["value"]),
+        partner_id=payload.get("data", {}).get("affiliate", {}).get("affiliate_code"),
+    )
+    evento = dict(
+        plataforma="HOTMART",
+        oferta=str(payload.get("data", {}).get("product", {}).get("id")),
+        valor_bruto=float(payload.get("data", {}).get("purchase", {}).get("price", {}).get("value", 0)),
+        moeda=payload.get("data", {}).get("purchase", {}).get("price", {}).get("currency", "BRL"),
+        status="APROVADO",
+        origem_evento=payload.get("event", "HOTMART"),
+    )
+    return venda, evento
+
+
+def legado_eduzz(payload):
+    venda = dict(
+        platform="EDUZZ",
+        external_sale_id=str(payload["sale"]["id"]),
+        product_id=str(payload["product"]["id"]),
+        gross_value=float(payload["sale"]["value"]),
+        commission_total=float(payload["sale"]["commission"]),
+        partner_id=payload.get("affiliate", {}).get("id"),
+    )
+    evento = dict(
+        plataforma="EDUZZ",
+        oferta=str(payload.get("product", {}).get("id")),
+        valor_bruto=float(payload.get("sale", {}).get("value", 0)),
+        moeda=payload.get("sale", {}).get("currency", "BRL"),
+        status="APROVADO",
+        origem_evento=payload.get("event_type", "EDUZZ"),
+    )
+    return venda, evento
+
+
+def legado_monetizze(payload):
+    venda = dict(
+        platform="MONETIZZE",
+        external_sale_id=str(payload["venda"]["codigo"]),
+        product_id=str(payload["produto"]["codigo"]),
+        gross_value=float(payload["venda"]["valor"]),
+        commission_total=float(payload["venda"]["comissao"]),
+        partner_id=payload.get("afiliado", {}).get("codigo"),
+    )
+    evento = dict(
+        plataforma="MONETIZZE",
+        oferta=str(payload.get("produto", {}).get("codigo")),
+        valor_bruto=float(payload.get("venda", {}).get("valor", 0)),
+        moeda=payload.get("moeda", "BRL"),
+        status="APROVADO",
+        origem_evento=payload.get("tipo", "MONETIZZE"),
+    )
+    return venda, evento
+
+
+LEGADO = {"HOTMART": legado_hotmart, "EDUZZ": legado_eduzz, "MONETIZZE": legado_monetizze}
+
+
+def medir(funcao, iteracoes: int) -> float:
+    """Melhor de 5 rodadas, em nanossegundos por evento."""
+    return min(timeit.repeat(funcao, number=iteracoes, repeat=5)) / iteracoes * 1e9
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Custo por evento da extração de payload (legado x extratores.py)")
+    parser.add_argument("iteracoes", nargs="?", type=int, default=200_000, help="Chamadas por rodada (padrão: %(default)s)")
+    iteracoes = parser.parse_args(argv).iteracoes
+
+    print(f"{'plataforma':<12}{'legado ns/evt':>16}{'compilado ns/evt':>20}{'ganho':>10}")
+    for plataforma, payload in PAYLOADS.items():
+        legado = LEGADO[plataforma]
+        ns_legado = medir(lambda: legado(payload), iteracoes)
+        ns_compilado = medir(lambda: extrair_evento(plataforma, payload), iteracoes)
+        print(
+            f"{plataforma:<12}{ns_legado:>16.0f}{ns_compilado:>20.0f}"
+            f"{ns_legado / ns_compilado:>9.2f}x"
+        )
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,89 @@
+# bench_gul.py — Latência de resolução do /go/{gul_id} por tamanho de catálogo
+# Uso: python -m benchmarks.bench_gul [--produtos 1000,10000,100000] [--cliques 2000] [--latencia-ms 0]
+#
+# Para cada tamanho de catálogo, semeia produtos no Supabase local e resolve
+# gul_ids sorteados de duas formas:
+#   like   → consulta antiga: gul LIKE '%<id>' (varre produtos a cada clique)
+#   indice → IndiceGul em memória (indices_redirect.py), sem ida ao banco
+# A latência do índice deve ficar plana enquanto a do LIKE cresce com o catálogo.
+
+import sys
+import time
+import random
+import argparse
+
+from supabase import create_client
+
+from indices_redirect import IndiceGul
+from benchmarks.carga import percentil
+from benchmarks.supabase_local import SupabaseLocal
+
+
+def semear_produtos(banco, inicio: int, fim: int):
+    banco.inserir("produtos", [
+        {
+            "nome": f"Produto {i}",
+            "link_afiliado": f"https://pay.exemplo.com/p/{i}",
+            "plataforma": "HOTMART",
+            "gul": f"/go/{i:08x}",
+        }
+        for i in range(inicio, fim)
+    ])
+
+
+def medir(resolver, gul_ids) -> dict:
+    tempos = []
+    for gul_id in gul_ids:
+        inicio = time.perf_counter()
+        produto = resolver(gul_id)
+        tempos.append((time.perf_counter() - inicio) * 1000)
+        if produto is None or not produto["gul"].endswith(gul_id):
+            raise SystemExit(f"[BENCH] gul_id {gul_id} resolvido errado: {produto}")
+    tempos.sort()
+    return {"p50": percentil(tempos, 50), "p99": percentil(tempos, 99), "max": tempos[-1]}
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--produtos", default="1000,10000,100000")
+    parser.add_argument("--cliques", type=int, default=2000)
+    parser.add_argument("--cliques-like", type=int, default=200)
+    parser.add_argument("--latencia-ms", type=float, default=0.0)
+    args = parser.parse_args(argv)
+
+    local = SupabaseLocal(latencia_ms=args.latencia_ms).iniciar()
+    sb = create_client(local.url, "local")
+    aleatorio = random.Random(7)
+
+    def like(gul_id):
+        linhas = sb.table("produtos").select("nome,link_afiliado,plataforma,gul") \
+            .like("gul", f"%{gul_id}").limit(1).execute().data
+        return linhas[0] if linhas else None
+
+    semeados = 0
+    print(f"[BENCH] latência {args.latencia_ms}ms | por clique: p50 / p99 / máx (like em ms, índice em µs)")
+    for total in [int(t) for t in args.produtos.split(",")]:
+        semear_produtos(local.banco, semeados, total)
+        semeados = total
+
+        indice = IndiceGul(sb, intervalo_s=3600, carregar=False)
+        inicio = time.perf_counter()
+        indice.carregar()
+        carga_s = time.perf_counter() - inicio
+
+        amostra = [f"{aleatorio.randrange(total):08x}" for _ in range(args.cliques)]
+        r_indice = medir(indice.produto, amostra)
+        r_like = medir(like, amostra[:args.cliques_like])
+        indice.encerrar()
+
+        print(f"[BENCH] {total:>7} produtos | "
+              f"like {r_like['p50']:.3f} / {r_like['p99']:.3f} / {r_like['max']:.3f} | "
+              f"indice {r_indice['p50'] * 1000:.2f}µs / {r_indice['p99'] * 1000:.2f}µs / {r_indice['max'] * 1000:.2f}µs | "
+              f"carga do índice {carga_s:.2f}s")
+
+    local.parar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
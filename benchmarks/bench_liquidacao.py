@@ -0,0 +1,80 @@
+# bench_liquidacao.py — Vazão da liquidação em massa de payouts
+# Uso: python -m benchmarks.bench_liquidacao [--payouts 10000] [--lotes 100,1000,5000] [--latencia-ms 20]
+#
+# Supabase local com latência injetada; cada rodada semeia payouts pendentes
+# novos e liquida todos. Compara com o caminho de um payout por chamada
+# (marcar_payout_como_pago) em uma amostra.
+
+import sys
+import time
+import uuid
+import argparse
+
+from supabase import create_client
+
+from payout_service import liquidar_payouts, marcar_payout_como_pago
+from benchmarks.supabase_local import SupabaseLocal
+
+
+def semear_saldos(banco, parceiros: int):
+    saldos = [
+        {"id": str(uuid.uuid4()), "partner_id": f"BENCH-{i}", "available_balance": 10_000_000}
+        for i in range(parceiros)
+    ]
+    return banco.inserir("partner_balances", saldos)
+
+
+def semear_payouts(banco, saldos, payouts: int):
+    parceiros = len(saldos)
+    linhas = [
+        {
+            "id": str(uuid.uuid4()),
+            "partner_id": saldos[i % parceiros]["partner_id"],
+            "balance_id": saldos[i % parceiros]["id"],
+            "amount": 150.0,
+            "payout_status": "pending",
+        }
+        for i in range(payouts)
+    ]
+    banco.inserir("payouts", linhas)
+    return [{"payout_id": l["id"], "provider_reference": f"REF-{l['id'][:8]}"} for l in linhas]
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--payouts", type=int, default=10000)
+    parser.add_argument("--parceiros", type=int, default=2000)
+    parser.add_argument("--lotes", default="100,1000,5000")
+    parser.add_argument("--amostra-individual", type=int, default=200)
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    local = SupabaseLocal(latencia_ms=args.latencia_ms).iniciar()
+    sb = create_client(local.url, "local")
+    saldos = semear_saldos(local.banco, args.parceiros)
+    print(f"[BENCH] {args.payouts} payouts | {args.parceiros} parceiros | latência {args.latencia_ms}ms")
+
+    for tamanho in [int(t) for t in args.lotes.split(",")]:
+        itens = semear_payouts(local.banco, saldos, args.payouts)
+        local.banco.zerar_contadores()
+        resumo = liquidar_payouts(sb, itens, tamanho_lote=tamanho)
+        print(
+            f"  lote {tamanho:>6}: {resumo['payouts_por_segundo']:>10} payouts/s | "
+            f"{resumo['segundos']}s | {sum(local.banco.contadores().values())} chamadas | "
+            f"pagos {resumo['pagos']}"
+        )
+
+    if args.amostra_individual:
+        itens = semear_payouts(local.banco, saldos, args.amostra_individual)
+        inicio = time.perf_counter()
+        for item in itens:
+            marcar_payout_como_pago(sb, **item)
+        segundos = time.perf_counter() - inicio
+        print(f"  individual : {len(itens) / segundos:>10.1f} payouts/s (amostra de {len(itens)})")
+
+    local.parar()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
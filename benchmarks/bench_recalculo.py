@@ -0,0 +1,108 @@
+# bench_recalculo.py — Vazão do recálculo retroativo de comissões
+# Uso: python -m benchmarks.bench_recalculo [--vendas 1000000] [--pagina 5000] [--latencia-ms 20]
+#
+# Supabase local com latência injetada; semeia vendas com split de 60%,
+# recalcula para --percentual e confere que a soma dos saldos dos parceiros
+# (ledger compactado) acompanhou exatamente a soma de partner_commission. Depois interrompe
+# um segundo recálculo no meio e retoma pelo checkpoint.
+
+import os
+import sys
+import random
+import argparse
+import tempfile
+from decimal import Decimal, ROUND_HALF_UP
+
+from supabase import create_client
+
+from ledger_service import compactar_tudo
+from recalculo_comissoes import CENTAVO, RecalculoComissoes
+from benchmarks.supabase_local import SupabaseLocal
+
+
+def semear_vendas(banco, vendas: int, parceiros: int, semente: int = 7):
+    aleatorio = random.Random(semente)
+    linhas = []
+    saldos = {}
+    for i in range(vendas):
+        total = Decimal(aleatorio.randint(1000, 99999)) * CENTAVO
+        parceiro_commission = (total * Decimal("0.60")).quantize(CENTAVO, ROUND_HALF_UP)
+        parceiro = f"BENCH-{i % parceiros}" if i % 10 else None
+        linhas.append({
+            "id": i + 1,
+            "platform": "HOTMART",
+            "external_sale_id": f"RECALC-{i}",
+            "partner_id": parceiro,
+            "commission_value": total,
+            "partner_commission": parceiro_commission,
+            "master_commission": total - parceiro_commission,
+        })
+        if parceiro:
+            saldos[parceiro] = saldos.get(parceiro, Decimal("0")) + parceiro_commission
+    banco.inserir("sales", linhas)
+    banco.inserir("partner_balances", [
+        {"partner_id": p, "total_generated": v, "available_balance": v} for p, v in saldos.items()
+    ])
+
+
+def conferir(banco) -> bool:
+    comissoes = sum(
+        (Decimal(str(v["partner_commission"])) for v in banco.tabelas["sales"] if v["partner_id"]),
+        Decimal("0")
+    )
+    saldos = sum((Decimal(str(s["available_balance"])) for s in banco.tabelas["partner_balances"]), Decimal("0"))
+    print(f"[BENCH] Σ partner_commission {comissoes} | Σ available_balance {saldos}")
+    return comissoes == saldos
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--vendas", type=int, default=200000)
+    parser.add_argument("--parceiros", type=int, default=5000)
+    parser.add_argument("--pagina", type=int, default=5000)
+    parser.add_argument("--percentual", default="0.65")
+    parser.add_argument("--latencia-ms", type=float, default=20.0)
+    args = parser.parse_args(argv)
+
+    local = SupabaseLocal(latencia_ms=args.latencia_ms).iniciar()
+    sb = create_client(local.url, "local")
+    semear_vendas(local.banco, args.vendas, args.parceiros)
+    print(f"[BENCH] {args.vendas} vendas | {args.parceiros} parceiros | latência {args.latencia_ms}ms")
+
+    ok = True
+    for percentual, dry_run in ((args.percentual, True), (args.percentual, False), (args.percentual, False)):
+        local.banco.zerar_contadores()
+        resumo = RecalculoComissoes(
+            sb, percentual=Decimal(percentual), tamanho_pagina=args.pagina, dry_run=dry_run
+        ).executar()
+        print(f"[BENCH] dry_run={dry_run} | {resumo['lidas']} lidas | {resumo['alteradas']} alteradas | "
+              f"{resumo['atualizadas']} gravadas | ajuste {resumo['ajuste_total']} | "
+              f"{resumo['segundos']}s | {resumo['vendas_por_segundo']} vendas/s | "
+              f"{sum(local.banco.contadores().values())} idas")
+    compactar_tudo(sb)
+    ok &= conferir(local.banco)
+
+    # Interrompe após metade das páginas e retoma pelo checkpoint
+    checkpoint = os.path.join(tempfile.mkdtemp(prefix="recalculo_"), "recalculo.ckpt")
+    metade = max(1, args.vendas // args.pagina // 2)
+    parcial = RecalculoComissoes(sb, percentual=Decimal("0.55"), tamanho_pagina=args.pagina, checkpoint=checkpoint)
+    for n, pagina in enumerate(parcial.paginas(None), 1):
+        alteradas = parcial.recalcular(pagina)
+        parcial._aplicar(alteradas)
+        parcial.checkpoint.gravar(pagina[-1]["id"], {"paginas": n})
+        if n == metade:
+            break
+    resumo = RecalculoComissoes(
+        sb, percentual=Decimal("0.55"), tamanho_pagina=args.pagina, checkpoint=checkpoint
+    ).executar()
+    print(f"[BENCH] Retomada: {resumo['lidas']} lidas | {resumo['atualizadas']} gravadas nesta execução")
+    compactar_tudo(sb)
+    ok &= conferir(local.banco)
+
+    local.parar()
+    print("[BENCH] OK" if ok else "[BENCH] FALHA: saldos divergentes")
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,268 @@
+# carga.py — Teste de Carga Ponta a Ponta (webhooks + redirects)
+# ROBO GLOBAL AI
+#
+# Sobe o Supabase local (benchmarks/supabase_local.py), sobe o main:app no
+# uvicorn com N workers apontando para ele e dispara tráfego assinado.
+# Relatório por rota e por número de workers:
+#   throughput, p50 / p90 / p99 / máx e idas ao Supabase por requisição.
+#
+# Uso:
+#   python -m benchmarks.carga --workers 1,2,4 --duracao 10 --concorrencia 64
+#   python -m benchmarks.carga --rotas hotmart,go --latencia-ms 30 --env WEBHOOK_MODO_FILA=1
+#   python -m benchmarks.carga --saida resultado.json
+
+import os
+import sys
+import time
+import socket
+import asyncio
+import argparse
+import tempfile
+import subprocess
+from typing import Any, Callable, Dict, List
+
+import httpx
+
+import codec_json
+from benchmarks.supabase_local import SupabaseLocal
+from benchmarks.gerador_trafego import (
+    ROTAS_WEBHOOK,
+    GeradorWebhooks,
+    GeradorRedirects,
+    semear_redirects,
+    semear_parceiros,
+)
+
+ROTAS = ("hotmart", "eduzz", "monetizze", "go", "go_gul", "recomendar")
+
+SEGREDO_CARGA = "segredo-carga"
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[CARGA] [{nivel}] {mensagem}", flush=True)
+
+
+def percentil(ordenados: List[float], p: float) -> float:
+    if not ordenados:
+        return 0.0
+    indice = min(len(ordenados) - 1, max(0, int(round(p / 100.0 * len(ordenados) + 0.5)) - 1))
+    return ordenados[indice]
+
+
+def porta_livre() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+# ======================================================
+# SERVIDOR SOB TESTE
+# ======================================================
+
+def subir_api(workers: int, porta: int, ambiente: Dict[str, str], log_servidor) -> subprocess.Popen:
+    processo = subprocess.Popen(
+        [
+            sys.executable, "-m", "uvicorn", "main:app",
+            "--host", "127.0.0.1",
+            "--port", str(porta),
+            "--workers", str(workers),
+            "--log-level", "warning",
+            "--no-access-log",
+        ],
+        env={**os.environ, **ambiente},
+        cwd=RAIZ,
+        stdout=log_servidor,
+        stderr=subprocess.STDOUT,
+    )
+
+    limite = time.monotonic() + 60
+    while time.monotonic() < limite:
+        if processo.poll() is not None:
+            raise RuntimeError(f"uvicorn encerrou na subida (código {processo.returncode})")
+        try:
+            if httpx.get(f"http://127.0.0.1:{porta}/health", timeout=1).status_code == 200:
+                return processo
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.2)
+
+    processo.terminate()
+    raise RuntimeError("uvicorn não respondeu /health em 60s")
+
+
+def derrubar_api(processo: subprocess.Popen):
+    processo.terminate()
+    try:
+        processo.wait(timeout=15)
+    except subprocess.TimeoutExpired:
+        processo.kill()
+
+
+# ======================================================
+# DISPARO
+# ======================================================
+
+async def disparar(
+    base: str,
+    proxima: Callable[[], tuple],
+    duracao: float,
+    concorrencia: int
+) -> Dict[str, Any]:
+    latencias: List[float] = []
+    erros = 0
+    status: Dict[int, int] = {}
+    limites = httpx.Limits(max_connections=concorrencia, max_keepalive_connections=concorrencia)
+
+    async with httpx.AsyncClient(base_url=base, limits=limites, timeout=30) as cliente:
+        fim = time.monotonic() + duracao
+
+        async def usuario():
+            nonlocal erros
+            while time.monotonic() < fim:
+                metodo, caminho, corpo, cabecalhos = proxima()
+                inicio = time.perf_counter()
+                try:
+                    r = await cliente.request(metodo, caminho, content=corpo, headers=cabecalhos)
+                    codigo = r.status_code
+                except httpx.HTTPError:
+                    codigo = 0
+                latencias.append((time.perf_counter() - inicio) * 1000)
+                status[codigo] = status.get(codigo, 0) + 1
+                if codigo == 0 or codigo >= 400:
+                    erros += 1
+
+        inicio_total = time.monotonic()
+        await asyncio.gather(*(usuario() for _ in range(concorrencia)))
+        decorrido = time.monotonic() - inicio_total
+
+    latencias.sort()
+    return {
+        "requisicoes": len(latencias),
+        "erros": erros,
+        "status": status,
+        "rps": round(len(latencias) / decorrido, 1) if decorrido else 0.0,
+        "p50_ms": round(percentil(latencias, 50), 2),
+        "p90_ms": round(percentil(latencias, 90), 2),
+        "p99_ms": round(percentil(latencias, 99), 2),
+        "max_ms": round(latencias[-1], 2) if latencias else 0.0,
+    }
+
+
+def geradores(webhooks: GeradorWebhooks, redirects: GeradorRedirects) -> Dict[str, Callable[[], tuple]]:
+    return {
+        "hotmart": lambda: webhooks.requisicao("HOTMART"),
+        "eduzz": lambda: webhooks.requisicao("EDUZZ"),
+        "monetizze": lambda: webhooks.requisicao("MONETIZZE"),
+        "go": redirects.go,
+        "go_gul": redirects.go_gul,
+        "recomendar": redirects.recomendar,
+    }
+
+
+# ======================================================
+# RELATÓRIO
+# ======================================================
+
+def imprimir(resultados: List[Dict[str, Any]]):
+    colunas = ("workers", "rota", "requisicoes", "erros", "rps", "p50_ms", "p90_ms", "p99_ms", "max_ms", "idas_supabase")
+    larguras = {c: max(len(c), *(len(str(r[c])) for r in resultados)) for c in colunas}
+    print("  ".join(c.rjust(larguras[c]) for c in colunas))
+    for r in resultados:
+        print("  ".join(str(r[c]).rjust(larguras[c]) for c in colunas))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Teste de carga com Supabase local")
+    parser.add_argument("--workers", default="1,2,4", help="Lista de contagens de workers do uvicorn")
+    parser.add_argument("--rotas", default=",".join(ROTAS))
+    parser.add_argument("--duracao", type=float, default=10.0, help="Segundos por rota")
+    parser.add_argument("--aquecimento", type=float, default=2.0)
+    parser.add_argument("--concorrencia", type=int, default=32)
+    parser.add_argument("--latencia-ms", type=float, default=5.0, help="Latência injetada no Supabase local")
+    parser.add_argument("--jitter-ms", type=float, default=0.0)
+    parser.add_argument("--duplicadas", type=float, default=0.02, help="Fração de reentregas de webhook")
+    parser.add_argument("--env", action="append", default=[], help="VAR=valor extra para a API (repetível)")
+    parser.add_argument("--saida", help="Grava os resultados em JSON")
+    parser.add_argument("--log-servidor", default=os.devnull)
+    args = parser.parse_args(argv)
+
+    rotas = [r.strip() for r in args.rotas.split(",") if r.strip()]
+    desconhecidas = set(rotas) - set(ROTAS)
+    if desconhecidas:
+        parser.error(f"Rotas desconhecidas: {', '.join(sorted(desconhecidas))}")
+
+    local = SupabaseLocal(latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms).iniciar()
+    ids = semear_redirects(local.banco)
+    semear_parceiros(local.banco, GeradorWebhooks({}).parceiros)
+    log("INFO", f"Supabase local em {local.url} | latência {args.latencia_ms}ms + {args.jitter_ms}ms")
+
+    fila_dir = tempfile.mkdtemp(prefix="carga_fila_")
+    ambiente = {
+        "SUPABASE_URL": local.url,
+        "SUPABASE_SERVICE_ROLE_KEY": "local",
+        "SUPABASE_KEY": "local",
+        "WEBHOOK_FILA_DIR": fila_dir,
+        **{f"{p}_WEBHOOK_SECRET": SEGREDO_CARGA for p in ROTAS_WEBHOOK},
+    }
+    for item in args.env:
+        chave, _, valor = item.partition("=")
+        ambiente[chave] = valor
+
+    resultados: List[Dict[str, Any]] = []
+    log_servidor = open(args.log_servidor, "ab")
+
+    try:
+        for workers in [int(w) for w in args.workers.split(",")]:
+            porta = porta_livre()
+            processo = subir_api(workers, porta, ambiente, log_servidor)
+            base = f"http://127.0.0.1:{porta}"
+            log("INFO", f"API com {workers} worker(s) em {base}")
+
+            webhooks = GeradorWebhooks(
+                {p: SEGREDO_CARGA for p in ROTAS_WEBHOOK},
+                duplicadas=args.duplicadas,
+                prefixo=f"CARGA{workers}-{int(time.time())}"
+            )
+            por_rota = geradores(webhooks, GeradorRedirects(ids))
+
+            try:
+                for rota in rotas:
+                    if args.aquecimento:
+                        asyncio.run(disparar(base, por_rota[rota], args.aquecimento, args.concorrencia))
+
+                    local.banco.zerar_contadores()
+                    resultado = asyncio.run(disparar(base, por_rota[rota], args.duracao, args.concorrencia))
+                    idas = sum(local.banco.contadores().values())
+
+                    resultado.update(
+                        workers=workers,
+                        rota=rota,
+                        idas_supabase=round(idas / resultado["requisicoes"], 2) if resultado["requisicoes"] else 0.0,
+                        contadores_supabase=local.banco.contadores(),
+                    )
+                    resultados.append(resultado)
+                    log("INFO", f"{workers}w {rota}: {resultado['rps']} req/s | p99 {resultado['p99_ms']}ms")
+            finally:
+                derrubar_api(processo)
+    finally:
+        log_servidor.close()
+        local.parar()
+
+    print()
+    imprimir(resultados)
+
+    if args.saida:
+        with open(args.saida, "wb") as f:
+            f.write(codec_json.dumps({
+                "parametros": vars(args),
+                "resultados": resultados,
+            }))
+        log("INFO", f"Resultados gravados em {args.saida}")
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
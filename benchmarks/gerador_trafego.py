@@ -0,0 +1,203 @@
+# gerador_trafego.py — Tráfego Sintético Assinado (webhooks + redirects)
+# ROBO GLOBAL AI
+#
+# - Webhooks Hotmart / Eduzz / Monetizze com corpo único por venda e
+#   assinatura HMAC-SHA256 no cabeçalho que cada plataforma usa
+# - Fração configurável de reentregas (mesma venda) para exercitar a idempotência
+# - Massa de dados para /go, /go/{gul_id} e /recomendar/{dor_id}
+#
+# Uso isolado (gera NDJSON no formato do journal — serve ao replay_webhooks.py):
+#   python -m benchmarks.gerador_trafego --quantidade 100000 --saida trafego.ndjson
+
+import sys
+import copy
+import hmac
+import random
+import hashlib
+import argparse
+import itertools
+from typing import Any, Dict, List, Optional, Tuple
+
+import codec_json
+from benchmarks.bench_extratores import PAYLOADS
+
+ROTAS_WEBHOOK = {
+    "HOTMART": "/webhook/hotmart",
+    "EDUZZ": "/webhook/eduzz",
+    "MONETIZZE": "/webhook/monetizze",
+}
+
+CABECALHOS_ASSINATURA = {
+    "HOTMART": "X-Hotmart-Hmac-SHA256",
+    "EDUZZ": "X-Eduzz-Signature",
+    "MONETIZZE": "X-Monetizze-Signature",
+}
+
+# Requisição pronta: (método, caminho, corpo, cabeçalhos)
+Requisicao = Tuple[str, str, Optional[bytes], Dict[str, str]]
+
+
+def assinar(segredo: str, corpo: bytes) -> str:
+    return hmac.new(segredo.encode(), corpo, hashlib.sha256).hexdigest()
+
+
+# ======================================================
+# WEBHOOKS
+# ======================================================
+
+class GeradorWebhooks:
+
+    def __init__(
+        self,
+        segredos: Dict[str, str],
+        *,
+        parceiros: int = 200,
+        duplicadas: float = 0.0,
+        semente: Optional[int] = None,
+        prefixo: str = "CARGA"
+    ):
+        self.segredos = segredos
+        self.plataformas = [p for p in ROTAS_WEBHOOK if p in segredos]
+        self.parceiros = [f"AFF-{i:05d}" for i in range(parceiros)]
+        self.duplicadas = duplicadas
+        self.prefixo = prefixo
+        self._aleatorio = random.Random(semente)
+        self._contador = itertools.count(1)
+        self._recentes: List[Tuple[str, bytes]] = []
+
+    def _payload(self, plataforma: str, n: int) -> Dict[str, Any]:
+        p = copy.deepcopy(PAYLOADS[plataforma])
+        valor = round(self._aleatorio.uniform(27.0, 997.0), 2)
+        comissao = round(valor * self._aleatorio.uniform(0.3, 0.7), 2)
+        parceiro = self._aleatorio.choice(self.parceiros)
+        venda_id = f"{self.prefixo}-{plataforma[:3]}-{n}"
+        produto = self._aleatorio.randint(1, 500)
+
+        if plataforma == "HOTMART":
+            compra = p["data"]["purchase"]
+            compra["transaction"] = venda_id
+            compra["price"]["value"] = valor
+            compra["commission"]["value"] = comissao
+            p["data"]["product"]["id"] = produto
+            p["data"]["affiliate"]["affiliate_code"] = parceiro
+        elif plataforma == "EDUZZ":
+            p["sale"].update(id=venda_id, value=valor, commission=comissao)
+            p["product"]["id"] = produto
+            p["affiliate"]["id"] = parceiro
+        else:
+            p["venda"].update(codigo=venda_id, valor=valor, comissao=comissao)
+            p["produto"]["codigo"] = produto
+            p["afiliado"]["codigo"] = parceiro
+        return p
+
+    def corpo(self, plataforma: Optional[str] = None) -> Tuple[str, bytes]:
+        """(plataforma, corpo bruto) — reentrega repete bytes idênticos."""
+        if self._recentes and self._aleatorio.random() < self.duplicadas:
+            return self._aleatorio.choice(self._recentes)
+
+        plataforma = plataforma or self._aleatorio.choice(self.plataformas)
+        corpo = codec_json.dumps(self._payload(plataforma, next(self._contador)))
+
+        self._recentes.append((plataforma, corpo))
+        if len(self._recentes) > 1000:
+            self._recentes = self._recentes[-500:]
+        return plataforma, corpo
+
+    def requisicao(self, plataforma: Optional[str] = None) -> Requisicao:
+        plataforma, corpo = self.corpo(plataforma)
+        cabecalhos = {
+            "Content-Type": "application/json",
+            CABECALHOS_ASSINATURA[plataforma]: assinar(self.segredos[plataforma], corpo),
+        }
+        return "POST", ROTAS_WEBHOOK[plataforma], corpo, cabecalhos
+
+
+# ======================================================
+# REDIRECTS
+# ======================================================
+
+def semear_redirects(banco, quantidade: int = 200) -> Dict[str, List[str]]:
+    """
+    Popula offers, produtos, solucoes e dor_solucoes no BancoMemoria.
+    Retorna os identificadores válidos para o gerador de redirects.
+    """
+    slugs = [f"oferta-{i}" for i in range(quantidade)]
+    guls = [f"{i:08d}" for i in range(quantidade)]
+    dores = [f"dor-{i}" for i in range(quantidade)]
+
+    banco.inserir("offers", [
+        {"slug": s, "status": "ativo", "url_afiliado": f"https://pay.exemplo.com/{s}"}
+        for s in slugs
+    ])
+    banco.inserir("produtos", [
+        {
+            "nome": f"Produto {g}",
+            "link_afiliado": f"https://pay.exemplo.com/p/{g}",
+            "plataforma": "HOTMART",
+            "gul": f"https://roboglobal.com.br/go/{g}",
+        }
+        for g in guls
+    ])
+    banco.inserir("solucoes", [
+        {"id": f"sol-{i}", "nome": f"Solução {i}", "link_afiliado": f"https://pay.exemplo.com/s/{i}"}
+        for i in range(quantidade)
+    ])
+    banco.inserir("dor_solucoes", [
+        {"dor_id": d, "solucao_id": f"sol-{i}", "prioridade": 1}
+        for i, d in enumerate(dores)
+    ])
+
+    return {"slugs": slugs, "guls": guls, "dores": dores}
+
+
+def semear_parceiros(banco, parceiros: List[str]):
+    """Saldos já existentes — o caso comum em produção (parceiro com vendas anteriores)."""
+    banco.inserir("partner_balances", [{"partner_id": p} for p in parceiros])
+
+
+class GeradorRedirects:
+
+    def __init__(self, ids: Dict[str, List[str]], *, semente: Optional[int] = None):
+        self.ids = ids
+        self._aleatorio = random.Random(semente)
+
+    def go(self) -> Requisicao:
+        return "GET", f"/go?produto={self._aleatorio.choice(self.ids['slugs'])}", None, {}
+
+    def go_gul(self) -> Requisicao:
+        return "GET", f"/go/{self._aleatorio.choice(self.ids['guls'])}", None, {}
+
+    def recomendar(self) -> Requisicao:
+        return "GET", f"/recomendar/{self._aleatorio.choice(self.ids['dores'])}", None, {}
+
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Gera webhooks assinados em NDJSON")
+    parser.add_argument("--quantidade", type=int, default=10000)
+    parser.add_argument("--saida", default="-")
+    parser.add_argument("--duplicadas", type=float, default=0.0)
+    parser.add_argument("--semente", type=int)
+    args = parser.parse_args(argv)
+
+    gerador = GeradorWebhooks(
+        {p: "" for p in ROTAS_WEBHOOK},
+        duplicadas=args.duplicadas,
+        semente=args.semente
+    )
+    saida = sys.stdout if args.saida == "-" else open(args.saida, "w", encoding="utf-8")
+    try:
+        for _ in range(args.quantidade):
+            plataforma, corpo = gerador.corpo()
+            saida.write(codec_json.dumps_str({"plataforma": plataforma, "corpo": corpo.decode()}) + "\n")
+    finally:
+        if saida is not sys.stdout:
+            saida.close()
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
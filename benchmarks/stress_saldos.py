@@ -0,0 +1,158 @@
+# stress_saldos.py — Prova de ausência de incrementos perdidos em partner_balances
+# Uso:
+#   python -m benchmarks.stress_saldos                       (Supabase local, caminho atômico)
+#   python -m benchmarks.stress_saldos --modo legado         (leitura-modificação-escrita antiga)
+#   python -m benchmarks.stress_saldos --real --threads 32   (SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY)
+#
+# T threads creditam N comissões cada em poucos parceiros (contenção máxima).
+# Ao final (após compactar o ledger), o saldo de cada parceiro no banco precisa ser EXATAMENTE a soma
+# enviada. Qualquer diferença = incremento perdido → código de saída 1.
+
+import os
+import sys
+import time
+import random
+import argparse
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List
+
+from supabase import create_client
+
+from balance_service import incrementar_saldo_parceiro
+from ledger_service import compactar_tudo
+from benchmarks.supabase_local import SupabaseLocal
+
+CENTAVO = Decimal("0.01")
+
+
+# ======================================================
+# REFERÊNCIA LEGADA (select + update calculado no cliente)
+# ======================================================
+
+def legado_adicionar_comissao(supabase, *, partner_id: str, valor: Decimal):
+    balance = (
+        supabase
+        .table("partner_balances")
+        .select("*")
+        .eq("partner_id", partner_id)
+        .single()
+        .execute()
+        .data
+    )
+
+    novo_total = Decimal(str(balance["total_generated"])) + valor
+    novo_disponivel = Decimal(str(balance["available_balance"])) + valor
+
+    return (
+        supabase
+        .table("partner_balances")
+        .update({
+            "total_generated": str(novo_total),
+            "available_balance": str(novo_disponivel),
+            "updated_at": datetime.utcnow().isoformat()
+        })
+        .eq("partner_id", partner_id)
+        .execute()
+    )
+
+
+# ======================================================
+# EXECUÇÃO
+# ======================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Stress de créditos concorrentes em partner_balances")
+    parser.add_argument("--modo", choices=("atomico", "legado"), default="atomico")
+    parser.add_argument("--threads", type=int, default=16)
+    parser.add_argument("--creditos", type=int, default=200, help="Créditos por thread")
+    parser.add_argument("--parceiros", type=int, default=4)
+    parser.add_argument("--latencia-ms", type=float, default=2.0, help="Somente Supabase local")
+    parser.add_argument("--real", action="store_true", help="Usa SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY")
+    args = parser.parse_args(argv)
+
+    local = None
+    if args.real:
+        url = os.getenv("SUPABASE_URL")
+        chave = os.getenv("SUPABASE_SERVICE_ROLE_KEY")
+        if not url or not chave:
+            raise SystemExit("SUPABASE_URL / SUPABASE_SERVICE_ROLE_KEY não definidos")
+    else:
+        local = SupabaseLocal(latencia_ms=args.latencia_ms).iniciar()
+        url, chave = local.url, "local"
+
+    prefixo = f"STRESS-{int(time.time())}"
+    parceiros = [f"{prefixo}-{i}" for i in range(args.parceiros)]
+
+    sb = create_client(url, chave)
+
+    if args.modo == "legado":
+        # O caminho antigo não cria o saldo de forma segura: parte de linhas existentes
+        sb.table("partner_balances").insert([{"partner_id": p} for p in parceiros]).execute()
+        creditar = legado_adicionar_comissao
+    else:
+        creditar = incrementar_saldo_parceiro
+
+    esperado: Dict[str, Decimal] = {p: Decimal("0") for p in parceiros}
+    lock_esperado = threading.Lock()
+    erros: List[str] = []
+
+    def trabalhador(semente: int):
+        aleatorio = random.Random(semente)
+        cliente = create_client(url, chave)
+        for _ in range(args.creditos):
+            parceiro = aleatorio.choice(parceiros)
+            valor = (Decimal(aleatorio.randint(1, 99999)) * CENTAVO)
+            try:
+                creditar(cliente, partner_id=parceiro, valor=valor)
+            except Exception as e:
+                erros.append(str(e))
+                continue
+            with lock_esperado:
+                esperado[parceiro] += valor
+
+    inicio = time.perf_counter()
+    threads = [threading.Thread(target=trabalhador, args=(i,)) for i in range(args.threads)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    decorrido = time.perf_counter() - inicio
+
+    if args.modo == "atomico":
+        # Créditos estão no ledger; a compactação os leva para partner_balances
+        compactar_tudo(sb)
+
+    linhas = sb.table("partner_balances").select("*").in_("partner_id", parceiros).execute().data
+    observado = {l["partner_id"]: l for l in linhas}
+
+    total_creditos = args.threads * args.creditos - len(erros)
+    print(f"[STRESS] modo={args.modo} | {total_creditos} créditos em {decorrido:.2f}s "
+          f"({total_creditos / decorrido:.0f}/s) | erros={len(erros)}")
+
+    perdidos = 0
+    for parceiro in parceiros:
+        linha = observado.get(parceiro) or {}
+        for coluna in ("total_generated", "available_balance"):
+            obtido = Decimal(str(linha.get(coluna) or 0)).quantize(CENTAVO)
+            if obtido != esperado[parceiro].quantize(CENTAVO):
+                perdidos += 1
+                print(f"[STRESS] {parceiro}.{coluna}: esperado {esperado[parceiro]} | obtido {obtido}")
+
+    if local is not None:
+        local.parar()
+
+    if erros:
+        print(f"[STRESS] Primeiro erro: {erros[0]}")
+
+    if perdidos:
+        print(f"[STRESS] FALHA: {perdidos} saldos divergentes (incrementos perdidos)")
+        return 1
+
+    print(f"[STRESS] OK: nenhum incremento perdido em {len(parceiros)} parceiros")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
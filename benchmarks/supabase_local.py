@@ -0,0 +1,854 @@
+# supabase_local.py — Supabase Local (PostgREST em memória) para carga
+# ROBO GLOBAL AI
+#
+# Servidor HTTP que fala o subconjunto do PostgREST usado pelo robô, para
+# o create_client apontar para cá em vez da produção:
+#   GET    /rest/v1/<tabela>?select=...&col=eq.x&order=...&limit=...
+#   POST   /rest/v1/<tabela>          (insert / upsert: on_conflict + Prefer)
+#   PATCH  /rest/v1/<tabela>?filtros  (update)
+#   DELETE /rest/v1/<tabela>?filtros
+#   POST   /rest/v1/rpc/<funcao>      (funções registradas em FUNCOES)
+#
+# Latência injetada por requisição (SUPABASE_LOCAL_LATENCIA_MS + jitter)
+# simula a ida e volta até o Supabase real.
+#
+# Uso isolado:
+#   python -m benchmarks.supabase_local --porta 54321 --latencia-ms 20
+#   SUPABASE_URL=http://127.0.0.1:54321 SUPABASE_SERVICE_ROLE_KEY=local uvicorn main:app
+
+import os
+import re
+import time
+import random
+import argparse
+import threading
+from collections import Counter
+from datetime import datetime, timezone
+from decimal import Decimal
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from urllib.parse import parse_qsl, unquote, urlsplit
+
+import codec_json
+
+SUPABASE_LOCAL_LATENCIA_MS = float(os.getenv("SUPABASE_LOCAL_LATENCIA_MS", "0"))
+SUPABASE_LOCAL_JITTER_MS = float(os.getenv("SUPABASE_LOCAL_JITTER_MS", "0"))
+
+# Restrições únicas além de "id" (espelham os índices de sql/)
+UNICOS: Dict[str, List[Tuple[str, ...]]] = {
+    "sales": [("platform", "external_sale_id")],
+    "partner_balances": [("partner_id",)],
+    # Índice parcial (referencia não nula): NULL nunca conflita, como no Postgres
+    "partner_ledger": [("tipo", "referencia")],
+    "eventos_financeiros": [("evento_id",)],
+}
+
+# Valores default das colunas (DEFAULT do schema real) aplicados no insert
+PADROES: Dict[str, Dict[str, Any]] = {
+    "partner_balances": {
+        "total_generated": 0,
+        "available_balance": 0,
+        "paid_balance": 0,
+        "reserved_balance": 0,
+    },
+    "payouts": {
+        "reserved": False,
+    },
+}
+
+# Colunas "generated by default as identity" além de id (contador próprio)
+IDENTIDADES: Dict[str, Tuple[str, ...]] = {
+    "eventos_financeiros": ("seq",),
+}
+
+# Colunas "default now()"
+AGORA: Dict[str, Tuple[str, ...]] = {
+    "eventos_financeiros": ("registrado_em",),
+    "governanca_snapshots": ("criado_em",),
+    "go_tracking": ("criado_em",),
+    "offers": ("updated_at",),
+    "produtos": ("updated_at",),
+}
+
+# Triggers "before update ... updated_at := now()"
+TOCADAS_NO_UPDATE: Dict[str, str] = {
+    "offers": "updated_at",
+    "produtos": "updated_at",
+}
+
+# Colunas "generated always as (...) stored"
+GERADAS: Dict[str, Dict[str, Callable[[Dict[str, Any]], Any]]] = {
+    "produtos": {
+        "gul_id": lambda l: str(l["gul"]).rsplit("/", 1)[-1] if l.get("gul") else None,
+    },
+}
+
+# Embeds "tabela(*)" no select: (tabela, embutida) → coluna FK na tabela
+RELACOES: Dict[Tuple[str, str], str] = {
+    ("dor_solucoes", "solucoes"): "solucao_id",
+}
+
+# Funções RPC: nome → f(banco, params) → JSON
+FUNCOES: Dict[str, Callable[["BancoMemoria", Dict[str, Any]], Any]] = {}
+
+
+class ErroPostgrest(Exception):
+
+    def __init__(self, status: int, codigo: str, mensagem: str):
+        super().__init__(mensagem)
+        self.status = status
+        self.codigo = codigo
+        self.mensagem = mensagem
+
+    def corpo(self) -> Dict[str, Any]:
+        return {"code": self.codigo, "message": self.mensagem, "details": None, "hint": None}
+
+
+# ======================================================
+# FILTROS / ORDENAÇÃO
+# ======================================================
+
+def _comparavel(valor: Any, referencia: str) -> Any:
+    """Converte o texto do filtro para o tipo da coluna."""
+    if isinstance(valor, bool):
+        return referencia.lower() == "true"
+    if isinstance(valor, Decimal):
+        try:
+            return Decimal(referencia)
+        except ArithmeticError:
+            return referencia
+    if isinstance(valor, (int, float)):
+        try:
+            return float(referencia)
+        except ValueError:
+            return referencia
+    return referencia
+
+
+def _like(padrao: str, sem_caixa: bool) -> "re.Pattern":
+    regex = "".join(
+        ".*" if c in "%*" else "." if c == "_" else re.escape(c)
+        for c in padrao
+    )
+    return re.compile(f"^{regex}$", (re.IGNORECASE if sem_caixa else 0) | re.DOTALL)
+
+
+def _filtro(coluna: str, expressao: str) -> Callable[[Dict[str, Any]], bool]:
+    negado = expressao.startswith("not.")
+    if negado:
+        expressao = expressao[4:]
+    operador, _, alvo = expressao.partition(".")
+
+    if operador == "is":
+        esperado = {"null": None, "true": True, "false": False}.get(alvo.lower(), alvo)
+        teste = lambda linha: linha.get(coluna) is esperado or linha.get(coluna) == esperado
+    elif operador == "in":
+        opcoes = [v.strip().strip('"') for v in alvo.strip("()").split(",") if v.strip()]
+        teste = lambda linha: linha.get(coluna) is not None and str(linha.get(coluna)) in opcoes
+    elif operador in ("like", "ilike"):
+        regex = _like(alvo, operador == "ilike")
+        teste = lambda linha: linha.get(coluna) is not None and bool(regex.match(str(linha.get(coluna))))
+    else:
+        comparacoes = {
+            "eq": lambda a, b: a == b,
+            "neq": lambda a, b: a != b,
+            "gt": lambda a, b: a > b,
+            "gte": lambda a, b: a >= b,
+            "lt": lambda a, b: a < b,
+            "lte": lambda a, b: a <= b,
+        }
+        if operador not in comparacoes:
+            raise ErroPostgrest(400, "PGRST100", f"Operador não suportado: {operador}")
+        comparar = comparacoes[operador]
+
+        def teste(linha):
+            valor = linha.get(coluna)
+            if valor is None:
+                return False
+            try:
+                return comparar(valor, _comparavel(valor, alvo))
+            except TypeError:
+                return comparar(str(valor), alvo)
+
+    return (lambda linha: not teste(linha)) if negado else teste
+
+
+def _ordenar(linhas: List[Dict[str, Any]], ordem: str) -> List[Dict[str, Any]]:
+    for termo in reversed(ordem.split(",")):
+        partes = termo.split(".")
+        coluna = partes[0]
+        desc = "desc" in partes[1:]
+        presentes = [l for l in linhas if l.get(coluna) is not None]
+        nulos = [l for l in linhas if l.get(coluna) is None]
+        presentes.sort(key=lambda l: l[coluna], reverse=desc)
+        linhas = presentes + nulos
+    return linhas
+
+
+def _dividir_select(select: str) -> List[str]:
+    """Separa colunas respeitando parênteses: "*, solucoes(*)" → ["*", "solucoes(*)"]."""
+    partes, atual, nivel = [], "", 0
+    for c in select.replace(" ", ""):
+        if c == "," and nivel == 0:
+            partes.append(atual)
+            atual = ""
+            continue
+        nivel += c == "("
+        nivel -= c == ")"
+        atual += c
+    if atual:
+        partes.append(atual)
+    return partes
+
+
+# ======================================================
+# BANCO EM MEMÓRIA
+# ======================================================
+
+def _chave(linha: Dict[str, Any], colunas: Tuple[str, ...]) -> Tuple[Optional[str], ...]:
+    """Chave de índice em texto: casa direto com o valor vindo da query string."""
+    return tuple(None if linha.get(c) is None else str(linha.get(c)) for c in colunas)
+
+
+class BancoMemoria:
+
+    def __init__(self):
+        self.tabelas: Dict[str, List[Dict[str, Any]]] = {}
+        self._indices: Dict[Tuple[str, Tuple[str, ...]], Dict[Tuple[Any, ...], Dict[str, Any]]] = {}
+        self._proximo_id: Counter = Counter()
+        self.lock = threading.RLock()
+        self.requisicoes: Counter = Counter()
+        # partner_id → lançamentos sem snapshot (espelha partner_ledger_cauda_idx)
+        self.caudas_ledger: Dict[str, List[Dict[str, Any]]] = {}
+
+    # ---------------- estrutura ----------------
+
+    def _unicos(self, tabela: str) -> List[Tuple[str, ...]]:
+        return [("id",)] + UNICOS.get(tabela.split(".")[-1], [])
+
+    def _indice(self, tabela: str, colunas: Tuple[str, ...]) -> Dict[Tuple[Any, ...], Dict[str, Any]]:
+        chave = (tabela, colunas)
+        if chave not in self._indices:
+            self._indices[chave] = {
+                _chave(l, colunas): l for l in self.tabelas.get(tabela, [])
+            }
+        return self._indices[chave]
+
+    def _indexar(self, tabela: str, linha: Dict[str, Any]):
+        for colunas in self._unicos(tabela):
+            self._indice(tabela, colunas)[_chave(linha, colunas)] = linha
+
+    def _desindexar(self, tabela: str, linha: Dict[str, Any]):
+        for colunas in self._unicos(tabela):
+            self._indice(tabela, colunas).pop(_chave(linha, colunas), None)
+
+    # ---------------- escrita ----------------
+
+    def inserir(
+        self,
+        tabela: str,
+        linhas: List[Dict[str, Any]],
+        on_conflict: Optional[str] = None,
+        resolucao: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        conflito = tuple(c.strip() for c in on_conflict.split(",")) if on_conflict else None
+        resultado = []
+
+        with self.lock:
+            destino = self.tabelas.setdefault(tabela, [])
+            for original in linhas:
+                linha = {**PADROES.get(tabela.split(".")[-1], {}), **original}
+                if linha.get("id") is None:
+                    self._proximo_id[tabela] += 1
+                    linha["id"] = self._proximo_id[tabela]
+                for coluna in IDENTIDADES.get(tabela.split(".")[-1], ()):
+                    if linha.get(coluna) is None:
+                        self._proximo_id[f"{tabela}.{coluna}"] += 1
+                        linha[coluna] = self._proximo_id[f"{tabela}.{coluna}"]
+                for coluna in AGORA.get(tabela.split(".")[-1], ()):
+                    if linha.get(coluna) is None:
+                        linha[coluna] = datetime.now(timezone.utc).isoformat()
+                for coluna, gerar in GERADAS.get(tabela.split(".")[-1], {}).items():
+                    linha[coluna] = gerar(linha)
+
+                existente = None
+                for colunas in self._unicos(tabela):
+                    chave = _chave(linha, colunas)
+                    if None in chave:
+                        continue
+                    existente = self._indice(tabela, colunas).get(chave)
+                    if existente is not None:
+                        break
+
+                if existente is not None:
+                    if resolucao == "ignore-duplicates":
+                        continue
+                    if resolucao == "merge-duplicates":
+                        self._desindexar(tabela, existente)
+                        existente.update({k: v for k, v in original.items() if k != "id" or v is not None})
+                        self._indexar(tabela, existente)
+                        resultado.append(dict(existente))
+                        continue
+                    raise ErroPostgrest(
+                        409, "23505",
+                        f"duplicate key value violates unique constraint ({tabela}: {conflito or 'id'})"
+                    )
+
+                destino.append(linha)
+                self._indexar(tabela, linha)
+                resultado.append(dict(linha))
+
+        return resultado
+
+    def atualizar(self, tabela: str, filtros, valores: Dict[str, Any]) -> List[Dict[str, Any]]:
+        with self.lock:
+            alvo = self._filtrar(tabela, filtros)
+            nome = tabela.split(".")[-1]
+            for linha in alvo:
+                self._desindexar(tabela, linha)
+                linha.update(valores)
+                if nome in TOCADAS_NO_UPDATE:
+                    linha[TOCADAS_NO_UPDATE[nome]] = datetime.now(timezone.utc).isoformat()
+                for coluna, gerar in GERADAS.get(nome, {}).items():
+                    linha[coluna] = gerar(linha)
+                self._indexar(tabela, linha)
+            return [dict(l) for l in alvo]
+
+    def remover(self, tabela: str, filtros) -> List[Dict[str, Any]]:
+        with self.lock:
+            alvo = self._filtrar(tabela, filtros)
+            ids = {id(l) for l in alvo}
+            for linha in alvo:
+                self._desindexar(tabela, linha)
+            self.tabelas[tabela] = [l for l in self.tabelas.get(tabela, []) if id(l) not in ids]
+            return [dict(l) for l in alvo]
+
+    # ---------------- leitura ----------------
+
+    def _filtrar(self, tabela: str, filtros: List[Tuple[str, str]]) -> List[Dict[str, Any]]:
+        # Igualdade em todas as colunas de uma restrição única → índice
+        iguais = {c: e[3:] for c, e in filtros if e.startswith("eq.")}
+        candidatas = None
+        for colunas in self._unicos(tabela):
+            if all(c in iguais for c in colunas):
+                linha = self._indice(tabela, colunas).get(tuple(iguais[c] for c in colunas))
+                candidatas = [linha] if linha is not None else []
+                break
+
+        if candidatas is None:
+            candidatas = self.tabelas.get(tabela, [])
+
+        testes = [_filtro(c, e) for c, e in filtros]
+        return [l for l in candidatas if all(t(l) for t in testes)]
+
+    def selecionar(
+        self,
+        tabela: str,
+        select: str,
+        filtros: List[Tuple[str, str]],
+        ordem: Optional[str],
+        limite: Optional[int],
+        deslocamento: int = 0
+    ) -> List[Dict[str, Any]]:
+        with self.lock:
+            linhas = self._filtrar(tabela, filtros)
+            if ordem:
+                linhas = _ordenar(linhas, ordem)
+            if deslocamento:
+                linhas = linhas[deslocamento:]
+            if limite is not None:
+                linhas = linhas[:limite]
+            return [self._projetar(tabela, l, select) for l in linhas]
+
+    def _projetar(self, tabela: str, linha: Dict[str, Any], select: str) -> Dict[str, Any]:
+        colunas = _dividir_select(select or "*")
+        saida: Dict[str, Any] = {}
+        for coluna in colunas:
+            if coluna == "*":
+                saida.update(linha)
+            elif "(" in coluna:
+                nome, interno = coluna[:-1].split("(", 1)
+                esquema = tabela.rsplit(".", 1)[0] + "." if "." in tabela else ""
+                fk = RELACOES.get((tabela.split(".")[-1], nome), f"{nome}_id")
+                relacionada = self._indice(esquema + nome, ("id",)).get(_chave(linha, (fk,)))
+                saida[nome] = self._projetar(esquema + nome, relacionada, interno) if relacionada else None
+            else:
+                saida[coluna.split(":")[-1]] = linha.get(coluna.split(":")[0])
+        return saida
+
+    # ---------------- observabilidade ----------------
+
+    def contadores(self) -> Dict[str, int]:
+        with self.lock:
+            return dict(self.requisicoes)
+
+    def zerar_contadores(self):
+        with self.lock:
+            self.requisicoes.clear()
+
+
+# ======================================================
+# FUNÇÕES RPC (espelham sql/)
+# ======================================================
+
+COLUNAS_SALDO = ("total_generated", "available_balance", "reserved_balance", "paid_balance")
+
+
+def _decimal(valor: Any) -> Decimal:
+    return Decimal(str(valor or 0))
+
+
+def _lancar(
+    banco: BancoMemoria,
+    partner_id: str,
+    tipo: str,
+    referencia: Optional[str] = None,
+    **deltas: Decimal
+) -> Optional[Dict[str, Any]]:
+    """INSERT em partner_ledger (sql/007_ledger_parceiros.sql); None se (tipo, referencia) já existe."""
+    lancamento = {
+        "partner_id": partner_id,
+        "tipo": tipo,
+        "referencia": referencia,
+        **{c: deltas.get(c, Decimal("0")) for c in COLUNAS_SALDO},
+        "snapshot_id": None,
+        "created_at": datetime.now(timezone.utc).isoformat(),
+    }
+    with banco.lock:
+        gravado = banco.inserir("partner_ledger", [lancamento], resolucao="ignore-duplicates")
+        if not gravado:
+            return None
+        linha = banco._indice("partner_ledger", ("id",))[(str(gravado[0]["id"]),)]
+        banco.caudas_ledger.setdefault(str(partner_id), []).append(linha)
+        return gravado[0]
+
+
+def _compactar(banco: BancoMemoria, partner_ids: Optional[List[str]], limite: int) -> int:
+    """compactar_saldos: cauda do ledger → partner_balances + partner_balance_snapshots."""
+    agora = datetime.now(timezone.utc).isoformat()
+    with banco.lock:
+        candidatos = banco.caudas_ledger.keys() if partner_ids is None else {str(p) for p in partner_ids}
+        parceiros = sorted(p for p in candidatos if banco.caudas_ledger.get(p))[:limite]
+        saldos = banco._indice("partner_balances", ("partner_id",))
+
+        for parceiro in parceiros:
+            saldo = saldos.get((parceiro,))
+            if saldo is None:
+                banco.inserir("partner_balances", [{"partner_id": parceiro}])
+                saldo = saldos[(parceiro,)]
+
+            snapshot = banco.inserir("partner_balance_snapshots", [{"partner_id": parceiro, "created_at": agora}])[0]
+            for lancamento in banco.caudas_ledger.pop(parceiro):
+                lancamento["snapshot_id"] = snapshot["id"]
+                for coluna in COLUNAS_SALDO:
+                    saldo[coluna] = _decimal(saldo.get(coluna)) + lancamento[coluna]
+            saldo["last_snapshot_id"] = snapshot["id"]
+            saldo["updated_at"] = agora
+
+            banco._indice("partner_balance_snapshots", ("id",))[(str(snapshot["id"]),)].update(
+                {c: saldo[c] for c in COLUNAS_SALDO}
+            )
+        return len(parceiros)
+
+
+def _lancar_comissao(banco: BancoMemoria, params: Dict[str, Any]) -> Optional[int]:
+    """sql/007_ledger_parceiros.sql"""
+    valor = Decimal(str(params["p_valor"]))
+    lancamento = _lancar(
+        banco,
+        params["p_partner_id"],
+        params.get("p_tipo") or "credito",
+        params.get("p_referencia"),
+        total_generated=valor,
+        available_balance=valor,
+    )
+    return None if lancamento is None else lancamento["id"]
+
+
+FUNCOES["lancar_comissao"] = _lancar_comissao
+
+
+def _lancar_comissoes(banco: BancoMemoria, params: Dict[str, Any]) -> int:
+    """sql/015_ledger_creditos_lote.sql"""
+    inseridos = 0
+    with banco.lock:
+        for item in params.get("p_itens") or []:
+            inseridos += _lancar_comissao(banco, {
+                "p_partner_id": params["p_partner_id"],
+                "p_valor": item["valor"],
+                "p_referencia": item.get("referencia"),
+            }) is not None
+    return inseridos
+
+
+FUNCOES["lancar_comissoes"] = _lancar_comissoes
+
+
+def _compactar_saldos(banco: BancoMemoria, params: Dict[str, Any]) -> int:
+    """sql/007_ledger_parceiros.sql"""
+    return _compactar(banco, params.get("p_partner_ids"), int(params.get("p_limite") or 1000))
+
+
+FUNCOES["compactar_saldos"] = _compactar_saldos
+
+
+def _saldo_parceiro(banco: BancoMemoria, params: Dict[str, Any]) -> Dict[str, Any]:
+    """sql/007_ledger_parceiros.sql"""
+    partner_id = str(params["p_partner_id"])
+    with banco.lock:
+        saldo = banco._indice("partner_balances", ("partner_id",)).get((partner_id,)) or {}
+        cauda = banco.caudas_ledger.get(partner_id, [])
+        return {
+            "partner_id": partner_id,
+            **{c: _decimal(saldo.get(c)) + sum((l[c] for l in cauda), Decimal("0")) for c in COLUNAS_SALDO},
+            "lancamentos_na_cauda": len(cauda),
+        }
+
+
+FUNCOES["saldo_parceiro"] = _saldo_parceiro
+
+
+def _saldo_parceiro_em(banco: BancoMemoria, params: Dict[str, Any]) -> Dict[str, Any]:
+    """sql/007_ledger_parceiros.sql"""
+    partner_id = str(params["p_partner_id"])
+    momento = datetime.fromisoformat(str(params["p_momento"]).replace("Z", "+00:00")).isoformat()
+    with banco.lock:
+        snapshots = [s for s in banco.tabelas.get("partner_balance_snapshots", []) if s["partner_id"] == partner_id]
+        anteriores = [s for s in snapshots if s["created_at"] <= momento]
+        base = max(anteriores, key=lambda s: s["id"]) if anteriores else {}
+        posteriores = [s["id"] for s in snapshots if s["created_at"] > momento]
+        limite = min(posteriores) if posteriores else None
+
+        valores = {c: _decimal(base.get(c)) for c in COLUNAS_SALDO}
+        for lancamento in banco.tabelas.get("partner_ledger", []):
+            if lancamento["partner_id"] != partner_id or lancamento["created_at"] > momento:
+                continue
+            snapshot_id = lancamento["snapshot_id"]
+            if snapshot_id is None or (
+                snapshot_id > base.get("id", 0) and (limite is None or snapshot_id <= limite)
+            ):
+                for c in COLUNAS_SALDO:
+                    valores[c] += lancamento[c]
+    return {"partner_id": partner_id, "momento": momento, **valores}
+
+
+FUNCOES["saldo_parceiro_em"] = _saldo_parceiro_em
+
+
+def _incrementar_saldo_parceiro(banco: BancoMemoria, params: Dict[str, Any]) -> Dict[str, Any]:
+    """sql/007_ledger_parceiros.sql (incrementar_saldo_parceiro redefinida)"""
+    with banco.lock:
+        _lancar_comissao(banco, params)
+        _compactar(banco, [params["p_partner_id"]], 1)
+        return dict(banco._indice("partner_balances", ("partner_id",))[(str(params["p_partner_id"]),)])
+
+
+FUNCOES["incrementar_saldo_parceiro"] = _incrementar_saldo_parceiro
+
+
+def _liquidar_payouts(banco: BancoMemoria, params: Dict[str, Any]) -> Dict[str, Any]:
+    """sql/007_ledger_parceiros.sql (liquidar_payouts redefinida)"""
+    itens = {str(i["payout_id"]): i.get("provider_reference") for i in params["p_itens"]}
+    agora = datetime.now(timezone.utc).isoformat()
+    pagos = 0
+    parceiros = set()
+
+    with banco.lock:
+        payouts = banco._indice("payouts", ("id",))
+        for payout_id, referencia in sorted(itens.items()):
+            payout = payouts.get((payout_id,))
+            if payout is None or payout.get("payout_status") == "paid":
+                continue
+            payout.update(payout_status="paid", provider_reference=referencia, processed_at=agora)
+            valor = _decimal(payout["amount"])
+            reservado = bool(payout.get("reserved"))
+            _lancar(
+                banco, payout["partner_id"], "payout_pago", payout_id,
+                available_balance=Decimal("0") if reservado else -valor,
+                reserved_balance=-valor if reservado else Decimal("0"),
+                paid_balance=valor,
+            )
+            parceiros.add(str(payout["partner_id"]))
+            pagos += 1
+
+        atualizados = _compactar(banco, list(parceiros), len(parceiros))
+
+    return {
+        "recebidos": len(params["p_itens"]),
+        "pagos": pagos,
+        "ignorados": len(params["p_itens"]) - pagos,
+        "saldos_atualizados": atualizados,
+    }
+
+
+FUNCOES["liquidar_payouts"] = _liquidar_payouts
+
+
+def _reservar_payouts(banco: BancoMemoria, params: Dict[str, Any]) -> Dict[str, Any]:
+    """sql/007_ledger_parceiros.sql (reservar_payouts redefinida)"""
+    minimo = Decimal(str(params["p_minimo"]))
+    novos = []
+
+    with banco.lock:
+        saldos = banco._indice("partner_balances", ("id",))
+        linhas = [saldos[(i,)] for i in sorted({str(i) for i in params["p_balance_ids"]}) if (i,) in saldos]
+        parceiros = [str(l["partner_id"]) for l in linhas]
+        _compactar(banco, parceiros, len(parceiros))
+
+        for saldo in linhas:
+            disponivel = _decimal(saldo.get("available_balance"))
+            if disponivel < minimo:
+                continue
+            novos.append({
+                "partner_id": saldo["partner_id"],
+                "balance_id": saldo["id"],
+                "amount": disponivel,
+                "payout_provider": params.get("p_provider"),
+                "payout_status": "pending",
+                "reserved": True,
+            })
+        for payout in banco.inserir("payouts", novos):
+            _lancar(
+                banco, payout["partner_id"], "payout_reserva", str(payout["id"]),
+                available_balance=-payout["amount"],
+                reserved_balance=payout["amount"],
+            )
+        _compactar(banco, parceiros, len(parceiros))
+
+    return {
+        "criados": len(novos),
+        "total": sum((n["amount"] for n in novos), Decimal("0")),
+        "ignorados": len(params["p_balance_ids"]) - len(novos),
+    }
+
+
+FUNCOES["reservar_payouts"] = _reservar_payouts
+
+
+def _recalcular_comissoes(banco: BancoMemoria, params: Dict[str, Any]) -> Dict[str, Any]:
+    """sql/007_ledger_parceiros.sql (recalcular_comissoes redefinida)"""
+
+    def numero(valor):
+        return None if valor is None else Decimal(str(valor))
+
+    atualizadas = 0
+    por_parceiro: Dict[str, Decimal] = {}
+
+    with banco.lock:
+        vendas = banco._indice("sales", ("id",))
+        for item in {str(i["id"]): i for i in params["p_itens"]}.values():
+            venda = vendas.get((str(item["id"]),))
+            if venda is None:
+                continue
+            if numero(venda.get("partner_commission")) != numero(item.get("partner_commission_anterior")):
+                continue
+            if numero(venda.get("master_commission")) != numero(item.get("master_commission_anterior")):
+                continue
+            novo = Decimal(str(item["partner_commission"]))
+            venda["partner_commission"] = novo
+            venda["master_commission"] = Decimal(str(item["master_commission"]))
+            atualizadas += 1
+            if venda.get("partner_id") is not None:
+                parceiro = str(venda["partner_id"])
+                delta = novo - (numero(item.get("partner_commission_anterior")) or Decimal("0"))
+                por_parceiro[parceiro] = por_parceiro.get(parceiro, Decimal("0")) + delta
+
+        saldos = 0
+        for parceiro in sorted(por_parceiro):
+            if por_parceiro[parceiro] == 0:
+                continue
+            _lancar(banco, parceiro, "ajuste",
+                    total_generated=por_parceiro[parceiro], available_balance=por_parceiro[parceiro])
+            saldos += 1
+
+    return {
+        "recebidas": len(params["p_itens"]),
+        "atualizadas": atualizadas,
+        "ignoradas": len(params["p_itens"]) - atualizadas,
+        "saldos_ajustados": saldos,
+        "ajuste_total": sum(por_parceiro.values(), Decimal("0")),
+    }
+
+
+FUNCOES["recalcular_comissoes"] = _recalcular_comissoes
+
+
+# ======================================================
+# HTTP
+# ======================================================
+
+def _criar_handler(banco: BancoMemoria, latencia_ms: float, jitter_ms: float):
+
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+        # Cabeçalho e corpo saem em writes separados: sem isso o Nagle +
+        # ACK atrasado somam ~40ms por resposta em keep-alive
+        disable_nagle_algorithm = True
+
+        def log_message(self, *args):
+            pass
+
+        def _responder(self, status: int, corpo: Any, cabecalhos: Optional[Dict[str, str]] = None):
+            dados = codec_json.dumps(corpo) if corpo is not None else b""
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(dados)))
+            for nome, valor in (cabecalhos or {}).items():
+                self.send_header(nome, valor)
+            self.end_headers()
+            self.wfile.write(dados)
+
+        def _ler_corpo(self) -> Any:
+            tamanho = int(self.headers.get("Content-Length") or 0)
+            return codec_json.loads(self.rfile.read(tamanho)) if tamanho else None
+
+        def _tratar(self, metodo: str):
+            if latencia_ms or jitter_ms:
+                time.sleep((latencia_ms + random.uniform(0, jitter_ms)) / 1000.0)
+
+            url = urlsplit(self.path)
+            try:
+                corpo = self._ler_corpo()
+
+                if url.path == "/__local/contadores":
+                    return self._responder(200, banco.contadores())
+
+                if not url.path.startswith("/rest/v1/"):
+                    raise ErroPostgrest(404, "PGRST404", f"Rota desconhecida: {url.path}")
+
+                recurso = unquote(url.path[len("/rest/v1/"):])
+                esquema = self.headers.get("Content-Profile") or self.headers.get("Accept-Profile")
+                prefer = self.headers.get("Prefer") or ""
+
+                if recurso.startswith("rpc/"):
+                    nome = recurso[4:]
+                    with banco.lock:
+                        banco.requisicoes[f"RPC {nome}"] += 1
+                    if nome not in FUNCOES:
+                        raise ErroPostgrest(404, "PGRST202", f"Função não encontrada: {nome}")
+                    return self._responder(200, FUNCOES[nome](banco, corpo or {}))
+
+                tabela = f"{esquema}.{recurso}" if esquema and esquema != "public" else recurso
+                with banco.lock:
+                    banco.requisicoes[f"{metodo} {recurso}"] += 1
+
+                params = parse_qsl(url.query, keep_blank_values=True)
+                especiais = {"select", "order", "limit", "offset", "on_conflict", "columns"}
+                filtros = [(k, v) for k, v in params if k not in especiais]
+                opcoes = {k: v for k, v in params if k in especiais}
+
+                if metodo == "GET":
+                    linhas = banco.selecionar(
+                        tabela,
+                        opcoes.get("select", "*"),
+                        filtros,
+                        opcoes.get("order"),
+                        int(opcoes["limit"]) if "limit" in opcoes else None,
+                        int(opcoes.get("offset", 0))
+                    )
+                elif metodo == "POST":
+                    resolucao = None
+                    for item in prefer.split(","):
+                        if item.strip().startswith("resolution="):
+                            resolucao = item.strip().split("=", 1)[1]
+                    linhas = banco.inserir(
+                        tabela,
+                        corpo if isinstance(corpo, list) else [corpo or {}],
+                        opcoes.get("on_conflict"),
+                        resolucao
+                    )
+                elif metodo == "PATCH":
+                    linhas = banco.atualizar(tabela, filtros, corpo or {})
+                else:
+                    linhas = banco.remover(tabela, filtros)
+
+                cabecalhos = {}
+                if "count=" in prefer:
+                    cabecalhos["Content-Range"] = f"0-{max(len(linhas) - 1, 0)}/{len(linhas)}"
+
+                if "application/vnd.pgrst.object+json" in (self.headers.get("Accept") or ""):
+                    if len(linhas) != 1:
+                        raise ErroPostgrest(
+                            406, "PGRST116",
+                            f"JSON object requested, multiple (or no) rows returned ({len(linhas)})"
+                        )
+                    return self._responder(200, linhas[0], cabecalhos)
+
+                if metodo != "GET" and "return=representation" not in prefer:
+                    return self._responder(201 if metodo == "POST" else 204, None, cabecalhos)
+
+                return self._responder(201 if metodo == "POST" else 200, linhas, cabecalhos)
+
+            except ErroPostgrest as e:
+                self._responder(e.status, e.corpo())
+            except Exception as e:
+                self._responder(500, ErroPostgrest(500, "XX000", str(e)).corpo())
+
+        def do_GET(self):
+            self._tratar("GET")
+
+        def do_HEAD(self):
+            self._tratar("GET")
+
+        def do_POST(self):
+            self._tratar("POST")
+
+        def do_PATCH(self):
+            self._tratar("PATCH")
+
+        def do_DELETE(self):
+            self._tratar("DELETE")
+
+    return Handler
+
+
+class SupabaseLocal:
+    """
+    Servidor em thread própria. Depois de iniciar():
+        url → valor de SUPABASE_URL para o processo sob teste
+        banco → BancoMemoria (semear / inspecionar diretamente)
+    """
+
+    def __init__(
+        self,
+        *,
+        porta: int = 0,
+        latencia_ms: float = SUPABASE_LOCAL_LATENCIA_MS,
+        jitter_ms: float = SUPABASE_LOCAL_JITTER_MS,
+        banco: Optional[BancoMemoria] = None
+    ):
+        self.banco = banco or BancoMemoria()
+        self._servidor = ThreadingHTTPServer(
+            ("127.0.0.1", porta),
+            _criar_handler(self.banco, latencia_ms, jitter_ms)
+        )
+        self._servidor.daemon_threads = True
+        self.url = f"http://127.0.0.1:{self._servidor.server_address[1]}"
+
+    def iniciar(self) -> "SupabaseLocal":
+        threading.Thread(target=self._servidor.serve_forever, name="supabase-local", daemon=True).start()
+        return self
+
+    def parar(self):
+        self._servidor.shutdown()
+        self._servidor.server_close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Supabase local (PostgREST em memória)")
+    parser.add_argument("--porta", type=int, default=54321)
+    parser.add_argument("--latencia-ms", type=float, default=SUPABASE_LOCAL_LATENCIA_MS)
+    parser.add_argument("--jitter-ms", type=float, default=SUPABASE_LOCAL_JITTER_MS)
+    args = parser.parse_args()
+
+    local = SupabaseLocal(porta=args.porta, latencia_ms=args.latencia_ms, jitter_ms=args.jitter_ms).iniciar()
+    print(f"[SUPABASE_LOCAL] Ouvindo em {local.url} | latência {args.latencia_ms}ms + jitter {args.jitter_ms}ms")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        local.parar()
+
+
+if __name__ == "__main__":
+    main()
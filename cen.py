@@ -11,7 +11,6 @@
 # - Sem testes humanos
 
 import os
-import json
 import uuid
 import asyncio
 from datetime import datetime, timezone
@@ -19,9 +18,10 @@ from typing import Optional, Dict, Any, Literal
 
 import httpx
 from fastapi import FastAPI, Header, HTTPException, BackgroundTasks
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
 
+from codec_json import RespostaJSONRapida, RotaJSON, dumps, dumps_str
+
 # ======================================================
 # CONFIGURAÇÕES (OBRIGATÓRIAS VIA ENVIRONMENT - RENDER)
 # ======================================================
@@ -41,9 +41,13 @@ if not ROBO_ENDPOINT or not ROBO_API_KEY:
 app = FastAPI(
     title="CEN — Camada de Eventos Neutra",
     version="1.1.0",
-    description="Recebe eventos neutros, valida, registra e encaminha ao Robô Global."
+    description="Recebe eventos neutros, valida, registra e encaminha ao Robô Global.",
+    default_response_class=RespostaJSONRapida
 )
 
+# Corpo parseado uma única vez, pelo codec rápido
+app.router.route_class = RotaJSON
+
 # ======================================================
 # MODELOS
 # ======================================================
@@ -86,7 +90,7 @@ def utc_now_iso() -> str:
 
 def write_log(entry: Dict[str, Any]) -> None:
     with open(LOG_PATH, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.write(dumps_str(entry) + "\n")
 
 async def forward_to_robo(event: Dict[str, Any]) -> None:
     """
@@ -97,7 +101,7 @@ async def forward_to_robo(event: Dict[str, Any]) -> None:
         async with httpx.AsyncClient(timeout=2.0) as client:
             await client.post(
                 ROBO_ENDPOINT,
-                json=event,
+                content=dumps(event),
                 headers={
                     "X-ROBO-KEY": ROBO_API_KEY,
                     "Content-Type": "application/json"
@@ -152,4 +156,4 @@ async def receive_event(
         }
     )
 
-    return JSONResponse(status_code=202, content={"accepted": True})
+    return RespostaJSONRapida(status_code=202, content={"accepted": True})
@@ -0,0 +1,120 @@
+# codec_json.py — Codec JSON Plugável (parse único + resposta rápida)
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# - Cada corpo de requisição é parseado UMA vez, direto dos bytes brutos
+# - Respostas (principalmente listas grandes) serializadas pelo codec rápido
+# - orjson quando instalado; biblioteca padrão como fallback
+#
+# CODEC_JSON=json força a biblioteca padrão (diagnóstico / comparação).
+# Usado por main.py, cen.py, robo_receiver.py e affiliate/.
+
+import os
+import json
+from datetime import date, datetime
+from decimal import Decimal
+from typing import Any, Callable
+
+from fastapi import Request
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute
+
+CODEC_JSON = os.getenv("CODEC_JSON", "auto")
+
+
+def _padrao(obj: Any) -> Any:
+    """Tipos fora do JSON nativo (mesmo critério do jsonable_encoder)."""
+    if isinstance(obj, Decimal):
+        return int(obj) if obj == obj.to_integral_value() else float(obj)
+    if isinstance(obj, (datetime, date)):
+        return obj.isoformat()
+    if hasattr(obj, "model_dump"):
+        return obj.model_dump()
+    if hasattr(obj, "dict"):
+        return obj.dict()
+    raise TypeError(f"Tipo não serializável em JSON: {type(obj).__name__}")
+
+
+# ======================================================
+# MOTOR — orjson (se disponível) ou biblioteca padrão
+# ======================================================
+
+def _stdlib_loads(dados: Any) -> Any:
+    return json.loads(dados)
+
+
+def _stdlib_dumps(obj: Any) -> bytes:
+    return json.dumps(
+        obj,
+        ensure_ascii=False,
+        separators=(",", ":"),
+        default=_padrao
+    ).encode("utf-8")
+
+
+loads: Callable[[Any], Any] = _stdlib_loads
+dumps: Callable[[Any], bytes] = _stdlib_dumps
+MOTOR = "json"
+
+if CODEC_JSON != "json":
+    try:
+        import orjson
+
+        def _orjson_dumps(obj: Any) -> bytes:
+            return orjson.dumps(obj, default=_padrao, option=orjson.OPT_NON_STR_KEYS)
+
+        loads = orjson.loads
+        dumps = _orjson_dumps
+        MOTOR = "orjson"
+    except ImportError:
+        pass
+
+
+def dumps_str(obj: Any) -> str:
+    return dumps(obj).decode("utf-8")
+
+
+# ======================================================
+# RESPOSTA RÁPIDA
+# ======================================================
+
+class RespostaJSONRapida(JSONResponse):
+    """
+    Resposta serializada pelo codec ativo.
+    Retornar a instância diretamente do endpoint também evita o
+    jsonable_encoder do FastAPI (ganho grande em listas).
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+# ======================================================
+# PARSE ÚNICO DO CORPO
+# ======================================================
+
+class RequisicaoJSON(Request):
+    """
+    request.json() parseado pelo codec, direto dos bytes já lidos,
+    e memorizado: body() + json() no mesmo handler custam um único parse.
+    """
+
+    async def json(self) -> Any:
+        if not hasattr(self, "_json"):
+            self._json = loads(await self.body())
+        return self._json
+
+
+class RotaJSON(APIRoute):
+    """
+    Classe de rota que entrega RequisicaoJSON aos handlers — inclusive ao
+    parse de corpo dos modelos Pydantic feito pelo próprio FastAPI.
+    """
+
+    def get_route_handler(self) -> Callable:
+        original = super().get_route_handler()
+
+        async def handler(request: Request):
+            return await original(RequisicaoJSON(request.scope, request.receive))
+
+        return handler
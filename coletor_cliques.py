@@ -0,0 +1,357 @@
+# coletor_cliques.py — Coletor Assíncrono de Cliques (redirects)
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# O 302 do /go não espera o INSERT do clique. O clique entra em uma fila em
+# memória e uma thread grava em massa (CLIQUES_LOTE linhas por requisição,
+# a cada CLIQUES_INTERVALO_MS).
+#
+# SUPABASE LENTO OU FORA:
+# - lote recusado vai para o arquivo de transbordo do processo (CLIQUES_SPILL_DIR)
+# - fila em memória acima de CLIQUES_MAX_MEMORIA → novos cliques vão direto ao arquivo
+# - com o banco de volta (lote aceito e fila vazia), os arquivos são reenviados
+#   e apagados; arquivos de processos mortos são adotados por quem estiver vivo
+#
+# REENVIO:
+# - o arquivo é regravado sem as linhas já aceitas a cada lote gravado
+# - lote recusado é refeito linha a linha (como o EscritorEmLote); linha que o
+#   banco rejeita por conteúdo (constraint, coluna, tipo) vai para
+#   cliques.<id>.rejeitados e não trava as demais
+# - banco fora no meio do arquivo → o restante fica para o próximo ciclo e o
+#   reenvio segue para o próximo arquivo
+#
+# GARANTIA: pelo menos uma vez. Queda no meio de um reenvio pode repetir
+# o último lote (cliques são métrica, não dinheiro). Tabelas com chave única
+# (chaves_unicas, ex: caminhos.id) são gravadas com upsert ignorando
+# duplicatas, para que a repetição não trave o reenvio.
+
+import os
+import time
+import uuid
+import fcntl
+import threading
+from collections import deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+from supabase import Client
+from postgrest.exceptions import APIError
+
+import codec_json
+
+# ======================================================
+# CONFIGURAÇÕES
+# ======================================================
+
+CLIQUES_LOTE = int(os.getenv("CLIQUES_LOTE", "500"))
+CLIQUES_INTERVALO_MS = int(os.getenv("CLIQUES_INTERVALO_MS", "200"))
+CLIQUES_MAX_MEMORIA = int(os.getenv("CLIQUES_MAX_MEMORIA", "50000"))
+CLIQUES_SPILL_DIR = os.getenv("CLIQUES_SPILL_DIR", "./cliques_spill")
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[CLIQUES] [{nivel}] {mensagem}")
+
+
+def _recusa_definitiva(erro: Exception) -> bool:
+    """
+    O banco respondeu e recusou a linha pelo conteúdo: reenviar não adianta.
+    SQLSTATE 22 (dado inválido), 23 (constraint), 42 (coluna/tabela) e
+    PGRST1xx/2xx (requisição/esquema). PGRST0xx e 5xx são indisponibilidade.
+    """
+    if not isinstance(erro, APIError):
+        return False
+    codigo = str(erro.code or "")
+    return codigo[:2] in ("22", "23", "42") or codigo[:6] in ("PGRST1", "PGRST2")
+
+
+def _processo_vivo(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class ColetorCliques:
+    """
+    Arquivos em CLIQUES_SPILL_DIR (uma linha JSON por clique: {"t": tabela, "l": linha}):
+    - cliques.<pid>.spill          → transbordo do processo vivo (flock enquanto aberto)
+    - cliques.<id>.reenvio         → fechado, aguardando reenvio (qualquer processo)
+    - cliques.<id>.rejeitados      → linhas recusadas pelo banco (+ "erro"), para análise manual
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        tamanho_lote: int = CLIQUES_LOTE,
+        intervalo_ms: int = CLIQUES_INTERVALO_MS,
+        max_memoria: int = CLIQUES_MAX_MEMORIA,
+        diretorio: str = CLIQUES_SPILL_DIR,
+        chaves_unicas: Optional[Dict[str, str]] = None
+    ):
+        self.supabase = supabase
+        self.tamanho_lote = max(1, tamanho_lote)
+        self.intervalo = max(1, intervalo_ms) / 1000.0
+        self.max_memoria = max_memoria
+        self.diretorio = diretorio
+        self.chaves_unicas = chaves_unicas or {}
+
+        self._filas: Dict[str, Deque[Dict[str, Any]]] = {}
+        self._pendentes = 0
+        self._cond = threading.Condition()
+        self._ativo = True
+
+        self._lock_spill = threading.Lock()
+        self._spill = None
+
+        self.cliques = 0
+        self.gravados = 0
+        self.requisicoes = 0
+        self.transbordados = 0
+        self.reenviados = 0
+        self.rejeitados = 0
+        self.falhas = 0
+        self.ultima_falha: Optional[float] = None
+
+        os.makedirs(self.diretorio, exist_ok=True)
+
+        self._thread = threading.Thread(target=self._loop, name="coletor-cliques", daemon=True)
+        self._thread.start()
+
+    # --------------------------------------------------
+    # CAMINHO DO REDIRECT
+    # --------------------------------------------------
+
+    def registrar(self, tabela: str, linha: Dict[str, Any]):
+        """Nunca bloqueia em rede: fila em memória ou, se cheia, arquivo local."""
+        with self._cond:
+            self.cliques += 1
+            if self._pendentes < self.max_memoria:
+                self._filas.setdefault(tabela, deque()).append(linha)
+                self._pendentes += 1
+                if self._pendentes >= self.tamanho_lote:
+                    self._cond.notify()
+                return
+        self._transbordar(tabela, [linha])
+
+    # --------------------------------------------------
+    # TRANSBORDO EM ARQUIVO
+    # --------------------------------------------------
+
+    def _transbordar(self, tabela: str, linhas: List[Dict[str, Any]]):
+        with self._lock_spill:
+            if self._spill is None:
+                self._spill = open(os.path.join(self.diretorio, f"cliques.{os.getpid()}.spill"), "ab")
+                fcntl.flock(self._spill, fcntl.LOCK_EX)
+            self._spill.write(b"".join(codec_json.dumps({"t": tabela, "l": l}) + b"\n" for l in linhas))
+            self._spill.flush()
+            self.transbordados += len(linhas)
+
+    def _fechar_spill(self):
+        """Transbordo atual vira arquivo de reenvio (libera o flock)."""
+        with self._lock_spill:
+            if self._spill is None:
+                return
+            caminho = self._spill.name
+            os.replace(caminho, os.path.join(self.diretorio, f"cliques.{uuid.uuid4().hex}.reenvio"))
+            self._spill.close()
+            self._spill = None
+
+    def _adotar_orfaos(self):
+        """Transbordo de processo morto (flock livre) vira arquivo de reenvio."""
+        proprio = f"cliques.{os.getpid()}.spill"
+        for nome in os.listdir(self.diretorio):
+            if not nome.endswith(".spill") or nome == proprio:
+                continue
+            pid = nome.split(".")[1]
+            if pid.isdigit() and _processo_vivo(int(pid)):
+                continue
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                arquivo = open(caminho, "rb")
+            except FileNotFoundError:
+                continue
+            with arquivo:
+                try:
+                    fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue
+                try:
+                    os.replace(caminho, os.path.join(self.diretorio, f"cliques.{uuid.uuid4().hex}.reenvio"))
+                except FileNotFoundError:
+                    continue
+
+    def _reenviar(self) -> bool:
+        """Reenvia os arquivos de reenvio. False = algum arquivo ficou para o próximo ciclo."""
+        self._fechar_spill()
+        self._adotar_orfaos()
+        ok = True
+        for nome in sorted(n for n in os.listdir(self.diretorio) if n.endswith(".reenvio")):
+            caminho = os.path.join(self.diretorio, nome)
+            try:
+                arquivo = open(caminho, "r+b")
+            except FileNotFoundError:
+                continue
+            with arquivo:
+                try:
+                    fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    continue  # outro worker reenviando
+                if not os.path.exists(caminho):
+                    continue
+
+                por_tabela: Dict[str, List[Dict[str, Any]]] = {}
+                for bruta in arquivo:
+                    try:
+                        registro = codec_json.loads(bruta)
+                    except ValueError:
+                        continue  # última linha truncada por queda
+                    por_tabela.setdefault(registro["t"], []).append(registro["l"])
+
+                if self._reenviar_arquivo(arquivo, nome, por_tabela):
+                    os.remove(caminho)
+                else:
+                    ok = False
+        return ok
+
+    def _reenviar_arquivo(self, arquivo, nome: str, por_tabela: Dict[str, List[Dict[str, Any]]]) -> bool:
+        """Consome por_tabela lote a lote, regravando o arquivo com o que falta após cada lote aceito."""
+        for tabela, linhas in por_tabela.items():
+            while linhas:
+                lote = linhas[:self.tamanho_lote]
+                try:
+                    self._inserir(tabela, lote)
+                    self.reenviados += len(lote)
+                    del linhas[:len(lote)]
+                except Exception:
+                    # Lote recusado: linha a linha isola a linha ruim
+                    while lote:
+                        try:
+                            self._inserir(tabela, lote[:1])
+                            self.reenviados += 1
+                        except Exception as e:
+                            if not _recusa_definitiva(e):
+                                self._falhou(e)
+                                self._regravar(arquivo, por_tabela)
+                                return False
+                            self._rejeitar(nome, tabela, lote[0], e)
+                        del lote[0]
+                        del linhas[0]
+                self._regravar(arquivo, por_tabela)
+        return True
+
+    def _regravar(self, arquivo, por_tabela: Dict[str, List[Dict[str, Any]]]):
+        """Mesmo arquivo (mesmo inode, flock mantido): só as linhas ainda não aceitas."""
+        arquivo.seek(0)
+        for tabela, linhas in por_tabela.items():
+            arquivo.write(b"".join(codec_json.dumps({"t": tabela, "l": l}) + b"\n" for l in linhas))
+        arquivo.truncate()
+        arquivo.flush()
+        os.fsync(arquivo.fileno())
+
+    def _rejeitar(self, nome: str, tabela: str, linha: Dict[str, Any], erro: Exception):
+        caminho = os.path.join(self.diretorio, nome[:-len(".reenvio")] + ".rejeitados")
+        with open(caminho, "ab") as destino:
+            destino.write(codec_json.dumps({"t": tabela, "l": linha, "erro": str(erro)}) + b"\n")
+        self.rejeitados += 1
+        log("WARN", f"Clique recusado pelo banco ({tabela}) movido para {caminho}: {erro}")
+
+    # --------------------------------------------------
+    # GRAVAÇÃO EM MASSA
+    # --------------------------------------------------
+
+    def _inserir(self, tabela: str, linhas: List[Dict[str, Any]]):
+        self.requisicoes += 1
+        chave = self.chaves_unicas.get(tabela)
+        if chave:
+            self.supabase.table(tabela).upsert(linhas, on_conflict=chave, ignore_duplicates=True).execute()
+        else:
+            self.supabase.table(tabela).insert(linhas).execute()
+        self.gravados += len(linhas)
+
+    def _falhou(self, erro: Exception):
+        self.falhas += 1
+        if self.ultima_falha is None or time.monotonic() - self.ultima_falha > 60:
+            log("WARN", f"Supabase recusou cliques, transbordando para {self.diretorio}: {erro}")
+        self.ultima_falha = time.monotonic()
+
+    def _retirar(self) -> List[Tuple[str, List[Dict[str, Any]]]]:
+        """Chamar com self._cond. Até tamanho_lote linhas por tabela."""
+        lotes = []
+        for tabela, fila in self._filas.items():
+            if fila:
+                lote = [fila.popleft() for _ in range(min(len(fila), self.tamanho_lote))]
+                self._pendentes -= len(lote)
+                lotes.append((tabela, lote))
+        return lotes
+
+    def descarregar(self) -> bool:
+        """Esvazia a fila em memória. False = houve lote transbordado para arquivo."""
+        ok = True
+        while True:
+            with self._cond:
+                lotes = self._retirar()
+            if not lotes:
+                return ok
+            for tabela, lote in lotes:
+                if not ok:
+                    self._transbordar(tabela, lote)
+                    continue
+                try:
+                    self._inserir(tabela, lote)
+                except Exception as e:
+                    self._falhou(e)
+                    self._transbordar(tabela, lote)
+                    ok = False
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                if self._ativo and self._pendentes < self.tamanho_lote:
+                    self._cond.wait(self.intervalo)
+                ativo = self._ativo
+            try:
+                if self.descarregar() and (self._spill is not None or self._ha_reenvio()):
+                    self._reenviar()
+            except Exception as e:
+                self._falhou(e)
+            if not ativo:
+                return
+
+    def _ha_reenvio(self) -> bool:
+        return any(n.endswith((".reenvio", ".spill")) for n in os.listdir(self.diretorio))
+
+    # --------------------------------------------------
+    # CICLO DE VIDA / MÉTRICAS
+    # --------------------------------------------------
+
+    def encerrar(self, timeout: float = 10.0):
+        """Grava o que está em memória; o que o banco recusar fica em arquivo para o próximo boot."""
+        with self._cond:
+            self._ativo = False
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+        self._fechar_spill()
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            pendentes = {t: len(f) for t, f in self._filas.items() if f}
+        nomes = os.listdir(self.diretorio)
+        arquivos = [n for n in nomes if n.endswith((".reenvio", ".spill"))]
+        return {
+            "tamanho_lote": self.tamanho_lote,
+            "intervalo_ms": int(self.intervalo * 1000),
+            "pendentes": pendentes,
+            "cliques": self.cliques,
+            "gravados": self.gravados,
+            "requisicoes": self.requisicoes,
+            "transbordados": self.transbordados,
+            "reenviados": self.reenviados,
+            "arquivos_transbordo": len(arquivos),
+            "rejeitados": self.rejeitados,
+            "arquivos_rejeitados": sum(1 for n in nomes if n.endswith(".rejeitados")),
+            "falhas": self.falhas,
+        }
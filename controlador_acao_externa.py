@@ -7,6 +7,7 @@
 from fastapi import APIRouter, Request
 from fastapi.responses import RedirectResponse
 from datetime import datetime, timezone
+from typing import Any, Callable, Dict, Optional
 import logging
 
 # Router dedicado às ações externas
@@ -15,6 +16,14 @@ router = APIRouter()
 # Logger institucional
 logger = logging.getLogger("ROBO-ACQUISITION")
 
+# registrar(tabela, linha) — coletor de cliques do main (não bloqueante)
+_registrar_clique: Optional[Callable[[str, Dict[str, Any]], None]] = None
+
+
+def configurar_coletor_cliques(registrar: Callable[[str, Dict[str, Any]], None]):
+    global _registrar_clique
+    _registrar_clique = registrar
+
 
 @router.get("/go/eduzz/produtividade")
 async def go_eduzz_produtividade(request: Request):
@@ -38,6 +47,20 @@ async def go_eduzz_produtividade(request: Request):
     # Log estruturado (não bloqueante)
     logger.info(f"[ACQUISITION] {evento}")
 
+    # Clique para a tabela clicks, gravado em lote fora da requisição
+    if _registrar_clique is not None:
+        try:
+            _registrar_clique("clicks", {
+                "slug": evento["produto"],
+                "offer_id": None,
+                "origem": evento["origem"],
+                "ip": evento["ip"],
+                "user_agent": evento["user_agent"],
+                "ts": evento["timestamp"]
+            })
+        except Exception as e:
+            logger.warning(f"[ACQUISITION] Falha ao registrar clique: {e}")
+
     # Redirecionamento imediato para o checkout Eduzz
     return RedirectResponse(
         url="https://chk.eduzz.com/801EB01RW7",
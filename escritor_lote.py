@@ -0,0 +1,213 @@
+# escritor_lote.py — Escritor em Lote (micro-batching para o Supabase)
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# Trocar N requisições PostgREST de uma linha por UMA inserção em massa
+# por tabela a cada descarga.
+#
+# REGRAS:
+# - Descarga por tamanho (ESCRITA_LOTE_TAMANHO) ou por idade (ESCRITA_LOTE_IDADE_MS)
+# - Cada linha recebe um Future próprio: o chamador continua vendo a falha
+# - Lote recusado → reenvio linha a linha para isolar a linha inválida
+
+import os
+import time
+import threading
+from concurrent.futures import Future
+from typing import Dict, Any, List, Optional, Tuple
+
+from supabase import Client
+
+ESCRITA_LOTE_TAMANHO = int(os.getenv("ESCRITA_LOTE_TAMANHO", "500"))
+ESCRITA_LOTE_IDADE_MS = int(os.getenv("ESCRITA_LOTE_IDADE_MS", "50"))
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[LOTE] [{nivel}] {mensagem}")
+
+
+class ConfigTabela:
+    """
+    on_conflict + ignore_duplicates → upsert (duplicata resolve o Future com None).
+    chave → colunas usadas para casar as linhas devolvidas com os Futures.
+    """
+
+    def __init__(
+        self,
+        on_conflict: Optional[str] = None,
+        ignore_duplicates: bool = False
+    ):
+        self.on_conflict = on_conflict
+        self.ignore_duplicates = ignore_duplicates
+        self.chave: Optional[Tuple[str, ...]] = (
+            tuple(c.strip() for c in on_conflict.split(",")) if on_conflict else None
+        )
+
+
+class EscritorEmLote:
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        tamanho_max: int = ESCRITA_LOTE_TAMANHO,
+        idade_max_ms: int = ESCRITA_LOTE_IDADE_MS
+    ):
+        self.supabase = supabase
+        self.tamanho_max = max(1, tamanho_max)
+        self.idade_max = idade_max_ms / 1000.0
+
+        self._tabelas: Dict[str, ConfigTabela] = {}
+        self._buffers: Dict[str, List[Tuple[Dict[str, Any], Future]]] = {}
+        self._inicio_buffer: Dict[str, float] = {}
+        self._cond = threading.Condition()
+        self._ativo = True
+
+        self.linhas = 0
+        self.requisicoes = 0
+        self.falhas = 0
+
+        self._thread = threading.Thread(target=self._loop, name="escritor-lote", daemon=True)
+        self._thread.start()
+
+    def configurar_tabela(self, tabela: str, **kwargs):
+        self._tabelas[tabela] = ConfigTabela(**kwargs)
+
+    # --------------------------------------------------
+    # ENFILEIRAMENTO
+    # --------------------------------------------------
+
+    def enviar(self, tabela: str, linha: Dict[str, Any]) -> Future:
+        """
+        Future resolvido com a linha gravada (como devolvida pelo PostgREST),
+        ou None quando o upsert ignorou uma duplicata.
+        """
+        futuro: Future = Future()
+        with self._cond:
+            if not self._ativo:
+                raise RuntimeError("Escritor em lote encerrado")
+            buffer = self._buffers.setdefault(tabela, [])
+            if not buffer:
+                self._inicio_buffer[tabela] = time.monotonic()
+            buffer.append((linha, futuro))
+            # Primeira linha arma o relógio de idade; tamanho máximo descarrega já
+            if len(buffer) == 1 or len(buffer) >= self.tamanho_max:
+                self._cond.notify()
+        return futuro
+
+    # --------------------------------------------------
+    # DESCARGA
+    # --------------------------------------------------
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while self._ativo:
+                    prontos = self._tabelas_prontas()
+                    if prontos:
+                        break
+                    self._cond.wait(timeout=self._espera())
+                else:
+                    prontos = [t for t, b in self._buffers.items() if b]
+
+                lotes = []
+                for t in prontos:
+                    buffer = self._buffers[t]
+                    lotes.append((t, buffer[:self.tamanho_max]))
+                    del buffer[:self.tamanho_max]
+                encerrar = not self._ativo and not any(self._buffers.values())
+
+            for tabela, lote in lotes:
+                self._descarregar(tabela, lote)
+
+            if encerrar:
+                return
+
+    def _tabelas_prontas(self) -> List[str]:
+        agora = time.monotonic()
+        return [
+            t for t, b in self._buffers.items()
+            if b and (len(b) >= self.tamanho_max or agora - self._inicio_buffer[t] >= self.idade_max)
+        ]
+
+    def _espera(self) -> Optional[float]:
+        if not any(self._buffers.values()):
+            return None
+        agora = time.monotonic()
+        mais_antigo = min(self._inicio_buffer[t] for t, b in self._buffers.items() if b)
+        return max(0.0, self.idade_max - (agora - mais_antigo))
+
+    def _executar(self, tabela: str, linhas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        config = self._tabelas.get(tabela) or ConfigTabela()
+        query = self.supabase.table(tabela)
+        if config.on_conflict:
+            query = query.upsert(
+                linhas,
+                on_conflict=config.on_conflict,
+                ignore_duplicates=config.ignore_duplicates
+            )
+        else:
+            query = query.insert(linhas)
+        self.requisicoes += 1
+        return query.execute().data or []
+
+    def _descarregar(self, tabela: str, lote: List[Tuple[Dict[str, Any], Future]]):
+        linhas = [linha for linha, _ in lote]
+        try:
+            devolvidas = self._executar(tabela, linhas)
+        except Exception as e:
+            log("WARN", f"Lote de {len(lote)} em {tabela} recusado, isolando linhas: {e}")
+            self._descarregar_individual(tabela, lote)
+            return
+
+        self.linhas += len(lote)
+        self._resolver(tabela, lote, devolvidas)
+
+    def _descarregar_individual(self, tabela: str, lote: List[Tuple[Dict[str, Any], Future]]):
+        for linha, futuro in lote:
+            try:
+                devolvidas = self._executar(tabela, [linha])
+            except Exception as e:
+                self.falhas += 1
+                futuro.set_exception(e)
+                continue
+            self.linhas += 1
+            futuro.set_result(devolvidas[0] if devolvidas else None)
+
+    def _resolver(self, tabela: str, lote, devolvidas: List[Dict[str, Any]]):
+        config = self._tabelas.get(tabela) or ConfigTabela()
+
+        if not config.chave:
+            # Insert simples: PostgREST devolve na mesma ordem do envio
+            for i, (_, futuro) in enumerate(lote):
+                futuro.set_result(devolvidas[i] if i < len(devolvidas) else None)
+            return
+
+        # Upsert: só voltam as linhas efetivamente gravadas → casar pela chave
+        por_chave = {tuple(str(d.get(c)) for c in config.chave): d for d in devolvidas}
+        for linha, futuro in lote:
+            futuro.set_result(por_chave.pop(tuple(str(linha.get(c)) for c in config.chave), None))
+
+    # --------------------------------------------------
+    # CICLO DE VIDA / MÉTRICAS
+    # --------------------------------------------------
+
+    def encerrar(self, timeout: float = 10.0):
+        """Descarrega tudo o que estiver pendente e para a thread."""
+        with self._cond:
+            self._ativo = False
+            self._cond.notify()
+        self._thread.join(timeout=timeout)
+
+    def status(self) -> Dict[str, Any]:
+        with self._cond:
+            pendentes = {t: len(b) for t, b in self._buffers.items() if b}
+        return {
+            "tamanho_max": self.tamanho_max,
+            "idade_max_ms": int(self.idade_max * 1000),
+            "pendentes": pendentes,
+            "linhas": self.linhas,
+            "requisicoes": self.requisicoes,
+            "linhas_por_requisicao": round(self.linhas / self.requisicoes, 2) if self.requisicoes else 0.0,
+            "falhas": self.falhas
+        }
@@ -0,0 +1,205 @@
+# estado_compartilhado.py — Estado Global Compartilhado entre Workers (mmap)
+# ROBO GLOBAL AI
+#
+# Dicionário de campos fixos gravado em um arquivo mapeado em memória
+# (/dev/shm por padrão). Todos os workers do uvicorn enxergam o mesmo
+# capital, risco e estado operacional; /governanca/desligar vale para todos.
+#
+# CONCORRÊNCIA:
+# - escrita: threading.RLock (threads do processo) + flock exclusivo (processos)
+# - leitura: sem trava, por seqlock (contador ímpar = escrita em andamento → relê);
+#   após LEITURA_MAX_TENTATIVAS releituras cai para a leitura travada (flock),
+#   que conserta o contador ímpar deixado por um escritor morto no meio da escrita
+# - transacao(): leitura-cálculo-escrita atômica; "estado[x] += v" dentro dela
+#   não perde incremento de outra thread ou processo
+
+import os
+import mmap
+import fcntl
+import struct
+import hashlib
+import tempfile
+import threading
+from contextlib import contextmanager
+from collections.abc import MutableMapping
+from typing import Any, Dict, Iterator, Optional
+
+# Arquivo padrão por processo-pai: os workers de um mesmo uvicorn/gunicorn
+# compartilham o estado; um novo deploy (novo master) começa do zero.
+DIRETORIO_PADRAO = "/dev/shm" if os.path.isdir("/dev/shm") else tempfile.gettempdir()
+
+# O pid do pai sozinho não separa deploys: sob systemd ou num container o
+# pai é 1 para todos. O diretório da aplicação entra no nome do arquivo.
+_APLICACAO = hashlib.sha1(os.path.dirname(os.path.abspath(__file__)).encode()).hexdigest()[:12]
+
+
+def arquivo_padrao(nome: str, extensao: str = "") -> str:
+    """Caminho em DIRETORIO_PADRAO único por (diretório da aplicação, processo-pai)."""
+    return os.path.join(DIRETORIO_PADRAO, f"{nome}.{_APLICACAO}.{os.getppid()}{extensao}")
+
+_CABECALHO = struct.Struct("<QQ")  # seqlock, inicializado
+
+# Releituras sem trava antes de cair para a leitura com flock
+LEITURA_MAX_TENTATIVAS = 1000
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[ESTADO] [{nivel}] {mensagem}")
+
+
+class EstadoCompartilhado(MutableMapping):
+    """
+    campos: nome → formato struct ("d" = float, "16s" = texto até 16 bytes).
+    Chaves fixas: não há inclusão nem remoção de campos.
+    """
+
+    def __init__(self, caminho: str, campos: Dict[str, str], inicial: Dict[str, Any]):
+        self.caminho = caminho
+        self.campos = dict(campos)
+        self._formato = struct.Struct("<" + "".join(campos.values()))
+        self._tamanho = _CABECALHO.size + self._formato.size
+
+        self._lock = threading.RLock()
+        self._local = threading.local()
+
+        # True só no processo que criou o arquivo (ex: quem reconstrói o estado no boot)
+        self.criado = False
+
+        self._arquivo = open(caminho, "a+b")
+        fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+        try:
+            os.ftruncate(self._arquivo.fileno(), max(self._tamanho, os.fstat(self._arquivo.fileno()).st_size))
+            self._mapa = mmap.mmap(self._arquivo.fileno(), self._tamanho)
+            _, inicializado = _CABECALHO.unpack_from(self._mapa, 0)
+            if not inicializado:
+                self._gravar(inicial)
+                _CABECALHO.pack_into(self._mapa, 0, 0, 1)
+                self.criado = True
+                log("INFO", f"Estado compartilhado criado em {caminho}")
+        finally:
+            fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+
+    # --------------------------------------------------
+    # CODIFICAÇÃO
+    # --------------------------------------------------
+
+    def _codificar(self, valores: Dict[str, Any]) -> tuple:
+        saida = []
+        for nome, formato in self.campos.items():
+            valor = valores[nome]
+            if formato.endswith("s"):
+                valor = str(valor).encode()
+            saida.append(valor)
+        return tuple(saida)
+
+    def _decodificar(self, brutos: tuple) -> Dict[str, Any]:
+        valores = {}
+        for (nome, formato), valor in zip(self.campos.items(), brutos):
+            if formato.endswith("s"):
+                valor = valor.rstrip(b"\0").decode()
+            valores[nome] = valor
+        return valores
+
+    # --------------------------------------------------
+    # LEITURA (SEQLOCK) / ESCRITA (TRAVADA)
+    # --------------------------------------------------
+
+    def _ler(self) -> Dict[str, Any]:
+        for _ in range(LEITURA_MAX_TENTATIVAS):
+            antes, _ = _CABECALHO.unpack_from(self._mapa, 0)
+            if antes & 1:
+                continue
+            brutos = self._formato.unpack_from(self._mapa, _CABECALHO.size)
+            depois, _ = _CABECALHO.unpack_from(self._mapa, 0)
+            if antes == depois:
+                return self._decodificar(brutos)
+
+        # Contador ímpar persistente: escrita longa ou escritor morto. Com a
+        # trava exclusiva nenhuma escrita está em andamento (o flock de um
+        # processo morto é liberado pelo kernel).
+        with self._lock:
+            fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+            try:
+                return self._ler_travado()
+            finally:
+                fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+
+    def _ler_travado(self) -> Dict[str, Any]:
+        """Chamar com a trava exclusiva."""
+        self._reparar()
+        return self._decodificar(self._formato.unpack_from(self._mapa, _CABECALHO.size))
+
+    def _reparar(self):
+        """Chamar com a trava exclusiva: fecha o contador ímpar de uma escrita interrompida."""
+        seq, inicializado = _CABECALHO.unpack_from(self._mapa, 0)
+        if seq & 1:
+            _CABECALHO.pack_into(self._mapa, 0, seq + 1, inicializado)
+            log("WARN", f"Seqlock ímpar ({seq}) encontrado sob a trava — escrita interrompida, contador reparado")
+
+    def _gravar(self, valores: Dict[str, Any]):
+        """Chamar com a trava exclusiva."""
+        self._reparar()
+        seq, inicializado = _CABECALHO.unpack_from(self._mapa, 0)
+        _CABECALHO.pack_into(self._mapa, 0, seq + 1, inicializado)
+        self._formato.pack_into(self._mapa, _CABECALHO.size, *self._codificar(valores))
+        _CABECALHO.pack_into(self._mapa, 0, seq + 2, inicializado)
+
+    @contextmanager
+    def transacao(self) -> Iterator[Dict[str, Any]]:
+        """
+        Trava exclusiva entre threads e processos. Reentrante: transações
+        aninhadas (mesma thread) compartilham o mesmo rascunho, gravado
+        uma vez ao sair da mais externa.
+        """
+        pendente: Optional[Dict[str, Any]] = getattr(self._local, "pendente", None)
+        if pendente is not None:
+            yield pendente
+            return
+
+        with self._lock:
+            fcntl.flock(self._arquivo, fcntl.LOCK_EX)
+            try:
+                self._local.pendente = pendente = self._ler_travado()
+                try:
+                    yield pendente
+                finally:
+                    self._local.pendente = None
+                self._gravar(pendente)
+            finally:
+                fcntl.flock(self._arquivo, fcntl.LOCK_UN)
+
+    # --------------------------------------------------
+    # INTERFACE DE DICIONÁRIO
+    # --------------------------------------------------
+
+    def __getitem__(self, chave: str) -> Any:
+        if chave not in self.campos:
+            raise KeyError(chave)
+        pendente = getattr(self._local, "pendente", None)
+        if pendente is not None:
+            return pendente[chave]
+        return self._ler()[chave]
+
+    def __setitem__(self, chave: str, valor: Any):
+        if chave not in self.campos:
+            raise KeyError(chave)
+        with self.transacao() as estado:
+            estado[chave] = valor
+
+    def __delitem__(self, chave: str):
+        raise TypeError("EstadoCompartilhado tem campos fixos")
+
+    def __iter__(self):
+        return iter(self.campos)
+
+    def __len__(self) -> int:
+        return len(self.campos)
+
+    def copia(self) -> Dict[str, Any]:
+        """Retrato consistente de todos os campos (uma leitura)."""
+        pendente = getattr(self._local, "pendente", None)
+        return dict(pendente) if pendente is not None else self._ler()
+
+    def fechar(self):
+        self._mapa.close()
+        self._arquivo.close()
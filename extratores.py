@@ -0,0 +1,299 @@
+# extratores.py — Extratores Declarativos de Payload por Plataforma
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# UMA especificação por plataforma (caminhos + alternativas + tipo),
+# montada UMA vez na importação em um leitor (closure) por campo.
+# Uma única passada no dict gera:
+# - os campos da venda (pipeline_financeiro_real)
+# - os campos do EventoFinanceiro (camada soberana)
+#
+# Usado por main.py e pelos routers de affiliate/.
+
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Optional, Tuple
+
+
+class CampoAusente(KeyError):
+    """Campo obrigatório ausente no payload da plataforma."""
+
+
+class Campo:
+    """
+    caminhos → alternativas em ordem de preferência; vence a primeira
+    presente e não vazia.
+    """
+
+    def __init__(
+        self,
+        *caminhos: Tuple[str, ...],
+        tipo: Optional[Callable[[Any], Any]] = str,
+        obrigatorio: bool = False,
+        padrao: Any = None
+    ):
+        self.caminhos = caminhos
+        self.tipo = tipo
+        self.obrigatorio = obrigatorio
+        self.padrao = padrao
+
+
+# ======================================================
+# ESPECIFICAÇÕES POR PLATAFORMA
+# ======================================================
+
+ESPECIFICACOES: Dict[str, Dict[str, Campo]] = {
+    "HOTMART": {
+        "external_sale_id": Campo(("data", "purchase", "transaction"), obrigatorio=True),
+        "product_id": Campo(("data", "product", "id"), obrigatorio=True),
+        "gross_value": Campo(("data", "purchase", "price", "value"), tipo=float, obrigatorio=True),
+        "commission_total": Campo(("data", "purchase", "commission", "value"), tipo=float, obrigatorio=True),
+        "partner_id": Campo(("data", "affiliate", "affiliate_code")),
+        "moeda": Campo(("data", "purchase", "price", "currency"), padrao="BRL"),
+        "origem_evento": Campo(("event",), padrao="HOTMART"),
+    },
+    "EDUZZ": {
+        # Eduzz envia formatos diferentes conforme a versão do webhook
+        "external_sale_id": Campo(("sale", "id"), ("data", "sale_id"), obrigatorio=True),
+        "product_id": Campo(
+            ("product", "id"), ("data", "product_id"), ("data", "product", "id"), ("product_id",),
+            obrigatorio=True
+        ),
+        "gross_value": Campo(
+            ("sale", "value"), ("data", "value"), ("data", "amount"), ("data", "price"),
+            ("value",), ("amount",), ("price",),
+            tipo=float, obrigatorio=True
+        ),
+        "commission_total": Campo(
+            ("sale", "commission"), ("data", "commission"), ("data", "commission_value"),
+            ("commission",), ("commission_value",),
+            tipo=float, obrigatorio=True
+        ),
+        "partner_id": Campo(("affiliate", "id"), ("data", "affiliate", "id")),
+        "moeda": Campo(("sale", "currency"), ("data", "currency"), padrao="BRL"),
+        "origem_evento": Campo(("event_type",), ("event",), ("type",), ("name",), padrao="EDUZZ"),
+    },
+    "MONETIZZE": {
+        "external_sale_id": Campo(("venda", "codigo"), obrigatorio=True),
+        "product_id": Campo(("produto", "codigo"), obrigatorio=True),
+        "gross_value": Campo(("venda", "valor"), tipo=float, obrigatorio=True),
+        "commission_total": Campo(("venda", "comissao"), tipo=float, obrigatorio=True),
+        "partner_id": Campo(("afiliado", "codigo")),
+        "moeda": Campo(("moeda",), padrao="BRL"),
+        "origem_evento": Campo(("tipo",), padrao="MONETIZZE"),
+    },
+}
+
+# Campos de venda entregues a pipeline_financeiro_real
+CAMPOS_VENDA = ("external_sale_id", "product_id", "gross_value", "commission_total", "partner_id")
+# Todos os campos de uma especificação, na ordem de leitura
+CAMPOS = CAMPOS_VENDA + ("moeda", "origem_evento")
+
+
+# ======================================================
+# COMPILADOR
+# ======================================================
+
+class _Lento(Exception):
+    """Caminho rápido não se aplica a este payload → caminho completo."""
+
+
+_FALHAS_RAPIDO = (KeyError, IndexError, TypeError, ValueError, AttributeError, _Lento)
+
+_VAZIO: Dict[str, Any] = {}
+
+
+def _caminho(p: Any, caminho: Tuple[str, ...]) -> Any:
+    for chave in caminho:
+        if p.__class__ is not dict:
+            return None
+        p = p.get(chave)
+    return p
+
+
+def _rapido(definicao: Campo) -> Callable[[Any], Any]:
+    """
+    Campo no formato principal em UMA chamada, sem alternativas: indexação
+    direta para obrigatório, .get encadeado para opcional (ausência é normal).
+    Qualquer desvio levanta uma de _FALHAS_RAPIDO → caminho completo.
+    """
+    caminho = definicao.caminhos[0]
+    tipo = definicao.tipo
+    padrao = definicao.padrao
+    alternativas = len(definicao.caminhos) > 1
+
+    if definicao.obrigatorio:
+        if tipo is float:
+            # None → TypeError, '' → ValueError: ambos caem no caminho completo
+            def ler_float(p):
+                for chave in caminho:
+                    p = p[chave]
+                return float(p)
+            return ler_float
+
+        def ler_obrigatorio(p):
+            for chave in caminho:
+                p = p[chave]
+            if not p:
+                raise _Lento
+            if tipo is str:
+                return p if p.__class__ is str else str(p)
+            return p if tipo is None else tipo(p)
+        return ler_obrigatorio
+
+    *prefixo, ultima = caminho
+
+    def ler_opcional(p):
+        for chave in prefixo:
+            p = p.get(chave) or _VAZIO
+        p = p.get(ultima)
+        if p is None or p == "":
+            if alternativas:
+                raise _Lento
+            return padrao
+        return p if tipo is None else tipo(p)
+    return ler_opcional
+
+
+def _leitor(plataforma: str, campo: str, definicao: Campo) -> Callable[[Any, bool], Any]:
+    """
+    Leitor completo de UM campo: primeira alternativa presente e não vazia,
+    convertida por tipo. Ausente → padrão (ou CampoAusente, se obrigatório e
+    estrito); estrito=False → conversão inválida vira None.
+    """
+    caminhos = definicao.caminhos
+    tipo = definicao.tipo
+    padrao = definicao.padrao
+    obrigatorio = definicao.obrigatorio
+    nome = f"{plataforma}.{campo}"
+
+    def ler(p: Any, estrito: bool) -> Any:
+        for caminho in caminhos:
+            valor = _caminho(p, caminho)
+            if valor is not None and valor != "":
+                break
+        else:
+            if obrigatorio and estrito:
+                raise CampoAusente(nome)
+            return padrao
+
+        if tipo is None or valor == padrao:
+            return valor
+        if estrito:
+            return tipo(valor)
+        try:
+            return tipo(valor)
+        except (TypeError, ValueError):
+            return None
+
+    return ler
+
+
+def _compilar(plataforma: str, spec: Dict[str, Campo]) -> Callable[..., Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Monta, uma vez, dois caminhos com closures (sem geração de código):
+
+    RÁPIDO (estrito, formato principal da plataforma):
+    - um leitor por campo, só o caminho principal
+    - qualquer desvio do formato principal cai no caminho completo
+
+    COMPLETO (alternativas, padrões, modo não estrito):
+    - um leitor por campo; alternativas avaliadas só quando a anterior falta
+
+    Campos lidos na ordem de CAMPOS (o primeiro obrigatório ausente é o relatado).
+    """
+    if set(spec) != set(CAMPOS):
+        raise ValueError(f"Especificação de {plataforma} deve ter exatamente os campos {CAMPOS}")
+    rapidos = [_rapido(spec[campo]) for campo in CAMPOS]
+    leitores = [_leitor(plataforma, campo, spec[campo]) for campo in CAMPOS]
+
+    def extrair(p: Any, estrito: bool = True) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+        valores = None
+        if estrito:
+            try:
+                valores = [ler(p) for ler in rapidos]
+            except _FALHAS_RAPIDO:
+                pass
+        if valores is None:
+            valores = [ler(p, estrito) for ler in leitores]
+
+        venda_id, produto, bruto, comissao, parceiro, moeda, origem = valores
+        venda = {
+            "platform": plataforma,
+            "external_sale_id": venda_id,
+            "product_id": produto,
+            "gross_value": bruto,
+            "commission_total": comissao,
+            "partner_id": parceiro,
+        }
+        evento = {
+            "plataforma": plataforma,
+            "oferta": produto,
+            "valor_bruto": bruto if bruto is not None else 0.0,
+            "moeda": moeda,
+            "status": "APROVADO",
+            "origem_evento": origem,
+        }
+        return venda, evento
+
+    extrair.__name__ = f"extrair_{plataforma.lower()}"
+    return extrair
+
+
+EXTRATORES: Dict[str, Callable[..., Tuple[Dict[str, Any], Dict[str, Any]]]] = {
+    plataforma: _compilar(plataforma, spec) for plataforma, spec in ESPECIFICACOES.items()
+}
+
+
+def extrair_evento(
+    plataforma: str,
+    payload: Dict[str, Any],
+    estrito: bool = True
+) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """
+    Retorna (venda, evento):
+    - venda  → kwargs de pipeline_financeiro_real (sem payload)
+    - evento → kwargs de EventoFinanceiro (sem recebido_em)
+
+    estrito=False → campos ausentes/inválidos viram None em vez de erro.
+    """
+    return EXTRATORES[plataforma](payload, estrito)
+
+
+# ======================================================
+# INSTANTE DA VENDA (REPLAY DE EVENTOS ANTIGOS)
+# ======================================================
+
+# Caminhos do instante da compra, em ordem de preferência. O webhook ao vivo
+# usa a hora do recebimento; o replay precisa da hora original da venda.
+INSTANTES: Dict[str, Tuple[Tuple[str, ...], ...]] = {
+    "HOTMART": (("data", "purchase", "approved_date"), ("data", "purchase", "order_date"), ("creation_date",)),
+    "EDUZZ": (("sale", "date"), ("data", "paid_at"), ("data", "created_at"), ("created_at",), ("date",)),
+    "MONETIZZE": (("venda", "dataFinalizada"), ("venda", "dataInicio")),
+}
+
+# Datas sem fuso das plataformas brasileiras estão no horário de Brasília
+FUSO_PLATAFORMAS = timezone(timedelta(hours=-3))
+
+
+def converter_instante(valor: Any) -> Optional[datetime]:
+    """Epoch (s ou ms, número ou texto), ISO 8601 ou "AAAA-MM-DD HH:MM:SS"; None se irreconhecível."""
+    if valor is None or valor == "" or isinstance(valor, bool):
+        return None
+    try:
+        if isinstance(valor, (int, float)) or (isinstance(valor, str) and valor.isdigit()):
+            numero = float(valor)
+            # Epoch em milissegundos (Hotmart) a partir de 1973 em segundos
+            return datetime.fromtimestamp(numero / 1000 if numero > 1e11 else numero, timezone.utc)
+        instante = datetime.fromisoformat(str(valor).strip().replace("Z", "+00:00"))
+    except (TypeError, ValueError, OverflowError, OSError):
+        return None
+    return instante if instante.tzinfo else instante.replace(tzinfo=FUSO_PLATAFORMAS)
+
+
+def instante_evento(plataforma: str, payload: Dict[str, Any]) -> Optional[datetime]:
+    """Instante da compra informado pela plataforma; None quando o payload não traz."""
+    for caminho in INSTANTES.get(plataforma, ()):
+        instante = converter_instante(_caminho(payload, caminho))
+        if instante is not None:
+            return instante
+    return None
@@ -0,0 +1,308 @@
+# fila_webhooks.py — Fila Durável de Webhooks (ACEITAR → PROCESSAR)
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# O handler HTTP apenas valida a assinatura, grava o corpo bruto em um
+# journal local (write-ahead) e responde. Um pool de workers drena o
+# journal pelos pipelines existentes.
+#
+# GARANTIAS:
+# - Pelo menos uma vez (at-least-once): nada é confirmado antes de processar
+# - Journal com fsync antes da resposta à plataforma
+# - Reprocessamento automático após restart (tudo acima da marca d'água)
+# - Falhas definitivas vão para dead-letter, nunca são descartadas
+
+import os
+import time
+import queue
+import fcntl
+import threading
+from typing import Callable, Dict, Any, Optional, Tuple
+
+import codec_json
+from extratores import CampoAusente
+
+# ======================================================
+# CONFIGURAÇÕES
+# ======================================================
+
+WEBHOOK_FILA_DIR = os.getenv("WEBHOOK_FILA_DIR", "./fila_webhooks")
+WEBHOOK_FILA_WORKERS = int(os.getenv("WEBHOOK_FILA_WORKERS", "4"))
+WEBHOOK_FILA_TENTATIVAS = int(os.getenv("WEBHOOK_FILA_TENTATIVAS", "5"))
+WEBHOOK_FILA_FSYNC = os.getenv("WEBHOOK_FILA_FSYNC", "1") == "1"
+WEBHOOK_FILA_COMPACTAR_BYTES = int(os.getenv("WEBHOOK_FILA_COMPACTAR_BYTES", str(64 * 1024 * 1024)))
+WEBHOOK_FILA_MAX_SLOTS = 64
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[FILA] [{nivel}] {mensagem}")
+
+
+# ======================================================
+# MARCA D'ÁGUA — CONFIRMAÇÃO FORA DE ORDEM
+# ======================================================
+
+class MarcaDagua:
+    """
+    Maior sequência N tal que TODAS as sequências <= N foram concluídas.
+    Workers concluem fora de ordem; a marca só avança de forma contígua.
+    """
+
+    def __init__(self, inicial: int = 0):
+        self.valor = inicial
+        self._concluidos = set()
+        self._lock = threading.Lock()
+
+    def concluir(self, seq: int) -> bool:
+        """Retorna True se a marca avançou."""
+        with self._lock:
+            if seq <= self.valor:
+                return False
+            self._concluidos.add(seq)
+            avancou = False
+            while (self.valor + 1) in self._concluidos:
+                self._concluidos.remove(self.valor + 1)
+                self.valor += 1
+                avancou = True
+            return avancou
+
+
+# ======================================================
+# FILA DURÁVEL
+# ======================================================
+
+class FilaWebhooks:
+    """
+    Journal append-only por processo (slot com flock) + pool de workers.
+
+    Arquivos por slot:
+    - webhooks.<slot>.wal  → uma linha JSON por entrega aceita
+    - webhooks.<slot>.ack  → marca d'água confirmada
+    - webhooks.<slot>.dlq  → entregas que esgotaram as tentativas
+    """
+
+    def __init__(
+        self,
+        processador: Callable[[str, Dict[str, Any]], Any],
+        *,
+        diretorio: str = WEBHOOK_FILA_DIR,
+        workers: int = WEBHOOK_FILA_WORKERS,
+        tentativas: int = WEBHOOK_FILA_TENTATIVAS
+    ):
+        self.processador = processador
+        self.diretorio = diretorio
+        self.workers = max(1, workers)
+        self.tentativas = max(1, tentativas)
+
+        self._fila: "queue.Queue[Tuple[int, str, str, float]]" = queue.Queue()
+        self._lock_journal = threading.Lock()
+        self._pendentes: Dict[int, float] = {}
+        self._lock_pendentes = threading.Lock()
+        # concluir + gravar .ack serializados: um único .tmp e a marca gravada só avança
+        self._lock_ack = threading.Lock()
+
+        self.processados = 0
+        self.falhas = 0
+        self.dead_letter = 0
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.slot, self._trava = self._adquirir_slot()
+        base = os.path.join(self.diretorio, f"webhooks.{self.slot}")
+        self.caminho_wal = base + ".wal"
+        self.caminho_ack = base + ".ack"
+        self.caminho_dlq = base + ".dlq"
+
+        self.marca = MarcaDagua(self._ler_ack())
+        self._ultimo_seq = self.marca.valor
+        self._recuperar()
+        self._wal = open(self.caminho_wal, "a", encoding="utf-8")
+
+    # --------------------------------------------------
+    # SLOT EXCLUSIVO (um journal por processo uvicorn)
+    # --------------------------------------------------
+
+    def _adquirir_slot(self):
+        for slot in range(WEBHOOK_FILA_MAX_SLOTS):
+            trava = open(os.path.join(self.diretorio, f"webhooks.{slot}.lock"), "w")
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot, trava
+            except OSError:
+                trava.close()
+        raise RuntimeError("Nenhum slot de fila de webhooks disponível")
+
+    # --------------------------------------------------
+    # RECUPERAÇÃO
+    # --------------------------------------------------
+
+    def _ler_ack(self) -> int:
+        try:
+            with open(self.caminho_ack, "r", encoding="utf-8") as f:
+                return int(f.read().strip() or 0)
+        except FileNotFoundError:
+            return 0
+
+    def _gravar_ack(self, valor: int):
+        tmp = self.caminho_ack + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            f.write(str(valor))
+        os.replace(tmp, self.caminho_ack)
+
+    def _recuperar(self):
+        reenfileirados = 0
+        try:
+            with open(self.caminho_wal, "r", encoding="utf-8") as f:
+                for linha in f:
+                    try:
+                        entrada = codec_json.loads(linha)
+                    except ValueError:
+                        # Última linha truncada por queda antes do fsync
+                        continue
+                    seq = entrada["seq"]
+                    self._ultimo_seq = max(self._ultimo_seq, seq)
+                    if seq > self.marca.valor:
+                        self._enfileirar(seq, entrada["plataforma"], entrada["corpo"], entrada["recebido_em"])
+                        reenfileirados += 1
+        except FileNotFoundError:
+            pass
+
+        if reenfileirados:
+            log("WARN", f"Slot {self.slot}: {reenfileirados} webhooks reenfileirados após restart")
+
+    # --------------------------------------------------
+    # PUBLICAÇÃO (CAMINHO DO HANDLER HTTP)
+    # --------------------------------------------------
+
+    def publicar(self, plataforma: str, corpo: bytes) -> int:
+        """
+        Grava no journal e enfileira. Só retorna após o fsync:
+        a partir daqui a entrega sobrevive a uma queda do processo.
+        """
+        texto = corpo.decode("utf-8")
+        recebido_em = time.time()
+
+        with self._lock_journal:
+            self._ultimo_seq += 1
+            seq = self._ultimo_seq
+            self._wal.write(codec_json.dumps_str({
+                "seq": seq,
+                "plataforma": plataforma,
+                "corpo": texto,
+                "recebido_em": recebido_em
+            }) + "\n")
+            self._wal.flush()
+            if WEBHOOK_FILA_FSYNC:
+                os.fsync(self._wal.fileno())
+
+        self._enfileirar(seq, plataforma, texto, recebido_em)
+        return seq
+
+    def _enfileirar(self, seq: int, plataforma: str, texto: str, recebido_em: float):
+        with self._lock_pendentes:
+            self._pendentes[seq] = recebido_em
+        self._fila.put((seq, plataforma, texto, recebido_em))
+
+    # --------------------------------------------------
+    # WORKERS
+    # --------------------------------------------------
+
+    def iniciar(self):
+        for i in range(self.workers):
+            threading.Thread(
+                target=self._loop_worker,
+                name=f"fila-webhooks-{i}",
+                daemon=True
+            ).start()
+        log("INFO", f"Fila de webhooks ativa | slot {self.slot} | {self.workers} workers")
+
+    def _loop_worker(self):
+        # Nenhuma exceção encerra o worker: thread morta deixaria a fila sem consumo
+        while True:
+            seq, plataforma, texto, recebido_em = self._fila.get()
+            try:
+                self._processar(seq, plataforma, texto)
+            except Exception as e:
+                log("ERRO", f"Seq {seq} ({plataforma}) falhou fora do processador: {e}")
+            try:
+                self._concluir(seq)
+            except Exception as e:
+                log("ERRO", f"Falha ao confirmar seq {seq} (nova gravação do .ack na próxima conclusão): {e}")
+            finally:
+                self._fila.task_done()
+
+    def _processar(self, seq: int, plataforma: str, texto: str):
+        ultimo_erro: Optional[Exception] = None
+
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                self.processador(plataforma, codec_json.loads(texto))
+                self.processados += 1
+                return
+            except (ValueError, CampoAusente) as e:
+                # JSON inválido ou campo obrigatório ausente nunca melhora com nova tentativa
+                ultimo_erro = e
+                break
+            except Exception as e:
+                ultimo_erro = e
+                self.falhas += 1
+                log("WARN", f"Seq {seq} ({plataforma}) falhou na tentativa {tentativa}: {e}")
+                time.sleep(min(2 ** tentativa * 0.1, 5.0))
+
+        self.dead_letter += 1
+        log("ERRO", f"Seq {seq} ({plataforma}) enviado para dead-letter: {ultimo_erro}")
+        with self._lock_journal:
+            with open(self.caminho_dlq, "a", encoding="utf-8") as f:
+                f.write(codec_json.dumps_str({
+                    "seq": seq,
+                    "plataforma": plataforma,
+                    "corpo": texto,
+                    "erro": str(ultimo_erro),
+                    "falhou_em": time.time()
+                }) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def _concluir(self, seq: int):
+        with self._lock_pendentes:
+            self._pendentes.pop(seq, None)
+
+        with self._lock_ack:
+            if not self.marca.concluir(seq):
+                return
+            self._gravar_ack(self.marca.valor)
+        self._compactar_se_ocioso()
+
+    def _compactar_se_ocioso(self):
+        """
+        Journal totalmente confirmado e grande → trunca.
+        A sequência continua a partir do .ack, nunca reinicia.
+        """
+        if os.path.getsize(self.caminho_wal) < WEBHOOK_FILA_COMPACTAR_BYTES:
+            return
+        with self._lock_journal:
+            if self.marca.valor != self._ultimo_seq:
+                return
+            self._wal.truncate(0)
+            self._wal.seek(0)
+        log("INFO", f"Journal do slot {self.slot} compactado na seq {self.marca.valor}")
+
+    # --------------------------------------------------
+    # OBSERVABILIDADE
+    # --------------------------------------------------
+
+    def status(self) -> Dict[str, Any]:
+        with self._lock_pendentes:
+            profundidade = len(self._pendentes)
+            mais_antigo = min(self._pendentes.values()) if self._pendentes else None
+
+        return {
+            "slot": self.slot,
+            "workers": self.workers,
+            "profundidade": profundidade,
+            "lag_segundos": round(time.time() - mais_antigo, 3) if mais_antigo else 0.0,
+            "ultimo_seq": self._ultimo_seq,
+            "marca_dagua": self.marca.valor,
+            "processados": self.processados,
+            "falhas": self.falhas,
+            "dead_letter": self.dead_letter
+        }
@@ -0,0 +1,157 @@
+# idempotency_service.py
+# Frente de idempotência de vendas — chave (platform, external_sale_id)
+#
+# Camadas, da mais barata para a mais cara:
+# 1. LRU limitado de chaves recentes  → duplicata rejeitada em microssegundos
+# 2. Bloom filter aquecido da tabela sales → "nunca vista" com certeza
+# 3. Upsert com índice único no banco → decisão final (fonte da verdade)
+import os
+import math
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any
+
+from supabase import Client
+
+
+DEDUPE_LRU_CAPACIDADE = int(os.getenv("DEDUPE_LRU_CAPACIDADE", "100000"))
+DEDUPE_BLOOM_CAPACIDADE = int(os.getenv("DEDUPE_BLOOM_CAPACIDADE", "2000000"))
+DEDUPE_BLOOM_ERRO = float(os.getenv("DEDUPE_BLOOM_ERRO", "0.001"))
+DEDUPE_PAGINA = 5000
+
+
+def chave_venda(platform: str, external_sale_id: str) -> str:
+    return f"{platform}:{external_sale_id}"
+
+
+class BloomFilter:
+    """
+    Bloom filter em bytearray com k posições derivadas de um único blake2b
+    (double hashing). Sem remoção: falso positivo cai no banco, nunca perde venda.
+    """
+
+    def __init__(self, capacidade: int, taxa_erro: float):
+        self.m = max(8, int(-capacidade * math.log(taxa_erro) / (math.log(2) ** 2)))
+        self.k = max(1, int(round(self.m / capacidade * math.log(2))))
+        self.bits = bytearray((self.m + 7) // 8)
+
+    def _posicoes(self, chave: str):
+        digest = hashlib.blake2b(chave.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        m = self.m
+        return [(h1 + i * h2) % m for i in range(self.k)]
+
+    def adicionar(self, chave: str):
+        bits = self.bits
+        for p in self._posicoes(chave):
+            bits[p >> 3] |= 1 << (p & 7)
+
+    def __contains__(self, chave: str) -> bool:
+        bits = self.bits
+        for p in self._posicoes(chave):
+            if not bits[p >> 3] & (1 << (p & 7)):
+                return False
+        return True
+
+
+class DedupeVendas:
+    """
+    Reserva em memória da chave de venda antes do pipeline financeiro.
+    reservar() = False → duplicata certa, nenhum round trip.
+    reservar() = True  → seguir para o upsert (que ainda pode acusar duplicata).
+    """
+
+    def __init__(
+        self,
+        capacidade_lru: int = DEDUPE_LRU_CAPACIDADE,
+        capacidade_bloom: int = DEDUPE_BLOOM_CAPACIDADE,
+        taxa_erro: float = DEDUPE_BLOOM_ERRO
+    ):
+        self.capacidade_lru = capacidade_lru
+        self._lru: "OrderedDict[str, None]" = OrderedDict()
+        self._bloom = BloomFilter(capacidade_bloom, taxa_erro)
+        self._lock = threading.Lock()
+
+        self.aquecido = False
+        self.rejeitadas_memoria = 0
+        self.novas_certas = 0
+        self.decididas_banco = 0
+
+    def _lembrar(self, chave: str):
+        self._lru[chave] = None
+        self._lru.move_to_end(chave)
+        if len(self._lru) > self.capacidade_lru:
+            self._lru.popitem(last=False)
+        self._bloom.adicionar(chave)
+
+    def reservar(self, platform: str, external_sale_id: str) -> bool:
+        chave = chave_venda(platform, external_sale_id)
+        with self._lock:
+            if chave in self._lru:
+                self._lru.move_to_end(chave)
+                self.rejeitadas_memoria += 1
+                return False
+
+            if chave in self._bloom:
+                self.decididas_banco += 1
+            else:
+                self.novas_certas += 1
+
+            self._lembrar(chave)
+            return True
+
+    def liberar(self, platform: str, external_sale_id: str):
+        """Falha no processamento → a próxima entrega da plataforma pode tentar de novo."""
+        with self._lock:
+            self._lru.pop(chave_venda(platform, external_sale_id), None)
+
+    def carregar(self, supabase: Client):
+        """
+        Aquecimento a partir da tabela sales (keyset por id).
+        As chaves mais recentes ficam no LRU; todas entram no Bloom.
+        """
+        ultimo_id = None
+        total = 0
+
+        try:
+            while True:
+                query = (
+                    supabase
+                    .table("sales")
+                    .select("id,platform,external_sale_id")
+                    .order("id")
+                    .limit(DEDUPE_PAGINA)
+                )
+                if ultimo_id is not None:
+                    query = query.gt("id", ultimo_id)
+
+                linhas = query.execute().data or []
+                if not linhas:
+                    break
+
+                with self._lock:
+                    for linha in linhas:
+                        self._lembrar(chave_venda(linha["platform"], linha["external_sale_id"]))
+
+                total += len(linhas)
+                ultimo_id = linhas[-1]["id"]
+
+            self.aquecido = True
+            print(f"[DEDUPE] [INFO] Aquecimento concluído: {total} vendas conhecidas")
+
+        except Exception as e:
+            print(f"[DEDUPE] [WARN] Falha no aquecimento ({total} carregadas): {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "aquecido": self.aquecido,
+            "lru_tamanho": len(self._lru),
+            "lru_capacidade": self.capacidade_lru,
+            "bloom_bits": self._bloom.m,
+            "bloom_hashes": self._bloom.k,
+            "rejeitadas_memoria": self.rejeitadas_memoria,
+            "novas_certas": self.novas_certas,
+            "decididas_banco": self.decididas_banco
+        }
@@ -0,0 +1,459 @@
+# indices_redirect.py — Índices em Memória dos Redirects (/go)
+# ROBO GLOBAL AI
+#
+# Tabelas consultadas a cada clique carregadas no boot em dicionários
+# chave → linha; o clique resolve sem ida ao banco.
+# - IndiceOfertas: offers ativas por slug          (/go?produto=)
+# - IndiceGul:     produtos por gul_id             (/go/{gul_id})
+# - IndiceGoTracking: go_tracking por id          (/go/{go_id})
+#
+# Atualização:
+# - incremental a cada INDICES_ATUALIZACAO_S: linhas com updated_at após a
+#   marca d'água (sql/010, sql/011), com INDICES_SOBREPOSICAO_S de folga
+#   para transações que gravaram updated_at antes de confirmar
+# - completa a cada INDICES_RECARGA_S (alcança linhas apagadas)
+# - imediata via invalidar(chave) — chamada pelos endpoints que alteram a tabela
+#
+# Falha de atualização mantém o índice atual.
+#
+# IndiceGoTracking guarda só os links criados nos últimos INDICES_GO_JANELA_S
+# (go_tracking cresce a cada /recomendar); go_id mais antigo resolve pelo banco.
+#
+# CacheNegativo: chaves que faltaram no índice E no banco (ids sondados por
+# robôs/scanners) respondem 404 sem nova consulta por INDICES_NEGATIVO_TTL_S.
+# LimiteConsultas: teto de consultas ao banco por segundo para as faltas que
+# não podem ser respondidas pela memória (ids aleatórios não se repetem).
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime, timedelta, timezone
+from typing import Any, Dict, Hashable, List, Optional
+
+from supabase import Client
+
+INDICES_ATUALIZACAO_S = float(os.getenv("INDICES_ATUALIZACAO_S", "5"))
+INDICES_RECARGA_S = float(os.getenv("INDICES_RECARGA_S", "600"))
+INDICES_SOBREPOSICAO_S = float(os.getenv("INDICES_SOBREPOSICAO_S", "5"))
+INDICES_NEGATIVO_TTL_S = float(os.getenv("INDICES_NEGATIVO_TTL_S", "60"))
+INDICES_NEGATIVO_MAX = int(os.getenv("INDICES_NEGATIVO_MAX", "100000"))
+INDICES_FRESCO_S = float(os.getenv("INDICES_FRESCO_S", "30"))
+INDICES_BANCO_POR_S = float(os.getenv("INDICES_BANCO_POR_S", "50"))
+INDICES_GO_JANELA_S = float(os.getenv("INDICES_GO_JANELA_S", str(7 * 24 * 3600)))
+INDICES_PAGINA = 1000
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[INDICES] [{nivel}] {mensagem}")
+
+
+def _instante(valor: Any) -> Optional[datetime]:
+    if not valor:
+        return None
+    return datetime.fromisoformat(str(valor).replace("Z", "+00:00"))
+
+
+class IndiceIncremental:
+    """
+    Subclasses definem tabela, coluna_chave, colunas e valida(linha).
+    Linha que deixa de ser válida sai do índice. versao avança a cada
+    mudança aplicada (ex: tabela_redirects.py recompila quando muda).
+    """
+
+    tabela: str = ""
+    coluna_chave: str = ""
+    colunas: str = "*"
+    coluna_marca: str = "updated_at"
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        intervalo_s: float = INDICES_ATUALIZACAO_S,
+        recarga_s: float = INDICES_RECARGA_S,
+        sobreposicao_s: float = INDICES_SOBREPOSICAO_S,
+        carregar: bool = True
+    ):
+        self.supabase = supabase
+        self.intervalo_s = intervalo_s
+        self.recarga_s = recarga_s
+        self.sobreposicao = timedelta(seconds=sobreposicao_s)
+
+        # Trocado por referência na recarga completa; alterado item a item na incremental
+        self._linhas: Dict[str, Dict[str, Any]] = {}
+        # id → chave atual: linha que muda de chave (ex: slug renomeado) sai da antiga
+        self._chaves: Dict[Any, str] = {}
+        self._marca: Optional[datetime] = None
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._recarregado_em = 0.0
+        self._atualizado_em = 0.0
+        self.versao = 0
+
+        self.acertos = 0
+        self.faltas = 0
+        self.recargas = 0
+        self.atualizacoes = 0
+        self.invalidacoes = 0
+        self.falhas = 0
+
+        if carregar:
+            self.carregar()
+
+        self._thread = threading.Thread(target=self._loop, name=f"indice-{self.tabela}", daemon=True)
+        self._thread.start()
+
+    def valida(self, linha: Dict[str, Any]) -> bool:
+        return True
+
+    def filtrar_carga(self, query):
+        """Filtro da recarga completa (ex: só ativas); a incremental lê tudo o que mudou."""
+        return query
+
+    # --------------------------------------------------
+    # LEITURA DO BANCO
+    # --------------------------------------------------
+
+    def _ler(self, desde: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        linhas: List[Dict[str, Any]] = []
+        ultimo_id = None
+        while True:
+            query = self.supabase.table(self.tabela).select(self.colunas).order("id").limit(INDICES_PAGINA)
+            if desde is not None:
+                query = query.gte(self.coluna_marca, desde.isoformat())
+            else:
+                query = self.filtrar_carga(query)
+            if ultimo_id is not None:
+                query = query.gt("id", ultimo_id)
+
+            pagina = query.execute().data or []
+            linhas.extend(pagina)
+            if len(pagina) < INDICES_PAGINA:
+                return linhas
+            ultimo_id = pagina[-1]["id"]
+
+    def _avancar_marca(self, linhas: List[Dict[str, Any]]):
+        """Chamar com self._lock."""
+        for linha in linhas:
+            instante = _instante(linha.get(self.coluna_marca))
+            if instante is not None and (self._marca is None or instante > self._marca):
+                self._marca = instante
+
+    def _remover(self, chave: str, id_linha: Any) -> bool:
+        """Chamar com self._lock. Tira a chave se ela ainda aponta para a linha id_linha."""
+        self._chaves.pop(id_linha, None)
+        atual = self._linhas.get(chave)
+        if atual is None or atual.get("id") != id_linha:
+            return False
+        del self._linhas[chave]
+        return True
+
+    def _aplicar(self, linhas: List[Dict[str, Any]]) -> int:
+        """Chamar com self._lock. Retorna quantas chaves mudaram."""
+        mudancas = 0
+        for linha in linhas:
+            id_linha = linha.get("id")
+            chave = linha.get(self.coluna_chave)
+            anterior = self._chaves.get(id_linha)
+            if anterior is not None and anterior != chave:
+                mudancas += self._remover(anterior, id_linha)
+            if not chave:
+                continue
+            if self.valida(linha):
+                if self._linhas.get(chave) != linha:
+                    self._linhas[chave] = linha
+                    mudancas += 1
+                self._chaves[id_linha] = chave
+            else:
+                mudancas += self._remover(chave, id_linha)
+        return mudancas
+
+    # --------------------------------------------------
+    # CARGA / ATUALIZAÇÃO
+    # --------------------------------------------------
+
+    def carregar(self) -> int:
+        """Recarga completa. Retorna quantas linhas ficaram no índice."""
+        try:
+            linhas = self._ler()
+        except Exception as e:
+            self.falhas += 1
+            log("WARN", f"Falha ao carregar {self.tabela}; mantendo {len(self._linhas)} linhas atuais: {e}")
+            return len(self._linhas)
+
+        indice = {
+            linha[self.coluna_chave]: linha
+            for linha in linhas
+            if linha.get(self.coluna_chave) and self.valida(linha)
+        }
+        with self._lock:
+            # Recarga que não mudou nada não avança a versão (não recompila a tabela mmap)
+            if indice != self._linhas:
+                self.versao += 1
+            self._linhas = indice
+            self._chaves = {linha.get("id"): chave for chave, linha in indice.items()}
+            self._avancar_marca(linhas)
+            self._recarregado_em = self._atualizado_em = time.monotonic()
+            self.recargas += 1
+        return len(indice)
+
+    def atualizar(self) -> int:
+        """Aplica as linhas alteradas desde a marca d'água. Retorna quantas vieram."""
+        if self._marca is None:
+            return self.carregar()
+        linhas = self._ler(self._marca - self.sobreposicao)
+        with self._lock:
+            if self._aplicar(linhas):
+                self.versao += 1
+            self._avancar_marca(linhas)
+            self._atualizado_em = time.monotonic()
+            self.atualizacoes += 1
+        return len(linhas)
+
+    def invalidar(self, chave: Optional[str] = None) -> int:
+        """
+        Releitura imediata de uma chave (após alterá-la) ou, sem chave,
+        recarga completa. Vale para este worker; os demais convergem
+        na próxima atualização incremental.
+        """
+        self.invalidacoes += 1
+        if chave is None:
+            return self.carregar()
+
+        linhas = (
+            self.supabase
+            .table(self.tabela)
+            .select(self.colunas)
+            .eq(self.coluna_chave, chave)
+            .execute()
+            .data
+        ) or []
+        with self._lock:
+            validas = [linha for linha in linhas if self.valida(linha)]
+            if validas:
+                self._aplicar(validas[:1])
+            else:
+                atual = self._linhas.get(chave)
+                if atual is not None:
+                    self._remover(chave, atual.get("id"))
+            self._avancar_marca(linhas)
+            self.versao += 1
+        return len(validas)
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                if time.monotonic() - self._recarregado_em >= self.recarga_s:
+                    self.carregar()
+                else:
+                    self.atualizar()
+            except Exception as e:
+                self.falhas += 1
+                log("WARN", f"Falha na atualização incremental de {self.tabela}: {e}")
+
+    def encerrar(self):
+        self._parar.set()
+        self._thread.join(timeout=5)
+
+    @property
+    def fresco(self) -> bool:
+        """Carga ou atualização bem-sucedida há no máximo INDICES_FRESCO_S."""
+        return bool(self._atualizado_em) and time.monotonic() - self._atualizado_em <= INDICES_FRESCO_S
+
+    # --------------------------------------------------
+    # RESOLUÇÃO (CAMINHO DO CLIQUE)
+    # --------------------------------------------------
+
+    def linhas(self) -> Dict[str, Dict[str, Any]]:
+        """Retrato do índice (chave → linha) para exportação."""
+        with self._lock:
+            return dict(self._linhas)
+
+    def obter(self, chave: str) -> Optional[Dict[str, Any]]:
+        linha = self._linhas.get(chave)
+        if linha is None:
+            self.faltas += 1
+        else:
+            self.acertos += 1
+        return linha
+
+    # --------------------------------------------------
+    # MÉTRICAS
+    # --------------------------------------------------
+
+    def status(self) -> Dict[str, Any]:
+        consultas = self.acertos + self.faltas
+        return {
+            "linhas": len(self._linhas),
+            "fresco": self.fresco,
+            "marca": self._marca.isoformat() if self._marca else None,
+            "intervalo_s": self.intervalo_s,
+            "recarga_s": self.recarga_s,
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else None,
+            "recargas": self.recargas,
+            "atualizacoes": self.atualizacoes,
+            "invalidacoes": self.invalidacoes,
+            "falhas": self.falhas,
+        }
+
+
+class IndiceOfertas(IndiceIncremental):
+    """offers com status 'ativo', por slug."""
+
+    tabela = "offers"
+    coluna_chave = "slug"
+
+    def valida(self, linha: Dict[str, Any]) -> bool:
+        return linha.get("status") == "ativo"
+
+    def filtrar_carga(self, query):
+        return query.eq("status", "ativo")
+
+    def oferta(self, slug: str) -> Optional[Dict[str, Any]]:
+        return self.obter(slug)
+
+
+class IndiceGul(IndiceIncremental):
+    """produtos por gul_id (sufixo do GUL "/go/<gul_id>", sql/011_produtos_gul_id.sql)."""
+
+    tabela = "produtos"
+    coluna_chave = "gul_id"
+    colunas = "id,nome,link_afiliado,plataforma,gul,gul_id,updated_at"
+
+    def filtrar_carga(self, query):
+        return query.neq("gul_id", "")
+
+    def produto(self, gul_id: str) -> Optional[Dict[str, Any]]:
+        return self.obter(gul_id)
+
+
+class IndiceGoTracking(IndiceIncremental):
+    """
+    go_tracking por id (links gerados pelo /recomendar, sql/013_tabela_redirects.sql).
+    Só links com criado_em dentro de janela_s (0 = todos); o que envelhece
+    sai na recarga completa seguinte.
+    """
+
+    tabela = "go_tracking"
+    coluna_chave = "id"
+    colunas = "id,dor_id,solucao_id,link_destino,criado_em"
+    coluna_marca = "criado_em"
+
+    def __init__(self, supabase: Client, *, janela_s: float = INDICES_GO_JANELA_S, **kwargs):
+        self.janela_s = janela_s
+        super().__init__(supabase, **kwargs)
+
+    def _limite(self) -> Optional[datetime]:
+        if not self.janela_s:
+            return None
+        return datetime.now(timezone.utc) - timedelta(seconds=self.janela_s)
+
+    def valida(self, linha: Dict[str, Any]) -> bool:
+        if not linha.get("link_destino"):
+            return False
+        limite = self._limite()
+        criado_em = _instante(linha.get("criado_em"))
+        if limite is None or criado_em is None:
+            return True
+        if criado_em.tzinfo is None:
+            criado_em = criado_em.replace(tzinfo=timezone.utc)
+        return criado_em >= limite
+
+    def filtrar_carga(self, query):
+        limite = self._limite()
+        return query if limite is None else query.gte("criado_em", limite.isoformat())
+
+    def status(self) -> Dict[str, Any]:
+        return {**super().status(), "janela_s": self.janela_s}
+
+
+class CacheNegativo:
+    """
+    Chaves sabidamente ausentes, com validade curta (ttl_s) e no máximo
+    max_itens (descarta as mais antigas). Quem cria a chave chama remover();
+    em outro worker a criação aparece no máximo após ttl_s.
+    """
+
+    def __init__(self, *, ttl_s: float = INDICES_NEGATIVO_TTL_S, max_itens: int = INDICES_NEGATIVO_MAX):
+        self.ttl_s = ttl_s
+        self.max_itens = max(1, max_itens)
+        self._itens: "OrderedDict[Hashable, float]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.acertos = 0
+        self.registrados = 0
+        self.descartados = 0
+
+    def contem(self, chave: Hashable) -> bool:
+        with self._lock:
+            expira = self._itens.get(chave)
+            if expira is None:
+                return False
+            if expira <= time.monotonic():
+                del self._itens[chave]
+                return False
+            self.acertos += 1
+            return True
+
+    def registrar(self, chave: Hashable):
+        with self._lock:
+            self._itens[chave] = time.monotonic() + self.ttl_s
+            self._itens.move_to_end(chave)
+            self.registrados += 1
+            while len(self._itens) > self.max_itens:
+                self._itens.popitem(last=False)
+                self.descartados += 1
+
+    def remover(self, chave: Hashable):
+        with self._lock:
+            self._itens.pop(chave, None)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "itens": len(self._itens),
+            "ttl_s": self.ttl_s,
+            "max_itens": self.max_itens,
+            "acertos": self.acertos,
+            "registrados": self.registrados,
+            "descartados": self.descartados,
+        }
+
+
+class LimiteConsultas:
+    """
+    Balde de fichas: até por_s consultas por segundo, com rajada de até
+    rajada. permitir() False = a consulta não deve ir ao banco agora.
+    """
+
+    def __init__(self, *, por_s: float = INDICES_BANCO_POR_S, rajada: Optional[float] = None):
+        self.por_s = por_s
+        self.rajada = rajada if rajada is not None else max(1.0, 2 * por_s)
+        self._fichas = self.rajada
+        self._reposto_em = time.monotonic()
+        self._lock = threading.Lock()
+
+        self.permitidas = 0
+        self.recusadas = 0
+
+    def permitir(self) -> bool:
+        with self._lock:
+            agora = time.monotonic()
+            self._fichas = min(self.rajada, self._fichas + (agora - self._reposto_em) * self.por_s)
+            self._reposto_em = agora
+            if self._fichas >= 1:
+                self._fichas -= 1
+                self.permitidas += 1
+                return True
+            self.recusadas += 1
+            return False
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "por_s": self.por_s,
+            "rajada": self.rajada,
+            "permitidas": self.permitidas,
+            "recusadas": self.recusadas,
+        }
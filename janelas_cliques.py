@@ -0,0 +1,78 @@
+# janelas_cliques.py — Janelas em Memória dos Cliques Recentes por Slug
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# /go/caminho lia os últimos cliques do slug em clicks a cada chamada. Aqui
+# cada slug tem um buffer circular (deque com maxlen) alimentado pelo próprio
+# caminho do clique (registrar_clique do main); a leitura não vai ao banco.
+#
+# - CAMINHO_JANELA: cliques guardados por slug (o /go/caminho usava os 10 últimos)
+# - CAMINHO_MAX_SLUGS: slugs mantidos; o menos recente sai primeiro
+# - Boot: semear() com os cliques mais recentes já gravados (uma consulta)
+#
+# Por worker: cada processo vê os cliques que recebeu mais a semente do boot.
+# O contexto do caminho é auditoria, não decisão — divergência entre workers
+# é aceita em troca de tirar a consulta do endpoint.
+
+import os
+import threading
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, List
+
+CAMINHO_JANELA = int(os.getenv("CAMINHO_JANELA", "10"))
+CAMINHO_MAX_SLUGS = int(os.getenv("CAMINHO_MAX_SLUGS", "10000"))
+
+# Só o que interpretar_contexto_clique e o caminho usam (sem ip / user_agent)
+CAMPOS_CONTEXTO = ("slug", "offer_id", "origem", "ts")
+
+
+class JanelasCliques:
+
+    def __init__(self, *, tamanho: int = CAMINHO_JANELA, max_slugs: int = CAMINHO_MAX_SLUGS):
+        self.tamanho = max(1, tamanho)
+        self.max_slugs = max(1, max_slugs)
+        self._janelas: "OrderedDict[str, Deque[Dict[str, Any]]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        self.cliques = 0
+        self.leituras = 0
+        self.slugs_descartados = 0
+
+    def registrar(self, linha: Dict[str, Any]):
+        slug = linha.get("slug")
+        if not slug:
+            return
+        evento = {campo: linha.get(campo) for campo in CAMPOS_CONTEXTO}
+        with self._lock:
+            janela = self._janelas.get(slug)
+            if janela is None:
+                janela = self._janelas[slug] = deque(maxlen=self.tamanho)
+                while len(self._janelas) > self.max_slugs:
+                    self._janelas.popitem(last=False)
+                    self.slugs_descartados += 1
+            else:
+                self._janelas.move_to_end(slug)
+            janela.append(evento)
+            self.cliques += 1
+
+    def semear(self, linhas: List[Dict[str, Any]]):
+        """Boot: linhas de clicks em ordem cronológica (mais antigas primeiro)."""
+        for linha in linhas:
+            self.registrar(linha)
+
+    def recentes(self, slug: str) -> List[Dict[str, Any]]:
+        """Cliques do slug, mais recentes primeiro (mesma ordem da consulta por ts desc)."""
+        with self._lock:
+            self.leituras += 1
+            janela = self._janelas.get(slug)
+            return list(reversed(janela)) if janela else []
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "tamanho": self.tamanho,
+            "max_slugs": self.max_slugs,
+            "slugs": len(self._janelas),
+            "cliques": self.cliques,
+            "leituras": self.leituras,
+            "slugs_descartados": self.slugs_descartados,
+        }
@@ -0,0 +1,192 @@
+# ledger_service.py — Ledger de Saldos de Parceiros (sql/007_ledger_parceiros.sql)
+# ROBO GLOBAL AI
+#
+# Créditos, estornos, ajustes e payouts viram lançamentos append-only em
+# partner_ledger. partner_balances é o snapshot compactado:
+#   saldo atual      = snapshot + cauda curta (lançamentos ainda não compactados)
+#   saldo em uma data = snapshot histórico mais próximo + lançamentos até a data
+#
+# A compactação roda em segundo plano (CompactadorLedger) a cada
+# LEDGER_COMPACTACAO_S e também dentro das RPCs de payout, que precisam
+# do saldo disponível exato.
+
+import os
+import threading
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from supabase import Client
+
+LEDGER_COMPACTACAO_S = float(os.getenv("LEDGER_COMPACTACAO_S", "60"))
+LEDGER_COMPACTACAO_LIMITE = int(os.getenv("LEDGER_COMPACTACAO_LIMITE", "1000"))
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[LEDGER] [{nivel}] {mensagem}")
+
+
+# ==========================================================
+# LANÇAMENTOS
+# ==========================================================
+
+def lancar_comissao(
+    supabase: Client,
+    *,
+    partner_id: str,
+    valor: Decimal,
+    tipo: str = "credito",
+    referencia: Optional[str] = None
+) -> Optional[int]:
+    """
+    Um INSERT no ledger, sem disputar a linha de partner_balances.
+    Com referencia, o lançamento é idempotente: retorno vazio = já existia.
+    """
+    return (
+        supabase
+        .rpc("lancar_comissao", {
+            "p_partner_id": partner_id,
+            # Texto: numeric exato no banco, sem passar por float
+            "p_valor": str(Decimal(str(valor))),
+            "p_tipo": tipo,
+            "p_referencia": referencia
+        })
+        .execute()
+        .data
+    )
+
+
+def lancar_comissoes(
+    supabase: Client,
+    *,
+    partner_id: str,
+    itens: List[Tuple[Optional[str], Decimal]]
+) -> int:
+    """
+    Vários créditos do mesmo parceiro em uma chamada (sql/015_ledger_creditos_lote.sql).
+    itens: (referencia, valor); referência repetida é ignorada. Retorna quantos entraram.
+    """
+    return (
+        supabase
+        .rpc("lancar_comissoes", {
+            "p_partner_id": partner_id,
+            "p_itens": [
+                {"referencia": referencia, "valor": str(Decimal(str(valor)))}
+                for referencia, valor in itens
+            ]
+        })
+        .execute()
+        .data
+    ) or 0
+
+
+def estornar_comissao(
+    supabase: Client,
+    *,
+    partner_id: str,
+    valor: Decimal,
+    referencia: str
+) -> Optional[int]:
+    """Reembolso / chargeback: lançamento negativo de mesmo valor do crédito."""
+    return lancar_comissao(
+        supabase,
+        partner_id=partner_id,
+        valor=-abs(Decimal(str(valor))),
+        tipo="estorno",
+        referencia=referencia
+    )
+
+
+# ==========================================================
+# LEITURA
+# ==========================================================
+
+def saldo_parceiro(
+    supabase: Client,
+    partner_id: str,
+    momento: Optional[datetime] = None
+) -> Dict[str, Any]:
+    """Saldo atual (snapshot + cauda) ou, com momento, o saldo naquela data."""
+    if momento is None:
+        return supabase.rpc("saldo_parceiro", {"p_partner_id": partner_id}).execute().data
+    return (
+        supabase
+        .rpc("saldo_parceiro_em", {"p_partner_id": partner_id, "p_momento": momento.isoformat()})
+        .execute()
+        .data
+    )
+
+
+# ==========================================================
+# COMPACTAÇÃO
+# ==========================================================
+
+def compactar_saldos(
+    supabase: Client,
+    partner_ids: Optional[Iterable[str]] = None,
+    *,
+    limite: int = LEDGER_COMPACTACAO_LIMITE
+) -> int:
+    """Dobra a cauda de até `limite` parceiros no snapshot. Retorna quantos foram compactados."""
+    return (
+        supabase
+        .rpc("compactar_saldos", {
+            "p_partner_ids": list(partner_ids) if partner_ids is not None else None,
+            "p_limite": limite
+        })
+        .execute()
+        .data
+    ) or 0
+
+
+def compactar_tudo(supabase: Client, *, limite: int = LEDGER_COMPACTACAO_LIMITE) -> int:
+    """Repete compactar_saldos até não sobrar cauda (lotes de `limite` parceiros)."""
+    total = 0
+    while True:
+        compactados = compactar_saldos(supabase, limite=limite)
+        total += compactados
+        if compactados < limite:
+            return total
+
+
+class CompactadorLedger:
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        intervalo_s: float = LEDGER_COMPACTACAO_S,
+        limite: int = LEDGER_COMPACTACAO_LIMITE
+    ):
+        self.supabase = supabase
+        self.intervalo_s = intervalo_s
+        self.limite = limite
+        self._parar = threading.Event()
+
+        self.rodadas = 0
+        self.compactados = 0
+        self.falhas = 0
+
+        self._thread = threading.Thread(target=self._loop, name="compactador-ledger", daemon=True)
+        self._thread.start()
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo_s):
+            try:
+                self.compactados += compactar_tudo(self.supabase, limite=self.limite)
+                self.rodadas += 1
+            except Exception as e:
+                self.falhas += 1
+                log("WARN", f"Falha na compactação do ledger: {e}")
+
+    def encerrar(self):
+        self._parar.set()
+        self._thread.join(timeout=5)
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "intervalo_s": self.intervalo_s,
+            "rodadas": self.rodadas,
+            "parceiros_compactados": self.compactados,
+            "falhas": self.falhas,
+        }
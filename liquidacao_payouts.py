@@ -0,0 +1,36 @@
+# liquidacao_payouts.py — Liquidação em Massa de Payouts (CLI)
+# ROBO GLOBAL AI
+#
+# Lê (payout_id, provider_reference) de um CSV e liquida em lotes
+# transacionais (payout_service.liquidar_payouts → RPC liquidar_payouts).
+# Reexecutar o mesmo arquivo é seguro: payouts já pagos são ignorados.
+#
+# USO:
+#   python liquidacao_payouts.py --csv retorno_banco.csv --lote 1000
+
+import sys
+import argparse
+
+from payout_service import LIQUIDACAO_LOTE, ler_csv_liquidacao, liquidar_payouts
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Liquidação em massa de payouts")
+    parser.add_argument("--csv", required=True, help="Colunas: payout_id, provider_reference")
+    parser.add_argument("--lote", type=int, default=LIQUIDACAO_LOTE, help="Payouts por chamada transacional")
+    args = parser.parse_args(argv)
+
+    from supabase_client import get_supabase
+
+    resumo = liquidar_payouts(get_supabase(), ler_csv_liquidacao(args.csv), tamanho_lote=args.lote)
+
+    print(
+        f"[LIQUIDACAO] [INFO] {resumo['recebidos']} recebidos | {resumo['pagos']} pagos | "
+        f"{resumo['ignorados']} ignorados | {resumo['saldos_atualizados']} saldos | "
+        f"{resumo['lotes']} lotes | {resumo['segundos']}s | {resumo['payouts_por_segundo']} payouts/s"
+    )
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
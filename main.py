@@ -13,12 +13,13 @@ from fastapi.responses import RedirectResponse
 from pydantic import BaseModel
 from typing import Dict, Any, Optional, List
 from datetime import datetime, timezone
+from contextlib import nullcontext
 import os
 import json
 import uuid
-import hmac
 import hashlib
 import threading
+import re
 import time
 import logging
 
@@ -52,16 +53,77 @@ if not SUPABASE_URL or not SUPABASE_SERVICE_ROLE_KEY:
 from supabase import create_client, Client
 sb: Client = create_client(SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY)
 
+# ==========================================================
+# ESCRITA EM LOTE (OPCIONAL) — UMA INSERÇÃO EM MASSA POR TABELA
+# ESCRITA_EM_LOTE=1 → sales, eventos_financeiros e ações humanas
+# ==========================================================
+
+ESCRITA_EM_LOTE = os.getenv("ESCRITA_EM_LOTE", "0") == "1"
+
+escritor_lote = None
+
+if ESCRITA_EM_LOTE:
+    from escritor_lote import EscritorEmLote
+    from sales_service import configurar_escritor_vendas
+
+    escritor_lote = EscritorEmLote(sb)
+    configurar_escritor_vendas(escritor_lote)
+
+# ==========================================================
+# SALDOS EM JANELA (OPCIONAL) — UM INCREMENTO POR PARCEIRO POR JANELA
+# SALDOS_EM_JANELA=1 → créditos somados em memória (journal: SALDOS_JOURNAL_DIR)
+# ==========================================================
+
+SALDOS_EM_JANELA = os.getenv("SALDOS_EM_JANELA", "0") == "1"
+
+agregador_saldos = None
+
+if SALDOS_EM_JANELA:
+    from agregador_saldos import AgregadorSaldos
+
+    agregador_saldos = AgregadorSaldos(sb)
+
+# ==========================================================
+# EVENTOS LEGADOS EM SEGMENTOS (OPCIONAL) — SEM SUPABASE NO WEBHOOK
+# EVENTOS_EM_SEGMENTOS=1 → eventos_financeiros em segmentos gzip locais
+# (SEGMENTOS_DIR), enviados em massa em segundo plano
+# ==========================================================
+
+EVENTOS_EM_SEGMENTOS = os.getenv("EVENTOS_EM_SEGMENTOS", "0") == "1"
+
+log_eventos = None
+
+if EVENTOS_EM_SEGMENTOS:
+    from segmentos_eventos import LogSegmentos
+
+    log_eventos = LogSegmentos(sb)
+
+# ==========================================================
+# TAXAS DE COMISSÃO — commission_rates EM MEMÓRIA
+# Recarga a cada TAXAS_TTL_S; POST /financeiro/taxas/invalidar força a recarga
+# ==========================================================
+
+from taxas_comissao import TabelaTaxas
+
+taxas_comissao = TabelaTaxas(sb)
+
 # ==========================================================
 # FASTAPI
 # ==========================================================
 
+from codec_json import RespostaJSONRapida, RotaJSON
+import codec_json
+
 app = FastAPI(
     title=APP_NAME,
     version=APP_VERSION,
-    description="Núcleo Operacional Soberano — Execução, Monetização e Governança"
+    description="Núcleo Operacional Soberano — Execução, Monetização e Governança",
+    default_response_class=RespostaJSONRapida
 )
 
+# Corpo parseado uma única vez, pelo codec rápido (ver codec_json.py)
+app.router.route_class = RotaJSON
+
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -93,15 +155,31 @@ def utc_now_iso() -> str:
 
 # ==========================================================
 # ESTADO GLOBAL DO SISTEMA (SOBERANO)
-# ==========================================================
-
-ESTADO_GLOBAL: Dict[str, Any] = {
-    "estado_operacional": "ATIVO",
-    "capital_total": 0.0,
-    "capital_em_risco": 0.0,
-    "capital_disponivel": 0.0,
-    "ultima_atualizacao": utc_now_iso()
-}
+# Compartilhado entre workers (mmap): ver estado_compartilhado.py
+# ESTADO_GLOBAL_ARQUIVO fixa o arquivo (padrão: um por aplicação e processo-pai)
+# ==========================================================
+
+from estado_compartilhado import EstadoCompartilhado, arquivo_padrao
+
+ESTADO_GLOBAL_ARQUIVO = os.getenv("ESTADO_GLOBAL_ARQUIVO", arquivo_padrao("robo_estado_global"))
+
+ESTADO_GLOBAL = EstadoCompartilhado(
+    ESTADO_GLOBAL_ARQUIVO,
+    {
+        "estado_operacional": "16s",
+        "capital_total": "d",
+        "capital_em_risco": "d",
+        "capital_disponivel": "d",
+        "ultima_atualizacao": "40s",
+    },
+    {
+        "estado_operacional": "ATIVO",
+        "capital_total": 0.0,
+        "capital_em_risco": 0.0,
+        "capital_disponivel": 0.0,
+        "ultima_atualizacao": utc_now_iso()
+    }
+)
 
 # ==========================================================
 # main.py — PARTE 2 / N
@@ -162,12 +240,26 @@ class Caminho(BaseModel):
 # (ATENÇÃO: NÃO É MAIS FONTE PRIMÁRIA DE VERDADE)
 # ==========================================================
 
+def _logar_falha_lote(tabela: str):
+    def callback(futuro):
+        if futuro.exception() is not None:
+            log("LOTE", "ERRO", f"Falha ao gravar em {tabela}: {futuro.exception()}")
+    return callback
+
+
 def registrar_evento_financeiro(evento: EventoFinanceiro):
     """
     Registro LEGADO para leitura humana e governança.
     NÃO é mais fonte primária de auditoria financeira.
     """
-    sb.table("eventos_financeiros").insert(evento.dict()).execute()
+    if log_eventos is not None:
+        log_eventos.registrar(evento.dict())
+    elif escritor_lote is not None:
+        escritor_lote.enviar("eventos_financeiros", evento.dict()).add_done_callback(
+            _logar_falha_lote("eventos_financeiros")
+        )
+    else:
+        sb.table("eventos_financeiros").insert(evento.dict()).execute()
     log(
         "FINANCEIRO",
         "INFO",
@@ -175,13 +267,19 @@ def registrar_evento_financeiro(evento: EventoFinanceiro):
     )
 
 
-def atualizar_caixa_logico(valor: float):
+def _estado_governanca(estado: Optional[Dict[str, Any]]):
+    """Estado explícito (reconstrução no boot) ou transação no ESTADO_GLOBAL vivo."""
+    return nullcontext(estado) if estado is not None else ESTADO_GLOBAL.transacao()
+
+
+def atualizar_caixa_logico(valor: float, estado: Optional[Dict[str, Any]] = None):
     """
     Caixa lógico soberano (derivado).
     """
-    ESTADO_GLOBAL["capital_total"] += valor
-    ESTADO_GLOBAL["capital_disponivel"] += valor
-    ESTADO_GLOBAL["ultima_atualizacao"] = utc_now_iso()
+    with _estado_governanca(estado) as estado:
+        estado["capital_total"] += valor
+        estado["capital_disponivel"] += valor
+        estado["ultima_atualizacao"] = utc_now_iso()
 
 
 # ==========================================================
@@ -220,30 +318,53 @@ def decidir_acao(evento: EventoFinanceiro) -> Dict[str, Any]:
 # GOVERNANÇA — LIMITES MACRO
 # ==========================================================
 
-def risco_atual_pct() -> float:
-    if ESTADO_GLOBAL["capital_total"] <= 0:
+def risco_atual_pct(estado: Optional[Dict[str, Any]] = None) -> float:
+    if estado is None:
+        estado = ESTADO_GLOBAL.copia()
+    if estado["capital_total"] <= 0:
         return 0.0
-    return (ESTADO_GLOBAL["capital_em_risco"] / ESTADO_GLOBAL["capital_total"]) * 100
+    return (estado["capital_em_risco"] / estado["capital_total"]) * 100
 
 
-def risco_permitido(valor: float) -> bool:
+def risco_permitido(valor: float, estado: Optional[Dict[str, Any]] = None) -> bool:
+    if estado is None:
+        estado = ESTADO_GLOBAL.copia()
     risco_projetado = (
-        (ESTADO_GLOBAL["capital_em_risco"] + valor)
-        / max(ESTADO_GLOBAL["capital_total"], 1)
+        (estado["capital_em_risco"] + valor)
+        / max(estado["capital_total"], 1)
     ) * 100
     return risco_projetado <= RISCO_MAX_PCT
 
 
-def registrar_risco(valor: float):
-    ESTADO_GLOBAL["capital_em_risco"] += valor
-    ESTADO_GLOBAL["capital_disponivel"] -= valor
-    ESTADO_GLOBAL["ultima_atualizacao"] = utc_now_iso()
+def registrar_risco(valor: float, estado: Optional[Dict[str, Any]] = None):
+    with _estado_governanca(estado) as estado:
+        estado["capital_em_risco"] += valor
+        estado["capital_disponivel"] -= valor
+        estado["ultima_atualizacao"] = utc_now_iso()
 
 
 # ==========================================================
 # EXECUÇÃO SOB GOVERNANÇA (LEGADA)
 # ==========================================================
 
+def dobrar_governanca(
+    estado: Dict[str, Any],
+    evento: EventoFinanceiro,
+    decisao: Dict[str, Any]
+) -> bool:
+    """
+    Um passo da governança sobre `estado` — o mesmo ao vivo e na
+    reconstrução a partir de eventos_financeiros. True = escala autorizada.
+    """
+    if decisao["decisao"] != "ESCALAR":
+        return False
+    if not risco_permitido(evento.valor_bruto, estado):
+        return False
+    registrar_risco(evento.valor_bruto * 0.1, estado)
+    atualizar_caixa_logico(evento.valor_bruto, estado)
+    return True
+
+
 def executar_decisao(evento: EventoFinanceiro, decisao: Dict[str, Any]):
     """
     Execução soberana baseada em governança.
@@ -251,9 +372,10 @@ def executar_decisao(evento: EventoFinanceiro, decisao: Dict[str, Any]):
     NÃO altera saldos reais.
     """
     if decisao["decisao"] == "ESCALAR":
-        if risco_permitido(evento.valor_bruto):
-            registrar_risco(evento.valor_bruto * 0.1)
-            atualizar_caixa_logico(evento.valor_bruto)
+        # Checagem + registro na mesma transação: dois workers não passam juntos do limite
+        with ESTADO_GLOBAL.transacao() as estado:
+            autorizado = dobrar_governanca(estado, evento, decisao)
+        if autorizado:
             log(
                 "EXECUCAO",
                 "INFO",
@@ -287,6 +409,46 @@ def pipeline_operacional(evento: EventoFinanceiro):
     decisao = decidir_acao(evento)
     executar_decisao(evento, decisao)
 
+
+# ==========================================================
+# RECONSTRUÇÃO DA GOVERNANÇA NO BOOT (eventos_financeiros)
+# Snapshot mais recente + cauda reaplicada pela mesma dobra ao vivo
+# Só o worker que cria o ESTADO_GLOBAL reconstrói; GOVERNANCA_RECONSTRUIR=0 desliga
+# ==========================================================
+
+from reconstrucao_governanca import ReconstrucaoGovernanca
+
+GOVERNANCA_RECONSTRUIR = os.getenv("GOVERNANCA_RECONSTRUIR", "1") == "1"
+
+_CAMPOS_EVENTO = tuple(EventoFinanceiro.__fields__)
+
+
+def _dobrar_evento(estado: Dict[str, Any], linha: Dict[str, Any]):
+    evento = EventoFinanceiro(**{c: linha.get(c) for c in _CAMPOS_EVENTO})
+    dobrar_governanca(estado, evento, decidir_acao(evento))
+
+
+reconstrucao_governanca: Optional[ReconstrucaoGovernanca] = None
+
+if GOVERNANCA_RECONSTRUIR and ESTADO_GLOBAL.criado:
+    reconstrucao_governanca = ReconstrucaoGovernanca(
+        sb,
+        _dobrar_evento,
+        ("capital_total", "capital_em_risco", "capital_disponivel", "ultima_atualizacao")
+    )
+    try:
+        # Dobra num rascunho local (fora da trava entre processos) e grava
+        # só os campos finais numa transação curta
+        rascunho = ESTADO_GLOBAL.copia()
+        reconstrucao_governanca.reconstruir(rascunho)
+        with ESTADO_GLOBAL.transacao() as estado:
+            for campo in reconstrucao_governanca.campos:
+                estado[campo] = rascunho[campo]
+        reconstrucao_governanca.iniciar_snapshots()
+    except Exception as e:
+        log("GOVERNANCA", "WARN", f"Reconstrução do estado falhou — partindo do zero: {e}")
+        reconstrucao_governanca = None
+
 # ==========================================================
 # main.py — PARTE 3 / N
 # Segurança • Normalização • Webhooks Integrados ao Financeiro Real
@@ -296,78 +458,72 @@ def pipeline_operacional(evento: EventoFinanceiro):
 # SEGURANÇA — HMAC / ASSINATURAS
 # ==========================================================
 
-HOTMART_WEBHOOK_SECRET = os.getenv("HOTMART_WEBHOOK_SECRET", "")
-EDUZZ_WEBHOOK_SECRET = os.getenv("EDUZZ_WEBHOOK_SECRET", "")
-MONETIZZE_WEBHOOK_SECRET = os.getenv("MONETIZZE_WEBHOOK_SECRET", "")
-
-def verify_hmac_sha256(payload: bytes, signature: str, secret: str) -> bool:
-    if not secret or not signature:
-        return False
-    digest = hmac.new(secret.encode(), payload, hashlib.sha256).hexdigest()
-    return hmac.compare_digest(digest, signature)
+# Verificador único: estados HMAC pré-computados, rotação (atual + anterior)
+# e cabeçalhos normalizados — ver assinaturas.py
+from assinaturas import verificador as verificador_assinaturas
 
 
 # ==========================================================
 # NORMALIZAÇÃO CANÔNICA (LEGADA — DECISÃO / GOVERNANÇA)
+# Extração declarativa pré-compilada: ver extratores.py
 # ==========================================================
 
+from extratores import extrair_evento
+
+
+def _evento_financeiro(dados_evento: Dict[str, Any]) -> EventoFinanceiro:
+    return EventoFinanceiro(**dados_evento, recebido_em=utc_now_iso())
+
+
 def normalizar_evento_hotmart(payload: Dict[str, Any]) -> EventoFinanceiro:
-    return EventoFinanceiro(
-        plataforma="HOTMART",
-        oferta=str(payload.get("data", {}).get("product", {}).get("id")),
-        valor_bruto=float(
-            payload.get("data", {})
-            .get("purchase", {})
-            .get("price", {})
-            .get("value", 0)
-        ),
-        moeda=payload.get("data", {})
-              .get("purchase", {})
-              .get("price", {})
-              .get("currency", "BRL"),
-        status="APROVADO",
-        origem_evento=payload.get("event", "HOTMART"),
-        recebido_em=utc_now_iso()
-    )
+    return _evento_financeiro(extrair_evento("HOTMART", payload, estrito=False)[1])
 
 
 def normalizar_evento_eduzz(payload: Dict[str, Any]) -> EventoFinanceiro:
-    return EventoFinanceiro(
-        plataforma="EDUZZ",
-        oferta=str(payload.get("product", {}).get("id")),
-        valor_bruto=float(payload.get("sale", {}).get("value", 0)),
-        moeda=payload.get("sale", {}).get("currency", "BRL"),
-        status="APROVADO",
-        origem_evento=payload.get("event_type", "EDUZZ"),
-        recebido_em=utc_now_iso()
-    )
+    return _evento_financeiro(extrair_evento("EDUZZ", payload, estrito=False)[1])
 
 
 def normalizar_evento_monetizze(payload: Dict[str, Any]) -> EventoFinanceiro:
-    return EventoFinanceiro(
-        plataforma="MONETIZZE",
-        oferta=str(payload.get("produto", {}).get("codigo")),
-        valor_bruto=float(payload.get("venda", {}).get("valor", 0)),
-        moeda=payload.get("moeda", "BRL"),
-        status="APROVADO",
-        origem_evento=payload.get("tipo", "MONETIZZE"),
-        recebido_em=utc_now_iso()
-    )
+    return _evento_financeiro(extrair_evento("MONETIZZE", payload, estrito=False)[1])
 
 
 # ==========================================================
 # IMPORTAÇÃO DOS SERVICES FINANCEIROS REAIS
 # ==========================================================
 
-from sales_service import registrar_venda
-from commission_service import calcular_comissao
-from balance_service import adicionar_comissao
+from idempotency_service import DedupeVendas
+from pipeline_financeiro import PipelineFinanceiro
+
+
+# ==========================================================
+# IDEMPOTÊNCIA DE VENDAS — (platform, external_sale_id)
+# Retry da plataforma NÃO gera venda nem comissão em dobro
+# ==========================================================
+
+dedupe_vendas = DedupeVendas()
+
+threading.Thread(target=dedupe_vendas.carregar, args=(sb,), daemon=True).start()
+
+
+@app.get("/financeiro/idempotencia/status")
+def status_idempotencia():
+    return dedupe_vendas.status()
 
 
 # ==========================================================
 # FUNÇÃO INTERNA — PIPELINE FINANCEIRO REAL
+# (implementação em pipeline_financeiro.py, compartilhada com o replay)
 # ==========================================================
 
+pipeline_real = PipelineFinanceiro(
+    sb,
+    dedupe=dedupe_vendas,
+    escritor=escritor_lote,
+    agregador=agregador_saldos,
+    taxas=taxas_comissao
+)
+
+
 def pipeline_financeiro_real(
     *,
     platform: str,
@@ -377,35 +533,69 @@ def pipeline_financeiro_real(
     commission_total: float,
     partner_id: Optional[str],
     payload: Dict[str, Any]
-):
-    percentual_parceiro = 0.60
-
-    comissao = calcular_comissao(
-        commission_total=commission_total,
-        percentual_parceiro=percentual_parceiro
-    )
-
-    registrar_venda(
-        sb,
+) -> bool:
+    """
+    Retorna False quando a venda é duplicata (nada foi gravado nem creditado).
+    """
+    return pipeline_real.processar_venda(
         platform=platform,
         external_sale_id=external_sale_id,
         product_id=product_id,
-        partner_id=partner_id,
         gross_value=gross_value,
-        commission_value=commission_total,
-        partner_commission=comissao["partner_commission"],
-        master_commission=comissao["master_commission"],
-        sale_status="approved",
-        occurred_at=utc_now(),
+        commission_total=commission_total,
+        partner_id=partner_id,
         payload=payload
     )
 
-    if partner_id:
-        adicionar_comissao(
-            sb,
-            partner_id=partner_id,
-            valor=comissao["partner_commission"]
-        )
+
+# ==========================================================
+# PROCESSAMENTO POR PLATAFORMA (INLINE OU VIA FILA DURÁVEL)
+# Uma única passada no payload: venda + evento soberano
+# ==========================================================
+
+def processar_webhook(plataforma: str, payload: Dict[str, Any]):
+    venda, dados_evento = extrair_evento(plataforma, payload)
+
+    # Financeiro real (fonte da verdade)
+    if not pipeline_financeiro_real(**venda, payload=payload):
+        return
+
+    # Camada soberana (decisão / governança)
+    pipeline_operacional(_evento_financeiro(dados_evento))
+
+
+# ==========================================================
+# FILA DURÁVEL DE WEBHOOKS (ACEITAR → PROCESSAR)
+# WEBHOOK_MODO_FILA=1 → handler só valida HMAC, grava no journal e responde
+# ==========================================================
+
+from starlette.concurrency import run_in_threadpool
+
+WEBHOOK_MODO_FILA = os.getenv("WEBHOOK_MODO_FILA", "0") == "1"
+
+fila_webhooks = None
+
+if WEBHOOK_MODO_FILA:
+    from fila_webhooks import FilaWebhooks
+
+    fila_webhooks = FilaWebhooks(processar_webhook)
+    fila_webhooks.iniciar()
+
+
+async def aceitar_webhook(plataforma: str, raw_body: bytes) -> Dict[str, Any]:
+    """
+    Modo fila: grava no journal (fsync fora do event loop) e responde.
+    Modo inline: processa na hora (comportamento original), fora do event loop —
+    com ESCRITA_EM_LOTE a venda espera a descarga do lote, e outras requisições
+    precisam continuar entrando no mesmo lote enquanto isso.
+    """
+    if fila_webhooks is not None:
+        await run_in_threadpool(fila_webhooks.publicar, plataforma, raw_body)
+        return {"status": "ACEITO", "plataforma": plataforma}
+
+    payload = codec_json.loads(raw_body)
+    await run_in_threadpool(processar_webhook, plataforma, payload)
+    return {"status": "OK", "plataforma": plataforma}
 
 
 # ==========================================================
@@ -417,27 +607,10 @@ async def webhook_hotmart(request: Request):
     raw_body = await request.body()
     signature = request.headers.get("X-Hotmart-Hmac-SHA256")
 
-    if not verify_hmac_sha256(raw_body, signature, HOTMART_WEBHOOK_SECRET):
+    if not verificador_assinaturas.verificar("HOTMART", raw_body, signature):
         raise HTTPException(status_code=401, detail="Assinatura Hotmart inválida")
 
-    payload = json.loads(raw_body.decode())
-
-    # Financeiro real (fonte da verdade)
-    pipeline_financeiro_real(
-        platform="HOTMART",
-        external_sale_id=payload["data"]["purchase"]["transaction"],
-        product_id=str(payload["data"]["product"]["id"]),
-        gross_value=float(payload["data"]["purchase"]["price"]["value"]),
-        commission_total=float(payload["data"]["purchase"]["commission"]["value"]),
-        partner_id=payload.get("data", {}).get("affiliate", {}).get("affiliate_code"),
-        payload=payload
-    )
-
-    # Camada soberana (decisão / governança)
-    evento = normalizar_evento_hotmart(payload)
-    pipeline_operacional(evento)
-
-    return {"status": "OK", "plataforma": "HOTMART"}
+    return await aceitar_webhook("HOTMART", raw_body)
 
 
 # ==========================================================
@@ -449,25 +622,10 @@ async def webhook_eduzz(request: Request):
     raw_body = await request.body()
     signature = request.headers.get("X-Eduzz-Signature")
 
-    if not verify_hmac_sha256(raw_body, signature, EDUZZ_WEBHOOK_SECRET):
+    if not verificador_assinaturas.verificar("EDUZZ", raw_body, signature):
         raise HTTPException(status_code=401, detail="Assinatura Eduzz inválida")
 
-    payload = json.loads(raw_body.decode())
-
-    pipeline_financeiro_real(
-        platform="EDUZZ",
-        external_sale_id=str(payload["sale"]["id"]),
-        product_id=str(payload["product"]["id"]),
-        gross_value=float(payload["sale"]["value"]),
-        commission_total=float(payload["sale"]["commission"]),
-        partner_id=payload.get("affiliate", {}).get("id"),
-        payload=payload
-    )
-
-    evento = normalizar_evento_eduzz(payload)
-    pipeline_operacional(evento)
-
-    return {"status": "OK", "plataforma": "EDUZZ"}
+    return await aceitar_webhook("EDUZZ", raw_body)
 
 
 # ==========================================================
@@ -479,25 +637,30 @@ async def webhook_monetizze(request: Request):
     raw_body = await request.body()
     signature = request.headers.get("X-Monetizze-Signature")
 
-    if not verify_hmac_sha256(raw_body, signature, MONETIZZE_WEBHOOK_SECRET):
+    if not verificador_assinaturas.verificar("MONETIZZE", raw_body, signature):
         raise HTTPException(status_code=401, detail="Assinatura Monetizze inválida")
 
-    payload = json.loads(raw_body.decode())
+    return await aceitar_webhook("MONETIZZE", raw_body)
 
-    pipeline_financeiro_real(
-        platform="MONETIZZE",
-        external_sale_id=str(payload["venda"]["codigo"]),
-        product_id=str(payload["produto"]["codigo"]),
-        gross_value=float(payload["venda"]["valor"]),
-        commission_total=float(payload["venda"]["comissao"]),
-        partner_id=payload.get("afiliado", {}).get("codigo"),
-        payload=payload
-    )
 
-    evento = normalizar_evento_monetizze(payload)
-    pipeline_operacional(evento)
+# ==========================================================
+# ASSINATURAS — LATÊNCIA E FALHAS POR PLATAFORMA
+# ==========================================================
+
+@app.get("/webhook/assinaturas/metricas")
+def metricas_assinaturas():
+    return verificador_assinaturas.metricas()
 
-    return {"status": "OK", "plataforma": "MONETIZZE"}
+
+# ==========================================================
+# FILA DE WEBHOOKS — PROFUNDIDADE E LAG
+# ==========================================================
+
+@app.get("/webhook/fila/status")
+def status_fila_webhooks():
+    if fila_webhooks is None:
+        return {"modo": "INLINE"}
+    return {"modo": "FILA", **fila_webhooks.status()}
 
 # ==========================================================
 # main.py — PARTE 4 / N
@@ -514,12 +677,13 @@ def visao_financeira():
     Visão consolidada DERIVADA.
     Não é contábil primária.
     """
+    estado = ESTADO_GLOBAL.copia()
     return {
-        "capital_total": ESTADO_GLOBAL["capital_total"],
-        "capital_disponivel": ESTADO_GLOBAL["capital_disponivel"],
-        "capital_em_risco": ESTADO_GLOBAL["capital_em_risco"],
-        "risco_pct": risco_atual_pct(),
-        "atualizado_em": ESTADO_GLOBAL["ultima_atualizacao"],
+        "capital_total": estado["capital_total"],
+        "capital_disponivel": estado["capital_disponivel"],
+        "capital_em_risco": estado["capital_em_risco"],
+        "risco_pct": risco_atual_pct(estado),
+        "atualizado_em": estado["ultima_atualizacao"],
     }
 
 
@@ -532,30 +696,146 @@ def acao_humana(payload: AcaoFinanceiraHumana):
     registro = payload.dict()
     registro["executado_em"] = utc_now_iso()
 
-    sb.table("acoes_financeiras_humanas").insert(registro).execute()
+    if escritor_lote is not None:
+        # Espera a descarga do lote: falha continua chegando ao chamador.
+        # Endpoint síncrono (def): a espera ocupa uma thread do threadpool, não o event loop
+        escritor_lote.enviar("acoes_financeiras_humanas", registro).result()
+    else:
+        sb.table("acoes_financeiras_humanas").insert(registro).execute()
     log("HUMANO", "INFO", f"Ação financeira registrada: {payload.acao}")
 
     return {"status": "OK", "mensagem": "Ação financeira registrada"}
 
 
+@app.get("/financeiro/escrita-lote/status")
+def status_escrita_lote():
+    if escritor_lote is None:
+        return {"modo": "DIRETO"}
+    return {"modo": "LOTE", **escritor_lote.status()}
+
+
+@app.on_event("shutdown")
+def encerrar_escrita_lote():
+    if escritor_lote is not None:
+        escritor_lote.encerrar()
+
+
+@app.get("/financeiro/saldos/agregador/status")
+def status_agregador_saldos():
+    if agregador_saldos is None:
+        return {"modo": "DIRETO"}
+    return {"modo": "JANELA", **agregador_saldos.status()}
+
+
+@app.on_event("shutdown")
+def encerrar_agregador_saldos():
+    if agregador_saldos is not None:
+        agregador_saldos.encerrar()
+
+
+# ==========================================================
+# LEDGER DE SALDOS — COMPACTAÇÃO PERIÓDICA E CONSULTA
+# LEDGER_COMPACTACAO_S=0 → sem compactação neste processo (ex: cron externo)
+# ==========================================================
+
+from ledger_service import LEDGER_COMPACTACAO_S, CompactadorLedger, saldo_parceiro
+
+compactador_ledger = CompactadorLedger(sb) if LEDGER_COMPACTACAO_S > 0 else None
+
+
+@app.get("/financeiro/saldos/ledger/status")
+def status_ledger():
+    if compactador_ledger is None:
+        return {"compactacao": "DESLIGADA"}
+    return {"compactacao": "ATIVA", **compactador_ledger.status()}
+
+
+@app.get("/financeiro/saldos/{partner_id}")
+def consultar_saldo_parceiro(partner_id: str, em: Optional[datetime] = None):
+    """Saldo atual (snapshot + cauda) ou em uma data: ?em=2024-05-31T23:59:59Z"""
+    return saldo_parceiro(sb, partner_id, em)
+
+
+@app.on_event("shutdown")
+def encerrar_compactador_ledger():
+    if compactador_ledger is not None:
+        compactador_ledger.encerrar()
+
+
+@app.get("/governanca/reconstrucao/status")
+def status_reconstrucao_governanca():
+    if reconstrucao_governanca is None:
+        return {"reconstrucao": "DESLIGADA"}
+    return reconstrucao_governanca.status()
+
+
+@app.on_event("shutdown")
+def encerrar_reconstrucao_governanca():
+    if reconstrucao_governanca is not None:
+        reconstrucao_governanca.encerrar()
+
+
+@app.get("/financeiro/taxas/status")
+def status_taxas_comissao():
+    return taxas_comissao.status()
+
+
+@app.post("/financeiro/taxas/invalidar")
+def invalidar_taxas_comissao():
+    # Recarrega só este worker; os demais convergem pelo TTL
+    return {"status": "OK", "taxas": taxas_comissao.invalidar()}
+
+
 # ==========================================================
 # AUDITORIA HUMANA — EVENTOS LEGADOS
 # ==========================================================
 
-@app.get("/financeiro/auditoria")
-def auditoria_financeira(limit: int = 50):
-    response = (
+def _auditoria_banco(limit: int) -> List[Dict[str, Any]]:
+    return (
         sb.table("eventos_financeiros")
         .select("*")
         .order("recebido_em", desc=True)
         .limit(limit)
         .execute()
+        .data
     )
 
-    return {
-        "total": len(response.data),
-        "eventos": response.data
-    }
+
+if log_eventos is not None:
+    try:
+        log_eventos.semear_cauda(_auditoria_banco(log_eventos.cauda.maxlen)[::-1])
+    except Exception as e:
+        log("AUDITORIA", "WARN", f"Cauda de auditoria começa vazia: {e}")
+
+
+@app.get("/financeiro/auditoria")
+def auditoria_financeira(limit: int = 50, fonte: Optional[str] = None):
+    """
+    Com EVENTOS_EM_SEGMENTOS=1 lê a cauda em memória deste worker
+    (limit até SEGMENTOS_CAUDA); fonte=banco força a consulta ao Supabase.
+    """
+    if log_eventos is not None and fonte != "banco" and limit <= log_eventos.cauda.maxlen:
+        eventos = log_eventos.recentes(limit)
+    else:
+        eventos = _auditoria_banco(limit)
+
+    return RespostaJSONRapida({
+        "total": len(eventos),
+        "eventos": eventos
+    })
+
+
+@app.get("/financeiro/auditoria/segmentos/status")
+def status_segmentos_eventos():
+    if log_eventos is None:
+        return {"modo": "DIRETO"}
+    return {"modo": "SEGMENTOS", **log_eventos.status()}
+
+
+@app.on_event("shutdown")
+def encerrar_segmentos_eventos():
+    if log_eventos is not None:
+        log_eventos.encerrar()
 
 
 # ==========================================================
@@ -564,15 +844,16 @@ def auditoria_financeira(limit: int = 50):
 
 @app.get("/governanca/status")
 def status_governanca():
+    estado = ESTADO_GLOBAL.copia()
     return {
-        "estado_operacional": ESTADO_GLOBAL["estado_operacional"],
-        "capital_total": ESTADO_GLOBAL["capital_total"],
-        "capital_disponivel": ESTADO_GLOBAL["capital_disponivel"],
-        "capital_em_risco": ESTADO_GLOBAL["capital_em_risco"],
-        "risco_pct": risco_atual_pct(),
+        "estado_operacional": estado["estado_operacional"],
+        "capital_total": estado["capital_total"],
+        "capital_disponivel": estado["capital_disponivel"],
+        "capital_em_risco": estado["capital_em_risco"],
+        "risco_pct": risco_atual_pct(estado),
         "risco_max_permitido_pct": RISCO_MAX_PCT,
         "plataformas_permitidas": PLATAFORMAS_PERMITIDAS,
-        "atualizado_em": ESTADO_GLOBAL["ultima_atualizacao"],
+        "atualizado_em": estado["ultima_atualizacao"],
     }
 
 
@@ -654,14 +935,15 @@ def gerar_caminho(dor: Dor, contexto: Contexto, ofertas: List[str]) -> Caminho:
 
 
 def registrar_caminho(caminho: Caminho):
-    sb.table("caminhos").insert({
+    # Gravado em massa pelo coletor dos cliques (upsert por id: reenvio não duplica)
+    registrar_clique("caminhos", {
         "id": caminho.id,
         "dor": caminho.dor.codigo,
         "contexto": caminho.contexto.dict(),
         "ofertas": caminho.ofertas,
         "prioridade": caminho.prioridade,
         "atualizado_em": caminho.atualizado_em
-    }).execute()
+    })
 
 
 def interpretar_contexto_clique(eventos: List[Dict[str, Any]]) -> Contexto:
@@ -677,13 +959,180 @@ def interpretar_contexto_clique(eventos: List[Dict[str, Any]]) -> Contexto:
 # GO ROUTER — MONETIZAÇÃO DIRETA (B1)
 # ==========================================================
 
-@app.get("/go")
-def go_router(produto: str, request: Request):
-    """
-    Roteador direto de monetização.
-    Não decide, não bloqueia, não pontua.
-    Apenas redireciona para LINK MASTER ativo.
-    """
+# Tabela de redirects compartilhada por todos os workers do host (tabela_redirects.py):
+# offers, GULs e go_tracking em um arquivo mmap; REDIRECTS_MMAP=0 → índices por worker
+from tabela_redirects import GO as REDIRECT_GO, GUL as REDIRECT_GUL, OFERTA as REDIRECT_OFERTA
+
+REDIRECTS_MMAP = os.getenv("REDIRECTS_MMAP", "1") == "1"
+
+tabela_redirects = None
+compilador_redirects = None
+
+if REDIRECTS_MMAP:
+    from tabela_redirects import CompiladorRedirects, TabelaRedirects
+
+    compilador_redirects = CompiladorRedirects(sb)
+    tabela_redirects = TabelaRedirects()
+
+
+def _buscar_redirect(tipo: int, chave: str) -> Optional[Dict[str, Any]]:
+    """Entrada da tabela mmap; None também quando a tabela ainda não foi compilada."""
+    if tabela_redirects is None or not tabela_redirects.disponivel:
+        return None
+    return tabela_redirects.buscar(tipo, chave)
+
+
+# /go/{id} desconhecido na memória e no banco não volta ao banco por
+# INDICES_NEGATIVO_TTL_S (robôs sondando ids aleatórios); chave (tipo, id).
+# GUL ou oferta ausente da tabela/índice fresco é 404 sem banco; as faltas que
+# ainda vão ao banco (go_tracking fora da janela em memória, índice atrasado)
+# passam por um teto por worker (INDICES_BANCO_POR_S) → 503 acima dele
+from indices_redirect import CacheNegativo, LimiteConsultas
+
+cache_negativo_go = CacheNegativo()
+limite_banco_go = LimiteConsultas()
+
+metricas_resolvedor_go = {
+    "gul": 0,
+    "go_tracking": 0,
+    "token": 0,
+    "formato_invalido": 0,
+    "consultas_banco": 0,
+    "ausentes": 0,
+    "faltas_memoria_completa": 0,
+    "banco_limitado": 0,
+}
+
+
+def _permitir_consulta_go():
+    """Falta que vai ao banco: dentro do teto por worker ou 503."""
+    if not limite_banco_go.permitir():
+        metricas_resolvedor_go["banco_limitado"] += 1
+        raise HTTPException(status_code=503, detail="Tente novamente", headers={"Retry-After": "1"})
+    metricas_resolvedor_go["consultas_banco"] += 1
+
+
+def _invalidar_gul(gul: str):
+    """GUL recém-inserido em produtos: tira do cache negativo e relê na tabela/índice."""
+    gul_id = gul.rsplit("/", 1)[-1]
+    cache_negativo_go.remover((REDIRECT_GUL, gul_id))
+    if compilador_redirects is not None:
+        compilador_redirects.invalidar(REDIRECT_GUL, gul_id)
+    elif indice_gul is not None:
+        indice_gul.invalidar(gul_id)
+
+
+@app.get("/go/redirects/status")
+def status_tabela_redirects():
+    if tabela_redirects is None:
+        return {"modo": "POR_WORKER"}
+    return {"modo": "MMAP", **tabela_redirects.status(), "compilacao": compilador_redirects.status()}
+
+
+@app.on_event("shutdown")
+def encerrar_compilador_redirects():
+    if compilador_redirects is not None:
+        compilador_redirects.encerrar()
+
+
+# Cliques gravados em massa fora da requisição (coletor_cliques.py); CLIQUES_EM_LOTE=0 → INSERT no redirect
+CLIQUES_EM_LOTE = os.getenv("CLIQUES_EM_LOTE", "1") == "1"
+
+coletor_cliques = None
+
+if CLIQUES_EM_LOTE:
+    from coletor_cliques import ColetorCliques
+
+    coletor_cliques = ColetorCliques(sb, chaves_unicas={"caminhos": "id"})
+
+
+# Últimos cliques por slug em memória (janelas_cliques.py) para o /go/caminho;
+# CAMINHO_EM_MEMORIA=0 → consulta a clicks por chamada
+CAMINHO_EM_MEMORIA = os.getenv("CAMINHO_EM_MEMORIA", "1") == "1"
+CAMINHO_SEMENTE = int(os.getenv("CAMINHO_SEMENTE", "5000"))
+
+janelas_cliques = None
+
+if CAMINHO_EM_MEMORIA:
+    from janelas_cliques import JanelasCliques
+
+    janelas_cliques = JanelasCliques()
+    try:
+        semente = (
+            sb.table("clicks")
+            .select("slug,offer_id,origem,ts")
+            .order("ts", desc=True)
+            .limit(CAMINHO_SEMENTE)
+            .execute()
+            .data
+        ) or []
+        janelas_cliques.semear(semente[::-1])
+    except Exception as e:
+        log("GO", "WARN", f"Janelas de cliques começam vazias (semente falhou): {str(e)}")
+
+
+def registrar_clique(tabela: str, linha: Dict[str, Any]):
+    if janelas_cliques is not None and tabela == "clicks":
+        janelas_cliques.registrar(linha)
+    if coletor_cliques is not None:
+        coletor_cliques.registrar(tabela, linha)
+        return
+    sb.table(tabela).insert(linha).execute()
+
+
+@app.get("/go/cliques/status")
+def status_coletor_cliques():
+    if coletor_cliques is None:
+        return {"modo": "DIRETO"}
+    return {"modo": "LOTE", **coletor_cliques.status()}
+
+
+@app.on_event("shutdown")
+def encerrar_coletor_cliques():
+    if coletor_cliques is not None:
+        coletor_cliques.encerrar()
+
+
+# Ponte de aquisição (Google Ads → Eduzz): mesmo coletor de cliques
+from controlador_acao_externa import router as router_aquisicao, configurar_coletor_cliques
+
+configurar_coletor_cliques(registrar_clique)
+app.include_router(router_aquisicao)
+
+# Ofertas ativas em memória por worker (indices_redirect.py), quando sem tabela mmap;
+# OFERTAS_EM_MEMORIA=0 → consulta por clique
+OFERTAS_EM_MEMORIA = os.getenv("OFERTAS_EM_MEMORIA", "0" if REDIRECTS_MMAP else "1") == "1"
+
+indice_ofertas = None
+
+if OFERTAS_EM_MEMORIA:
+    from indices_redirect import IndiceOfertas
+
+    indice_ofertas = IndiceOfertas(sb)
+
+
+def _buscar_oferta(produto: str) -> Optional[Dict[str, Any]]:
+    oferta = None
+    completa = False
+    if tabela_redirects is not None and tabela_redirects.disponivel:
+        oferta = _buscar_redirect(REDIRECT_OFERTA, produto)
+        completa = tabela_redirects.fresca
+    elif indice_ofertas is not None:
+        oferta = indice_ofertas.oferta(produto)
+        completa = indice_ofertas.fresco
+    if oferta is not None:
+        return oferta
+
+    # Mesma regra dos GULs: só memória em dia responde "ausente" sem banco
+    if completa:
+        metricas_resolvedor_go["faltas_memoria_completa"] += 1
+        return None
+
+    # Memória atrasada ou sem índice: banco
+    if cache_negativo_go.contem((REDIRECT_OFERTA, produto)):
+        return None
+    _permitir_consulta_go()
+
     try:
         res = (
             sb.table("offers")
@@ -696,12 +1145,60 @@ def go_router(produto: str, request: Request):
     except Exception as e:
         log("GO", "ERRO", f"Falha Supabase: {str(e)}")
         raise HTTPException(status_code=500, detail="Erro interno")
-
     if not res.data:
+        metricas_resolvedor_go["ausentes"] += 1
+        cache_negativo_go.registrar((REDIRECT_OFERTA, produto))
+        return None
+    return res.data[0]
+
+
+@app.get("/go/ofertas/status")
+def status_indice_ofertas():
+    if tabela_redirects is not None and tabela_redirects.disponivel:
+        return {
+            "modo": "MMAP",
+            "arquivo": tabela_redirects.caminho,
+            "fresca": tabela_redirects.fresca,
+            **tabela_redirects.status_tipo(REDIRECT_OFERTA),
+        }
+    if indice_ofertas is None:
+        return {"modo": "DIRETO"}
+    return {"modo": "MEMORIA", **indice_ofertas.status()}
+
+
+@app.post("/go/ofertas/invalidar")
+def invalidar_indice_ofertas(slug: Optional[str] = None):
+    """Após alterar offers: relê o slug (ou tudo, sem slug) neste worker."""
+    if slug:
+        cache_negativo_go.remover((REDIRECT_OFERTA, slug))
+    if compilador_redirects is not None:
+        # Atendido pelo compilador do host em até ~100ms
+        compilador_redirects.invalidar(REDIRECT_OFERTA, slug)
+        return {"status": "OK", "modo": "MMAP"}
+    if indice_ofertas is None:
+        return {"status": "OK", "modo": "DIRETO"}
+    return {"status": "OK", "ofertas": indice_ofertas.invalidar(slug)}
+
+
+@app.on_event("shutdown")
+def encerrar_indice_ofertas():
+    if indice_ofertas is not None:
+        indice_ofertas.encerrar()
+
+
+@app.get("/go")
+def go_router(produto: str, request: Request):
+    """
+    Roteador direto de monetização.
+    Não decide, não bloqueia, não pontua.
+    Apenas redireciona para LINK MASTER ativo.
+    """
+    offer = _buscar_oferta(produto)
+
+    if offer is None:
         log("GO", "WARN", f"Produto não encontrado ou inativo: {produto}")
         raise HTTPException(status_code=404, detail="Produto não encontrado")
 
-    offer = res.data[0]
     target_url = offer.get("url_afiliado")
 
     if not target_url:
@@ -709,13 +1206,13 @@ def go_router(produto: str, request: Request):
         raise HTTPException(status_code=500, detail="URL de destino inexistente")
 
     try:
-        sb.table("clicks").insert({
+        registrar_clique("clicks", {
             "slug": produto,
             "offer_id": offer.get("id"),
             "ip": request.client.host if request.client else None,
             "user_agent": request.headers.get("user-agent"),
             "ts": utc_now_iso()
-        }).execute()
+        })
     except Exception as e:
         log("GO", "WARN", f"Falha ao registrar clique: {str(e)}")
 
@@ -723,19 +1220,29 @@ def go_router(produto: str, request: Request):
     return RedirectResponse(url=target_url, status_code=302)
 
 
+@app.get("/go/caminho/status")
+def status_janelas_cliques():
+    if janelas_cliques is None:
+        return {"modo": "DIRETO"}
+    return {"modo": "MEMORIA", **janelas_cliques.status()}
+
+
 @app.get("/go/caminho")
 def go_caminho(dor_codigo: str, produto: str, request: Request):
     dor = Dor(codigo=dor_codigo)
 
-    eventos = (
-        sb.table("clicks")
-        .select("*")
-        .eq("slug", produto)
-        .order("ts", desc=True)
-        .limit(10)
-        .execute()
-        .data
-    )
+    if janelas_cliques is not None:
+        eventos = janelas_cliques.recentes(produto)
+    else:
+        eventos = (
+            sb.table("clicks")
+            .select("*")
+            .eq("slug", produto)
+            .order("ts", desc=True)
+            .limit(10)
+            .execute()
+            .data
+        )
 
     contexto = interpretar_contexto_clique(eventos)
     caminho = gerar_caminho(dor, contexto, [produto])
@@ -779,11 +1286,12 @@ validar_configuracao_producao()
 
 @app.get("/deploy/checklist")
 def checklist_deploy():
+    estado = ESTADO_GLOBAL.copia()
     return {
         "supabase_configurado": bool(SUPABASE_URL and SUPABASE_SERVICE_ROLE_KEY),
         "plataformas_permitidas": PLATAFORMAS_PERMITIDAS,
-        "estado_operacional": ESTADO_GLOBAL["estado_operacional"],
-        "capital_total": ESTADO_GLOBAL["capital_total"],
+        "estado_operacional": estado["estado_operacional"],
+        "capital_total": estado["capital_total"],
         "risco_max_pct": RISCO_MAX_PCT,
         "instancia": INSTANCE_ID,
         "timestamp": utc_now_iso(),
@@ -1049,6 +1557,8 @@ def criar_produto_b2(payload: ProdutoAfiliado, request: Request):
             "created_at": utc_now_iso()
         }).execute()
 
+        _invalidar_gul(gul)
+
         log("B2", "INFO", f"Produto criado via MASTER: {payload.nome}")
 
         return {
@@ -1073,7 +1583,7 @@ def listar_produtos_b2():
             "nome, plataforma, preco, comissao, nicho, dor, image_url, gul, status"
         ).order("created_at", desc=True).execute()
 
-        return res.data or []
+        return RespostaJSONRapida(res.data or [])
 
     except Exception as e:
         log("B2", "ERRO", f"Falha ao listar produtos: {str(e)}")
@@ -1142,6 +1652,8 @@ def master_cadastrar_produto(payload: ProdutoMaster):
             "created_at": utc_now_iso()
         }).execute()
 
+        _invalidar_gul(gul)
+
         log("B2.5", "INFO", f"GUL gerado: {gul}")
 
         return {
@@ -1162,37 +1674,102 @@ def master_cadastrar_produto(payload: ProdutoMaster):
 
 from fastapi.responses import RedirectResponse
 
-@app.get("/go/{gul_id}")
+# produtos por gul_id em memória por worker (indices_redirect.py), quando sem tabela mmap;
+# GUL_EM_MEMORIA=0 → consulta por clique
+GUL_EM_MEMORIA = os.getenv("GUL_EM_MEMORIA", "0" if REDIRECTS_MMAP else "1") == "1"
+
+indice_gul = None
+
+if GUL_EM_MEMORIA:
+    from indices_redirect import IndiceGul
+
+    indice_gul = IndiceGul(sb)
+
+
+def _buscar_produto_gul(gul_id: str) -> Optional[Dict[str, Any]]:
+    produto = None
+    completa = False
+    if tabela_redirects is not None and tabela_redirects.disponivel:
+        produto = _buscar_redirect(REDIRECT_GUL, gul_id)
+        completa = tabela_redirects.fresca
+    elif indice_gul is not None:
+        produto = indice_gul.produto(gul_id)
+        completa = indice_gul.fresco
+    if produto is not None:
+        return produto
+
+    # Tabela/índice com todos os GULs e em dia: falta é ausência (GUL recém-criado
+    # chega pela invalidação do compilador em ~1s)
+    if completa:
+        metricas_resolvedor_go["faltas_memoria_completa"] += 1
+        return None
+
+    # Memória atrasada ou sem índice: banco
+    if cache_negativo_go.contem((REDIRECT_GUL, gul_id)):
+        return None
+    _permitir_consulta_go()
+
+    # Igualdade em coluna indexada (sql/011_produtos_gul_id.sql), sem LIKE '%id'
+    res = sb.table("produtos") \
+        .select("nome, link_afiliado, plataforma, gul") \
+        .eq("gul_id", gul_id) \
+        .limit(1) \
+        .execute()
+    if not res.data:
+        metricas_resolvedor_go["ausentes"] += 1
+        cache_negativo_go.registrar((REDIRECT_GUL, gul_id))
+        return None
+    return res.data[0]
+
+
+@app.get("/go/gul/status")
+def status_indice_gul():
+    if tabela_redirects is not None and tabela_redirects.disponivel:
+        return {
+            "modo": "MMAP",
+            "arquivo": tabela_redirects.caminho,
+            "fresca": tabela_redirects.fresca,
+            **tabela_redirects.status_tipo(REDIRECT_GUL),
+        }
+    if indice_gul is None:
+        return {"modo": "DIRETO"}
+    return {"modo": "MEMORIA", **indice_gul.status()}
+
+
+@app.on_event("shutdown")
+def encerrar_indice_gul():
+    if indice_gul is not None:
+        indice_gul.encerrar()
+
+
+# Servido pelo resolvedor único de /go/{go_id} (FASE 10)
 def redirect_gul(gul_id: str):
 
     try:
         # Buscar produto pelo GUL
-        res = sb.table("produtos") \
-            .select("nome, link_afiliado, plataforma, gul") \
-            .like("gul", f"%{gul_id}") \
-            .limit(1) \
-            .execute()
+        produto = _buscar_produto_gul(gul_id)
 
-        if not res.data:
+        if produto is None:
             raise HTTPException(status_code=404, detail="GUL não encontrado")
 
-        produto = res.data[0]
         destino = produto["link_afiliado"]
 
         # ======================================================
         # LOG OPERACIONAL DO CLIQUE
         # ======================================================
-        sb.table("cliques").insert({
+        registrar_clique("cliques", {
             "gul": produto["gul"],
             "produto": produto["nome"],
             "plataforma": produto["plataforma"],
             "created_at": utc_now_iso()
-        }).execute()
+        })
 
         log("B2.6", "INFO", f"Redirect GUL -> {destino}")
 
         return RedirectResponse(destino, status_code=302)
 
+    except HTTPException:
+        raise
     except Exception as e:
         log("B2.6", "ERRO", str(e))
         raise HTTPException(status_code=500, detail="Erro no redirecionamento")
@@ -1817,6 +2394,112 @@ import uuid
 from fastapi.responses import RedirectResponse
 
 
+# go_id como token HMAC autocontido (tokens_rastreio.py): /recomendar não grava
+# go_tracking e o /go valida sem banco; GO_TOKENS_ASSINADOS=0 → linha em go_tracking
+GO_TOKENS_ASSINADOS = os.getenv("GO_TOKENS_ASSINADOS", "0") == "1"
+GO_TOKENS_MAX_LOTE = int(os.getenv("GO_TOKENS_MAX_LOTE", "1000"))
+# dor_ids por consulta "in.(...)": URL curta e resposta abaixo do max-rows do PostgREST
+GO_TOKENS_PAGINA_IN = int(os.getenv("GO_TOKENS_PAGINA_IN", "100"))
+# Teto de linhas pedido a cada consulta (≤ max-rows do PostgREST, 1000 no Supabase):
+# resposta que chega nele pode estar truncada → o lote de dores é dividido ao meio
+GO_TOKENS_MAX_LINHAS = int(os.getenv("GO_TOKENS_MAX_LINHAS", "1000"))
+
+tokens_rastreio = None
+
+if GO_TOKENS_ASSINADOS:
+    from tokens_rastreio import TokensRastreio
+
+    tokens_rastreio = TokensRastreio.do_ambiente()
+
+
+def _eh_token_rastreio(go_id: str) -> bool:
+    return tokens_rastreio is not None and "." in go_id
+
+
+def _redirecionar_token(token: str) -> RedirectResponse:
+    rastreio = tokens_rastreio.validar(token)
+    if rastreio is None:
+        raise HTTPException(status_code=404, detail="Link inválido")
+
+    # Clique em go_cliques pelo coletor em lote (sql/014_go_cliques.sql)
+    registrar_clique("go_cliques", {
+        "go_id": rastreio["go_id"],
+        "dor_id": rastreio["dor_id"],
+        "solucao_id": rastreio["solucao_id"],
+        "link_destino": rastreio["link_destino"],
+        "emitido_em": datetime.fromtimestamp(rastreio["emitido_em"], timezone.utc).isoformat(),
+        "clicado_em": utc_now_iso()
+    })
+
+    return RedirectResponse(rastreio["link_destino"])
+
+
+class PreEmissaoTokens(BaseModel):
+    dor_ids: List[str]
+
+
+@app.post("/recomendar/tokens")
+def pre_emitir_tokens(payload: PreEmissaoTokens, request: Request):
+    """
+    Pré-emissão para campanhas: um go_id por dor com a melhor solução atual,
+    uma consulta a cada GO_TOKENS_PAGINA_IN dores (dividida ao chegar em
+    GO_TOKENS_MAX_LINHAS). O destino fica fixo no token (troca de link da
+    solução exige nova emissão). Não registra decisão do robô.
+    """
+    validar_master(request)
+
+    if tokens_rastreio is None:
+        raise HTTPException(status_code=409, detail="GO_TOKENS_ASSINADOS desativado")
+
+    dor_ids = list(dict.fromkeys(payload.dor_ids))
+    if len(dor_ids) > GO_TOKENS_MAX_LOTE:
+        raise HTTPException(status_code=400, detail=f"Máximo de {GO_TOKENS_MAX_LOTE} dores por requisição")
+
+    # Ordenado por prioridade: a primeira linha de cada dor é a melhor solução
+    melhores: Dict[str, Dict[str, Any]] = {}
+    pagina = max(1, GO_TOKENS_PAGINA_IN)
+    max_linhas = max(1, GO_TOKENS_MAX_LINHAS)
+    lotes = [dor_ids[i:i + pagina] for i in range(0, len(dor_ids), pagina)]
+    while lotes:
+        lote = lotes.pop()
+        res = supabase.table("dor_solucoes") \
+            .select("dor_id, prioridade, solucoes(id, link_afiliado)") \
+            .in_("dor_id", lote) \
+            .order("prioridade", desc=True) \
+            .limit(max_linhas) \
+            .execute()
+
+        linhas = res.data or []
+        # Resposta no teto: as últimas dores do lote podem ter ficado de fora
+        if len(linhas) >= max_linhas and len(lote) > 1:
+            meio = len(lote) // 2
+            lotes += [lote[:meio], lote[meio:]]
+            continue
+
+        for linha in linhas:
+            solucao = linha.get("solucoes")
+            if linha["dor_id"] not in melhores and solucao and solucao.get("link_afiliado"):
+                melhores[linha["dor_id"]] = solucao
+
+    itens = [
+        {"dor_id": dor_id, "solucao_id": solucao["id"], "destino": solucao["link_afiliado"]}
+        for dor_id, solucao in melhores.items()
+    ]
+    tokens = tokens_rastreio.emitir_lote(itens)
+
+    return {
+        "tokens": {item["dor_id"]: token for item, token in zip(itens, tokens)},
+        "sem_solucao": [dor_id for dor_id in dor_ids if dor_id not in melhores]
+    }
+
+
+@app.get("/recomendar/tokens/status")
+def status_tokens_rastreio():
+    if tokens_rastreio is None:
+        return {"modo": "GO_TRACKING"}
+    return {"modo": "TOKEN_ASSINADO", **tokens_rastreio.status()}
+
+
 @app.get("/recomendar/{dor_id}")
 async def recomendar_solucao(dor_id: str):
     try:
@@ -1833,12 +2516,17 @@ async def recomendar_solucao(dor_id: str):
 
         solucao = res.data[0]["solucoes"]
 
-        # Gerar ID de rastreamento
-        go_id = str(uuid.uuid4())
-
         # Registrar memória do robô
         await registrar_memoria_robo(dor_id, solucao)
 
+        if tokens_rastreio is not None:
+            return {
+                "go_id": tokens_rastreio.emitir(dor_id, solucao["id"], solucao["link_afiliado"])
+            }
+
+        # Gerar ID de rastreamento
+        go_id = str(uuid.uuid4())
+
         # Registrar clique para rastreamento
         supabase.table("go_tracking").insert({
             "id": go_id,
@@ -1860,30 +2548,119 @@ async def recomendar_solucao(dor_id: str):
 # ENDPOINT DE REDIRECIONAMENTO REAL
 # =========================================================
 
-@app.get("/go/{go_id}")
-async def redirecionar(go_id: str):
-    try:
-        res = supabase.table("go_tracking") \
-            .select("*") \
-            .eq("id", go_id) \
-            .single() \
-            .execute()
+# go_tracking por id em memória por worker (indices_redirect.py), para uso sem
+# tabela mmap; desligado por padrão: go_tracking cresce uma linha por recomendação
+GO_TRACKING_EM_MEMORIA = os.getenv("GO_TRACKING_EM_MEMORIA", "0") == "1"
 
-        if not res.data:
-            raise HTTPException(status_code=404, detail="Link inválido")
+indice_go_tracking = None
+
+if GO_TRACKING_EM_MEMORIA:
+    from indices_redirect import IndiceGoTracking
+
+    indice_go_tracking = IndiceGoTracking(sb)
+
+
+def _buscar_go_tracking(go_id: str) -> Optional[Dict[str, Any]]:
+    rastreio = None
+    if tabela_redirects is not None and tabela_redirects.disponivel:
+        rastreio = _buscar_redirect(REDIRECT_GO, go_id)
+    elif indice_go_tracking is not None:
+        rastreio = indice_go_tracking.obter(go_id)
+    if rastreio is not None:
+        return rastreio
 
-        destino = res.data["link_destino"]
+    # go_id recém-gerado (ainda não compilado/indexado) ou fora da janela em
+    # memória (INDICES_GO_JANELA_S) cai no banco
+    if cache_negativo_go.contem((REDIRECT_GO, go_id)):
+        return None
+    _permitir_consulta_go()
 
-        # Registrar clique executado
-        supabase.table("go_tracking").update({
-            "clicado": True
-        }).eq("id", go_id).execute()
+    res = supabase.table("go_tracking") \
+        .select("*") \
+        .eq("id", go_id) \
+        .limit(1) \
+        .execute()
+    if not res.data:
+        metricas_resolvedor_go["ausentes"] += 1
+        cache_negativo_go.registrar((REDIRECT_GO, go_id))
+        return None
+    return res.data[0]
+
+
+def redirecionar(go_id: str):
+    try:
+        rastreio = _buscar_go_tracking(go_id)
+        if rastreio is None:
+            raise HTTPException(status_code=404, detail="Link inválido")
+
+        destino = rastreio["link_destino"]
+
+        # Clique em go_cliques pelo coletor em lote; o trigger de
+        # sql/016_go_tracking_clicado.sql marca go_tracking.clicado por lote
+        registrar_clique("go_cliques", {
+            "go_id": go_id,
+            "dor_id": rastreio.get("dor_id") or "",
+            "solucao_id": rastreio.get("solucao_id") or "",
+            "link_destino": destino,
+            "emitido_em": rastreio.get("criado_em") or utc_now_iso(),
+            "clicado_em": utc_now_iso()
+        })
 
         return RedirectResponse(destino)
 
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
+
+# /go/{id} tem três formatos; o tipo sai do próprio texto, sem consulta:
+# - token assinado (tokens_rastreio.py): contém "."
+# - go_tracking (/recomendar): UUID canônico
+# - GUL (produtos.gul_id): demais ids curtos alfanuméricos
+_FORMATO_UUID = re.compile(r"[0-9a-fA-F]{8}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{4}-[0-9a-fA-F]{12}")
+_FORMATO_GUL = re.compile(r"[A-Za-z0-9_-]{1,64}")
+
+
+def _classificar_go_id(go_id: str) -> str:
+    if _eh_token_rastreio(go_id):
+        return "token"
+    if _FORMATO_UUID.fullmatch(go_id):
+        return "go_tracking"
+    if _FORMATO_GUL.fullmatch(go_id):
+        return "gul"
+    return "formato_invalido"
+
+
+@app.get("/go/resolvedor/status")
+def status_resolvedor_go():
+    return {
+        **metricas_resolvedor_go,
+        "cache_negativo": cache_negativo_go.status(),
+        "limite_banco": limite_banco_go.status(),
+        "go_tracking_em_memoria": indice_go_tracking.status() if indice_go_tracking is not None else None,
+    }
+
+
+@app.on_event("shutdown")
+def encerrar_indice_go_tracking():
+    if indice_go_tracking is not None:
+        indice_go_tracking.encerrar()
+
+
+@app.get("/go/{go_id}")
+def resolver_go(go_id: str):
+    tipo = _classificar_go_id(go_id)
+    metricas_resolvedor_go[tipo] += 1
+
+    if tipo == "token":
+        return _redirecionar_token(go_id)
+    if tipo == "go_tracking":
+        return redirecionar(go_id)
+    if tipo == "gul":
+        return redirect_gul(go_id)
+    raise HTTPException(status_code=404, detail="Link inválido")
+
 # =========================================================
 # FASE 10 — REGISTRO AUTOMÁTICO DE DECISÕES
 # =========================================================
@@ -1919,7 +2696,7 @@ async def listar_decisoes():
             .order("id", desc=True) \
             .limit(200) \
             .execute()
-        return res.data
+        return RespostaJSONRapida(res.data)
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
 
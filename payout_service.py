@@ -1,7 +1,10 @@
 # payout_service.py
+import os
+import csv
+import time
 from supabase import Client
 from decimal import Decimal
-from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List
 
 
 def criar_payout(
@@ -34,30 +37,65 @@ def marcar_payout_como_pago(
     payout_id: str,
     provider_reference: str
 ):
-    payout = (
-        supabase
-        .table("payouts")
-        .select("*")
-        .eq("id", payout_id)
-        .single()
-        .execute()
-        .data
+    return liquidar_payouts(
+        supabase,
+        [{"payout_id": payout_id, "provider_reference": provider_reference}]
     )
 
-    # Atualiza payout
-    supabase.table("payouts").update({
-        "payout_status": "paid",
-        "provider_reference": provider_reference,
-        "processed_at": datetime.utcnow().isoformat()
-    }).eq("id", payout_id).execute()
-
-    # Atualiza saldo
-    supabase.table("partner_balances").update({
-        "available_balance": supabase.rpc(
-            "subtract_balance", {"value": payout["amount"]}
-        ),
-        "paid_balance": supabase.rpc(
-            "add_paid_balance", {"value": payout["amount"]}
-        ),
-        "updated_at": datetime.utcnow().isoformat()
-    }).eq("id", payout["balance_id"]).execute()
+
+# ==========================================================
+# LIQUIDAÇÃO EM MASSA (sql/003_payouts_liquidacao.sql)
+# ==========================================================
+
+LIQUIDACAO_LOTE = int(os.getenv("LIQUIDACAO_LOTE", "1000"))
+
+
+def ler_csv_liquidacao(caminho: str) -> Iterator[Dict[str, str]]:
+    """
+    CSV com colunas payout_id, provider_reference (cabeçalho opcional).
+    """
+    with open(caminho, newline="", encoding="utf-8") as f:
+        for linha in csv.reader(f):
+            if not linha or linha[0].strip() in ("", "payout_id"):
+                continue
+            yield {
+                "payout_id": linha[0].strip(),
+                "provider_reference": linha[1].strip() if len(linha) > 1 else ""
+            }
+
+
+def liquidar_payouts(
+    supabase: Client,
+    itens: Iterable[Dict[str, str]],
+    *,
+    tamanho_lote: int = LIQUIDACAO_LOTE
+) -> Dict[str, Any]:
+    """
+    Marca os payouts como pagos e lança o pagamento no ledger
+    (available/reserved → paid, sql/007_ledger_parceiros.sql).
+    Uma chamada RPC transacional por lote; payout já pago é ignorado,
+    então reenviar um lote (ou o arquivo inteiro) é seguro.
+    """
+    resumo = {"recebidos": 0, "pagos": 0, "ignorados": 0, "saldos_atualizados": 0, "lotes": 0}
+    inicio = time.perf_counter()
+
+    lote: List[Dict[str, str]] = []
+    for item in itens:
+        lote.append(item)
+        if len(lote) >= tamanho_lote:
+            _liquidar_lote(supabase, lote, resumo)
+            lote = []
+    if lote:
+        _liquidar_lote(supabase, lote, resumo)
+
+    segundos = time.perf_counter() - inicio
+    resumo["segundos"] = round(segundos, 3)
+    resumo["payouts_por_segundo"] = round(resumo["recebidos"] / segundos, 1) if segundos else 0.0
+    return resumo
+
+
+def _liquidar_lote(supabase: Client, lote: List[Dict[str, str]], resumo: Dict[str, Any]):
+    resultado = supabase.rpc("liquidar_payouts", {"p_itens": lote}).execute().data
+    for campo in ("recebidos", "pagos", "ignorados", "saldos_atualizados"):
+        resumo[campo] += resultado[campo]
+    resumo["lotes"] += 1
@@ -0,0 +1,121 @@
+# pipeline_financeiro.py — Pipeline Financeiro Real (fonte da verdade)
+# ROBO GLOBAL AI
+#
+# Venda → comissão → crédito do parceiro, com idempotência.
+# Compartilhado pelo main.py (webhooks / fila) e pelo replay_webhooks.py,
+# sem depender da aplicação FastAPI.
+
+from datetime import datetime, timezone
+from typing import Dict, Any, Optional
+
+from supabase import Client
+
+from sales_service import registrar_venda, registrar_venda_em_lote
+from commission_service import calcular_comissao
+from balance_service import incrementar_saldo_parceiro
+from idempotency_service import DedupeVendas, chave_venda
+from taxas_comissao import PERCENTUAL_PARCEIRO_PADRAO, TabelaTaxas
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[FINANCEIRO] [{nivel}] {mensagem}")
+
+
+class PipelineFinanceiro:
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        dedupe: Optional[DedupeVendas] = None,
+        escritor=None,
+        agregador=None,
+        taxas: Optional[TabelaTaxas] = None
+    ):
+        self.supabase = supabase
+        self.dedupe = dedupe if dedupe is not None else DedupeVendas()
+        self.escritor = escritor
+        self.agregador = agregador
+        self.taxas = taxas
+
+    def processar_venda(
+        self,
+        *,
+        platform: str,
+        external_sale_id: str,
+        product_id: str,
+        gross_value: float,
+        commission_total: float,
+        partner_id: Optional[str],
+        payload: Dict[str, Any],
+        occurred_at: Optional[datetime] = None
+    ) -> bool:
+        """
+        Retorna False quando a venda é duplicata (nada novo foi gravado; um crédito
+        que tenha ficado faltando na entrega anterior é completado).
+        """
+        if not self.dedupe.reservar(platform, external_sale_id):
+            log("INFO", f"Venda duplicada ignorada (memória): {platform} | {external_sale_id}")
+            return False
+
+        if self.taxas is not None:
+            percentual_parceiro = self.taxas.percentual(platform, product_id, partner_id)
+        else:
+            percentual_parceiro = PERCENTUAL_PARCEIRO_PADRAO
+
+        comissao = calcular_comissao(
+            commission_total=commission_total,
+            percentual_parceiro=percentual_parceiro
+        )
+
+        venda = dict(
+            platform=platform,
+            external_sale_id=external_sale_id,
+            product_id=product_id,
+            partner_id=partner_id,
+            gross_value=gross_value,
+            commission_value=commission_total,
+            partner_commission=comissao["partner_commission"],
+            master_commission=comissao["master_commission"],
+            sale_status="approved",
+            occurred_at=occurred_at or datetime.now(timezone.utc),
+            payload=payload
+        )
+
+        referencia = chave_venda(platform, external_sale_id)
+
+        # Reserva liberada em qualquer falha, inclusive no crédito depois da venda
+        # gravada: a nova entrega reconcilia o crédito pela referência
+        try:
+            if self.escritor is not None:
+                gravada = registrar_venda_em_lote(self.escritor, **venda).result() is not None
+            else:
+                gravada = bool(registrar_venda(self.supabase, **venda).data)
+
+            if not gravada:
+                # Venda já existia: a entrega anterior pode ter caído entre a venda e o
+                # crédito (ou perdido a resposta do upsert). O ledger ignora a referência
+                # repetida, então creditar de novo só completa o que faltou.
+                log("INFO", f"Venda duplicada ignorada (banco): {platform} | {external_sale_id}")
+                self._creditar(partner_id, comissao["partner_commission"], referencia)
+                return False
+
+            self._creditar(partner_id, comissao["partner_commission"], referencia)
+        except Exception:
+            self.dedupe.liberar(platform, external_sale_id)
+            raise
+
+        return True
+
+    def _creditar(self, partner_id: Optional[str], valor, referencia: str):
+        if not partner_id:
+            return
+        if self.agregador is not None:
+            self.agregador.adicionar(partner_id, valor, referencia=referencia)
+        else:
+            incrementar_saldo_parceiro(
+                self.supabase,
+                partner_id=partner_id,
+                valor=valor,
+                referencia=referencia
+            )
@@ -0,0 +1,304 @@
+# recalculo_comissoes.py — Recálculo Retroativo de Comissões
+# ROBO GLOBAL AI
+#
+# Quando o split parceiro/master muda para vendas já gravadas:
+# 1. sales lida em páginas por id (keyset), com a próxima página buscada
+#    em paralelo ao processamento da atual
+# 2. split recalculado em Decimal para a página inteira (centavos, ROUND_HALF_UP),
+#    com a taxa de cada venda resolvida em commission_rates (TabelaTaxas, mesma
+#    regra do pipeline) — ou um --percentual único, se informado explicitamente
+# 3. comparado com o split gravado — só as vendas que mudaram seguem
+# 4. por página, UMA chamada recalcular_comissoes (sql/005_recalculo_comissoes.sql):
+#    grava as vendas alteradas e lança a diferença de cada parceiro no ledger
+#    (tipo "ajuste", sql/007_ledger_parceiros.sql)
+#
+# Retomável: o checkpoint guarda o último id concluído. A RPC só altera
+# vendas que ainda têm o split lido, então repetir uma página é seguro.
+#
+# As taxas são lidas uma vez no início: a execução inteira (e a retomada
+# pelo checkpoint, no mesmo processo) usa um único retrato de commission_rates.
+#
+# USO:
+#   python recalculo_comissoes.py --dry-run
+#   python recalculo_comissoes.py --checkpoint recalculo.ckpt
+#   python recalculo_comissoes.py --percentual 0.65 --plataforma HOTMART --pagina 5000
+
+import os
+import sys
+import time
+import queue
+import argparse
+import threading
+from decimal import Decimal, ROUND_HALF_UP, localcontext
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from supabase import Client
+
+import codec_json
+from taxas_comissao import TabelaTaxas
+
+RECALCULO_PAGINA = int(os.getenv("RECALCULO_PAGINA", "5000"))
+
+CENTAVO = Decimal("0.01")
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[RECALCULO] [{nivel}] {mensagem}", flush=True)
+
+
+def _centavos(valor: Any) -> Optional[Decimal]:
+    if valor is None:
+        return None
+    return Decimal(str(valor)).quantize(CENTAVO, ROUND_HALF_UP)
+
+
+def recalcular_pagina(
+    linhas: List[Dict[str, Any]],
+    percentual: Callable[[Dict[str, Any]], Decimal]
+) -> List[Dict[str, Any]]:
+    """
+    Split novo de cada venda da página (percentual(linha) → fração do parceiro);
+    retorna apenas as que mudaram, no formato de entrada da RPC (valores em
+    texto, sem passar por float).
+    """
+    alteradas = []
+    with localcontext() as ctx:
+        ctx.prec = 28
+        for linha in linhas:
+            total = Decimal(str(linha.get("commission_value") or 0))
+            parceiro = (total * percentual(linha)).quantize(CENTAVO, ROUND_HALF_UP)
+            master = (total - parceiro).quantize(CENTAVO, ROUND_HALF_UP)
+
+            anterior_parceiro = linha.get("partner_commission")
+            anterior_master = linha.get("master_commission")
+            if _centavos(anterior_parceiro) == parceiro and _centavos(anterior_master) == master:
+                continue
+
+            alteradas.append({
+                "id": linha["id"],
+                "partner_id": linha.get("partner_id"),
+                "partner_commission": str(parceiro),
+                "master_commission": str(master),
+                "partner_commission_anterior": None if anterior_parceiro is None else str(anterior_parceiro),
+                "master_commission_anterior": None if anterior_master is None else str(anterior_master),
+            })
+    return alteradas
+
+
+# ======================================================
+# CHECKPOINT
+# ======================================================
+
+class CheckpointRecalculo:
+    """Último id concluído + resumo acumulado, gravados a cada página."""
+
+    def __init__(self, caminho: Optional[str], parametros: Dict[str, Any]):
+        self.caminho = caminho
+        self.parametros = parametros
+        self.cursor: Any = None
+        self.resumo: Dict[str, Any] = {}
+
+        if caminho and os.path.exists(caminho):
+            with open(caminho, "rb") as f:
+                dados = codec_json.loads(f.read())
+            if dados.get("parametros") != parametros:
+                raise SystemExit(
+                    f"Checkpoint {caminho} pertence a outro recálculo: {dados.get('parametros')}"
+                )
+            self.cursor = dados.get("cursor")
+            self.resumo = dados.get("resumo") or {}
+
+    def gravar(self, cursor: Any, resumo: Dict[str, Any]):
+        self.cursor = cursor
+        if not self.caminho:
+            return
+        tmp = self.caminho + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(codec_json.dumps({"parametros": self.parametros, "cursor": cursor, "resumo": resumo}))
+        os.replace(tmp, self.caminho)
+
+
+# ======================================================
+# RECÁLCULO
+# ======================================================
+
+class RecalculoComissoes:
+
+    CONTADORES = ("paginas", "lidas", "alteradas", "atualizadas", "ignoradas", "saldos_ajustados")
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        percentual: Optional[Decimal] = None,
+        taxas: Optional[TabelaTaxas] = None,
+        plataforma: Optional[str] = None,
+        tamanho_pagina: int = RECALCULO_PAGINA,
+        checkpoint: Optional[str] = None,
+        dry_run: bool = False
+    ):
+        """
+        percentual=None → taxa de cada venda pela commission_rates (overrides por
+        parceiro/produto preservados). percentual informado → mesma fração para
+        todas as vendas do filtro (substitui as taxas específicas).
+        """
+        self.supabase = supabase
+        self.percentual = None if percentual is None else Decimal(str(percentual))
+        self.taxas = None
+        if self.percentual is None:
+            # ttl infinito: um retrato só das taxas durante a execução
+            self.taxas = taxas if taxas is not None else TabelaTaxas(supabase, ttl_s=float("inf"))
+            if self.taxas.carregado_em is None:
+                # Sem a tabela, toda venda cairia na taxa padrão e os overrides seriam apagados
+                raise RuntimeError("commission_rates não carregada; recálculo abortado")
+        self.plataforma = plataforma
+        self.tamanho_pagina = max(1, tamanho_pagina)
+        self.dry_run = dry_run
+        self.checkpoint = CheckpointRecalculo(
+            checkpoint,
+            {
+                "percentual": "commission_rates" if self.percentual is None else str(self.percentual),
+                "plataforma": plataforma,
+                "dry_run": dry_run
+            }
+        )
+
+    def percentual_da_venda(self, linha: Dict[str, Any]) -> Decimal:
+        if self.percentual is not None:
+            return self.percentual
+        return Decimal(str(self.taxas.percentual(linha.get("platform"), linha.get("product_id"), linha.get("partner_id"))))
+
+    def recalcular(self, linhas: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        return recalcular_pagina(linhas, self.percentual_da_venda)
+
+    def paginas(self, ultimo_id: Any) -> Iterator[List[Dict[str, Any]]]:
+        while True:
+            query = (
+                self.supabase
+                .table("sales")
+                .select("id,platform,product_id,partner_id,commission_value,partner_commission,master_commission")
+                .order("id")
+                .limit(self.tamanho_pagina)
+            )
+            if self.plataforma:
+                query = query.eq("platform", self.plataforma)
+            if ultimo_id is not None:
+                query = query.gt("id", ultimo_id)
+
+            linhas = query.execute().data or []
+            if not linhas:
+                return
+            yield linhas
+            ultimo_id = linhas[-1]["id"]
+
+    def _paginas_antecipadas(self, ultimo_id: Any) -> Iterator[List[Dict[str, Any]]]:
+        """Leitura da página seguinte sobreposta ao cálculo/gravação da atual."""
+        fila: "queue.Queue" = queue.Queue(maxsize=2)
+        fim = object()
+
+        def leitor():
+            try:
+                for pagina in self.paginas(ultimo_id):
+                    fila.put(pagina)
+            except Exception as e:
+                fila.put(e)
+            fila.put(fim)
+
+        threading.Thread(target=leitor, name="recalculo-leitor", daemon=True).start()
+        while True:
+            item = fila.get()
+            if item is fim:
+                return
+            if isinstance(item, Exception):
+                raise item
+            yield item
+
+    def _aplicar(self, alteradas: List[Dict[str, Any]]) -> Dict[str, Any]:
+        if self.dry_run:
+            ajuste = sum(
+                (
+                    Decimal(a["partner_commission"]) - Decimal(a["partner_commission_anterior"] or "0")
+                    for a in alteradas if a["partner_id"]
+                ),
+                Decimal("0")
+            )
+            return {"atualizadas": 0, "ignoradas": 0, "saldos_ajustados": 0, "ajuste_total": ajuste}
+
+        itens = [{k: v for k, v in a.items() if k != "partner_id"} for a in alteradas]
+        return (
+            self.supabase
+            .rpc("recalcular_comissoes", {"p_itens": itens})
+            .execute()
+            .data
+        )
+
+    def executar(self) -> Dict[str, Any]:
+        resumo: Dict[str, Any] = {c: 0 for c in self.CONTADORES}
+        resumo.update({c: v for c, v in self.checkpoint.resumo.items() if c in self.CONTADORES})
+        ajuste_total = Decimal(str(self.checkpoint.resumo.get("ajuste_total", "0")))
+
+        if self.checkpoint.cursor is not None:
+            log("INFO", f"Retomando após id {self.checkpoint.cursor} ({resumo['lidas']} vendas já lidas)")
+
+        inicio = time.perf_counter()
+        lidas_nesta_execucao = 0
+
+        for pagina in self._paginas_antecipadas(self.checkpoint.cursor):
+            alteradas = self.recalcular(pagina)
+            resultado = self._aplicar(alteradas) if alteradas else {}
+
+            resumo["paginas"] += 1
+            resumo["lidas"] += len(pagina)
+            resumo["alteradas"] += len(alteradas)
+            resumo["atualizadas"] += resultado.get("atualizadas", 0)
+            resumo["ignoradas"] += resultado.get("ignoradas", 0)
+            resumo["saldos_ajustados"] += resultado.get("saldos_ajustados", 0)
+            ajuste_total += Decimal(str(resultado.get("ajuste_total", 0)))
+            lidas_nesta_execucao += len(pagina)
+
+            self.checkpoint.gravar(pagina[-1]["id"], {**resumo, "ajuste_total": str(ajuste_total)})
+
+            if resumo["paginas"] % 20 == 0:
+                decorrido = time.perf_counter() - inicio
+                log("INFO", f"{resumo['lidas']} lidas | {resumo['alteradas']} alteradas | "
+                            f"{lidas_nesta_execucao / decorrido:.0f} vendas/s")
+
+        segundos = time.perf_counter() - inicio
+        resumo["dry_run"] = self.dry_run
+        resumo["percentual"] = "commission_rates" if self.percentual is None else float(self.percentual)
+        resumo["ajuste_total"] = float(ajuste_total)
+        resumo["segundos"] = round(segundos, 3)
+        resumo["vendas_por_segundo"] = round(lidas_nesta_execucao / segundos, 1) if segundos else 0.0
+        return resumo
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Recálculo retroativo do split de comissões")
+    parser.add_argument(
+        "--percentual",
+        help="Fração do parceiro para TODAS as vendas (ex: 0.6), ignorando commission_rates. "
+             "Sem ela, cada venda usa a taxa resolvida em commission_rates"
+    )
+    parser.add_argument("--plataforma", help="Restringe a uma plataforma (HOTMART, EDUZZ, ...)")
+    parser.add_argument("--pagina", type=int, default=RECALCULO_PAGINA)
+    parser.add_argument("--checkpoint", help="Arquivo de retomada (último id concluído)")
+    parser.add_argument("--dry-run", action="store_true", help="Somente conta diferenças; nada é gravado")
+    args = parser.parse_args(argv)
+
+    from supabase_client import get_supabase
+
+    resumo = RecalculoComissoes(
+        get_supabase(),
+        percentual=Decimal(args.percentual) if args.percentual else None,
+        plataforma=args.plataforma,
+        tamanho_pagina=args.pagina,
+        checkpoint=args.checkpoint,
+        dry_run=args.dry_run
+    ).executar()
+
+    log("INFO", " | ".join(f"{k}={v}" for k, v in resumo.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
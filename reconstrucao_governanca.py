@@ -0,0 +1,238 @@
+# reconstrucao_governanca.py — Reconstrução do Estado de Governança por Eventos
+# ROBO GLOBAL AI
+#
+# O caixa lógico e o risco (ESTADO_GLOBAL) são uma dobra sobre
+# eventos_financeiros. No boot:
+# 1. carrega o snapshot mais recente (governanca_snapshots) e sua marca d'água
+# 2. lê os eventos com seq > marca em páginas (keyset) e reaplica a dobra
+# 3. devolve o resultado (gravado no ESTADO_GLOBAL pelo chamador) e o tempo gasto
+#
+# Uma cópia "sombra" da dobra continua avançando a cada
+# GOVERNANCA_SNAPSHOT_S e vira um snapshot novo: o próximo boot só
+# reaplica a cauda. A sombra para antes de eventos com menos de
+# GOVERNANCA_MARGEM_S (seq de transações ainda abertas pode chegar atrasado).
+
+import os
+import time
+import threading
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from supabase import Client
+
+GOVERNANCA_PAGINA = int(os.getenv("GOVERNANCA_PAGINA", "5000"))
+GOVERNANCA_SNAPSHOT_S = float(os.getenv("GOVERNANCA_SNAPSHOT_S", "300"))
+GOVERNANCA_MARGEM_S = float(os.getenv("GOVERNANCA_MARGEM_S", "5"))
+
+# dobrar(estado, linha de eventos_financeiros) → altera estado
+Dobra = Callable[[Dict[str, Any], Dict[str, Any]], None]
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[GOVERNANCA] [{nivel}] {mensagem}", flush=True)
+
+
+class ReconstrucaoGovernanca:
+
+    def __init__(
+        self,
+        supabase: Client,
+        dobrar: Dobra,
+        campos: Sequence[str],
+        *,
+        tabela: str = "eventos_financeiros",
+        tamanho_pagina: int = GOVERNANCA_PAGINA,
+        intervalo_snapshot_s: float = GOVERNANCA_SNAPSHOT_S,
+        margem_s: float = GOVERNANCA_MARGEM_S
+    ):
+        self.supabase = supabase
+        self.dobrar = dobrar
+        self.campos = list(campos)
+        self.tabela = tabela
+        self.tamanho_pagina = max(1, tamanho_pagina)
+        self.intervalo_snapshot_s = intervalo_snapshot_s
+        self.margem_s = margem_s
+
+        # Dobra sombra: estado puro até self._marca (fonte dos snapshots)
+        self._sombra: Dict[str, Any] = {}
+        self._marca = 0
+        self._marca_gravada = 0
+        self._eventos = 0
+        self._lock = threading.Lock()
+        self._parar = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.relatorio: Dict[str, Any] = {}
+        self.snapshots_gravados = 0
+        self.falhas = 0
+        self.descartados = 0
+
+    # --------------------------------------------------
+    # LEITURA
+    # --------------------------------------------------
+
+    def _ultimo_snapshot(self) -> Optional[Dict[str, Any]]:
+        linhas = (
+            self.supabase
+            .table("governanca_snapshots")
+            .select("ultimo_seq,eventos,estado")
+            .order("id", desc=True)
+            .limit(1)
+            .execute()
+            .data
+        )
+        return linhas[0] if linhas else None
+
+    def _paginas(self, apos_seq: int) -> Iterator[List[Dict[str, Any]]]:
+        while True:
+            linhas = (
+                self.supabase
+                .table(self.tabela)
+                .select("*")
+                .gt("seq", apos_seq)
+                .order("seq")
+                .limit(self.tamanho_pagina)
+                .execute()
+                .data
+            ) or []
+            if not linhas:
+                return
+            yield linhas
+            apos_seq = linhas[-1]["seq"]
+
+    def _dobrar_cauda(
+        self,
+        estado: Dict[str, Any],
+        apos_seq: int,
+        corte: Optional[str] = None
+    ) -> Tuple[int, int]:
+        """
+        Aplica os eventos com seq > apos_seq. Com corte (ISO), para no primeiro
+        evento registrado depois dele. Retorna (nova marca, eventos aplicados).
+        Linha que a dobra recusa (ex: campo inválido) é pulada e contada em
+        descartados — uma linha ruim não derruba a reconstrução.
+        """
+        marca, aplicados = apos_seq, 0
+        for pagina in self._paginas(apos_seq):
+            for linha in pagina:
+                if corte is not None and str(linha.get("registrado_em") or "") >= corte:
+                    return marca, aplicados
+                try:
+                    self.dobrar(estado, linha)
+                    aplicados += 1
+                except Exception as e:
+                    self.descartados += 1
+                    log("WARN", f"Evento seq {linha.get('seq')} descartado da dobra: {e}")
+                marca = linha["seq"]
+        return marca, aplicados
+
+    def _corte(self) -> str:
+        return (datetime.now(timezone.utc) - timedelta(seconds=self.margem_s)).isoformat()
+
+    # --------------------------------------------------
+    # BOOT
+    # --------------------------------------------------
+
+    def reconstruir(self, estado: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Sobrescreve os campos dobrados de `estado` (ex: uma cópia de
+        ESTADO_GLOBAL, gravada depois numa transação curta) com snapshot +
+        cauda. Retorna o relatório.
+        """
+        inicio = time.perf_counter()
+        descartados = self.descartados
+
+        snapshot = self._ultimo_snapshot()
+        base = {c: estado[c] for c in self.campos}
+        marca, eventos_snapshot = 0, 0
+        if snapshot:
+            base.update({c: v for c, v in snapshot["estado"].items() if c in base})
+            marca, eventos_snapshot = snapshot["ultimo_seq"], snapshot["eventos"]
+        else:
+            base.update({c: 0.0 for c in self.campos if isinstance(base[c], (int, float))})
+
+        # Sombra: só eventos fora da margem (base dos próximos snapshots)
+        sombra = dict(base)
+        marca_sombra, na_sombra = self._dobrar_cauda(sombra, marca, self._corte())
+
+        # Estado vivo: sombra + eventos recentes
+        vivo = dict(sombra)
+        marca_viva, recentes = self._dobrar_cauda(vivo, marca_sombra)
+
+        with self._lock:
+            self._sombra, self._marca, self._eventos = sombra, marca_sombra, eventos_snapshot + na_sombra
+            self._marca_gravada = marca
+
+        for c in self.campos:
+            estado[c] = vivo[c]
+
+        segundos = time.perf_counter() - inicio
+        self.relatorio = {
+            "snapshot": bool(snapshot),
+            "marca_snapshot": marca,
+            "eventos_reaplicados": na_sombra + recentes,
+            "eventos_no_estado": eventos_snapshot + na_sombra + recentes,
+            "ultimo_seq": marca_viva,
+            "eventos_descartados": self.descartados - descartados,
+            "segundos": round(segundos, 3),
+            "eventos_por_segundo": round((na_sombra + recentes) / segundos, 1) if segundos else 0.0,
+        }
+        log("INFO", f"Estado reconstruído em {segundos:.2f}s | {na_sombra + recentes} eventos reaplicados "
+                    f"após seq {marca} | snapshot={'sim' if snapshot else 'não'}")
+        return self.relatorio
+
+    # --------------------------------------------------
+    # SNAPSHOTS PERIÓDICOS
+    # --------------------------------------------------
+
+    def gravar_snapshot(self) -> bool:
+        """Avança a sombra até a margem e grava um snapshot se ela passou do último gravado."""
+        with self._lock:
+            sombra = dict(self._sombra)
+            marca, aplicados = self._dobrar_cauda(sombra, self._marca, self._corte())
+            if marca <= self._marca_gravada:
+                return False
+
+            self.supabase.table("governanca_snapshots").insert({
+                "ultimo_seq": marca,
+                "eventos": self._eventos + aplicados,
+                "estado": {c: sombra[c] for c in self.campos},
+            }).execute()
+
+            self._sombra, self._marca, self._eventos = sombra, marca, self._eventos + aplicados
+            self._marca_gravada = marca
+            self.snapshots_gravados += 1
+            return True
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo_snapshot_s):
+            try:
+                self.gravar_snapshot()
+            except Exception as e:
+                self.falhas += 1
+                log("WARN", f"Falha ao gravar snapshot de governança: {e}")
+
+    def iniciar_snapshots(self):
+        self._thread = threading.Thread(target=self._loop, name="snapshot-governanca", daemon=True)
+        self._thread.start()
+
+    def encerrar(self):
+        """Para a thread e grava o último snapshot (boot seguinte mais curto)."""
+        self._parar.set()
+        if self._thread is not None:
+            self._thread.join(timeout=5)
+        try:
+            self.gravar_snapshot()
+        except Exception as e:
+            log("WARN", f"Falha ao gravar snapshot final de governança: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "reconstrucao": self.relatorio,
+            "marca_snapshot": self._marca,
+            "eventos_no_snapshot": self._eventos,
+            "snapshots_gravados": self.snapshots_gravados,
+            "intervalo_snapshot_s": self.intervalo_snapshot_s,
+            "falhas": self.falhas,
+            "descartados": self.descartados,
+        }
@@ -0,0 +1,422 @@
+# replay_webhooks.py — Replay em Massa de Webhooks (sem re-POST)
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# Reprocessar entregas perdidas (Supabase ou deploy fora do ar) direto pelo
+# mesmo extrator + PipelineFinanceiro usados pelos webhooks, com pool de
+# workers, idempotência e checkpoint para retomar de onde parou.
+#
+# ENTRADAS (--arquivo, NDJSON — uma entrega por linha):
+#   {"plataforma": "HOTMART", "corpo": "<json bruto>"}   → journal/dead-letter da fila
+#   {"platform": "HOTMART", "event_payload": {...}}      → export da tabela sales
+#   {...payload bruto...}                                 → exige --plataforma
+#
+# ENTRADA (--tabela): leitura paginada por id (keyset) de uma tabela com
+# colunas platform + event_payload (ex.: export/backup de sales).
+#
+# occurred_at da venda: instante da compra no payload da plataforma
+# (extratores.instante_evento); na falta, o occurred_at do export ou o
+# recebido_em do journal; só então a hora do replay.
+#
+# Somente o financeiro real é reprocessado; a camada soberana (governança)
+# não é reexecutada para eventos antigos.
+#
+# USO:
+#   python replay_webhooks.py --arquivo fila_webhooks/webhooks.0.dlq --workers 32 --lote
+#   python replay_webhooks.py --tabela sales_backup --checkpoint replay.ckpt --aquecer
+
+import os
+import sys
+import time
+import argparse
+import threading
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterator, Optional, Tuple
+
+import codec_json
+from extratores import converter_instante, extrair_evento, instante_evento, EXTRATORES
+from fila_webhooks import MarcaDagua
+
+REPLAY_PAGINA = int(os.getenv("REPLAY_PAGINA", "1000"))
+REPLAY_TENTATIVAS = int(os.getenv("REPLAY_TENTATIVAS", "3"))
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[REPLAY] [{nivel}] {mensagem}", flush=True)
+
+
+# ======================================================
+# LEITURA DAS ENTRADAS
+# Cada fonte produz (seq, cursor, plataforma, payload, instante)
+# seq → contíguo a partir de 1 (marca d'água)
+# cursor → posição a gravar no checkpoint para retomar
+# instante → hora registrada pela fonte (journal / export), se houver
+# ======================================================
+
+Entrada = Tuple[int, Any, Optional[str], Any, Optional[datetime]]
+
+
+def _decodificar(linha: Dict[str, Any], plataforma_padrao: Optional[str]) -> Tuple[str, Any, Optional[datetime]]:
+    if "corpo" in linha and "plataforma" in linha:
+        corpo = linha["corpo"]
+        return (
+            linha["plataforma"],
+            codec_json.loads(corpo) if isinstance(corpo, str) else corpo,
+            converter_instante(linha.get("recebido_em"))
+        )
+
+    if "event_payload" in linha and "platform" in linha:
+        payload = linha["event_payload"]
+        return (
+            linha["platform"],
+            codec_json.loads(payload) if isinstance(payload, str) else payload,
+            converter_instante(linha.get("occurred_at"))
+        )
+
+    if not plataforma_padrao:
+        raise ValueError("linha sem plataforma (use --plataforma para payloads brutos)")
+    return plataforma_padrao, linha, None
+
+
+def ler_arquivo(
+    caminho: str,
+    plataforma: Optional[str],
+    inicio: int
+) -> Iterator[Entrada]:
+    """cursor = número da linha; as `inicio` primeiras já foram concluídas."""
+    with open(caminho, "rb") as f:
+        for numero, linha in enumerate(f, start=1):
+            if numero <= inicio:
+                continue
+            if not linha.strip():
+                yield numero, numero, None, None, None
+                continue
+            try:
+                plat, payload, instante = _decodificar(codec_json.loads(linha), plataforma)
+            except ValueError as e:
+                yield numero, numero, None, e, None
+                continue
+            yield numero, numero, plat, payload, instante
+
+
+def ler_tabela(
+    supabase,
+    tabela: str,
+    plataforma: Optional[str],
+    ultimo_id: Any
+) -> Iterator[Entrada]:
+    """cursor = id da linha; retoma com id > ultimo_id."""
+    seq = 0
+    while True:
+        # "*": occurred_at quando a tabela tem (export de sales), sem exigir a coluna
+        query = (
+            supabase
+            .table(tabela)
+            .select("*")
+            .order("id")
+            .limit(REPLAY_PAGINA)
+        )
+        if plataforma:
+            query = query.eq("platform", plataforma)
+        if ultimo_id is not None:
+            query = query.gt("id", ultimo_id)
+
+        linhas = query.execute().data or []
+        if not linhas:
+            return
+
+        for linha in linhas:
+            seq += 1
+            try:
+                plat, payload, instante = _decodificar(linha, plataforma)
+            except ValueError as e:
+                yield seq, linha["id"], None, e, None
+                continue
+            yield seq, linha["id"], plat, payload, instante
+
+        ultimo_id = linhas[-1]["id"]
+
+
+# ======================================================
+# CHECKPOINT
+# ======================================================
+
+class Checkpoint:
+    """
+    Grava o cursor da marca d'água (tudo até ele concluído).
+    Workers terminam fora de ordem; o cursor só avança de forma contígua.
+    """
+
+    def __init__(self, caminho: Optional[str], origem: str):
+        self.caminho = caminho
+        self.origem = origem
+        self.cursor: Any = None
+        self._marca = MarcaDagua(0)
+        self._cursores: Dict[int, Any] = {}
+        self._lock = threading.Lock()
+        self._gravado_em = 0.0
+
+        if caminho and os.path.exists(caminho):
+            with open(caminho, "rb") as f:
+                dados = codec_json.loads(f.read())
+            if dados.get("origem") != origem:
+                raise SystemExit(
+                    f"Checkpoint {caminho} pertence a outra origem: {dados.get('origem')}"
+                )
+            self.cursor = dados.get("cursor")
+
+    def posicionar(self, seq: int):
+        """Sequências <= seq já estão concluídas (retomada de arquivo)."""
+        self._marca = MarcaDagua(seq)
+
+    def concluir(self, seq: int, cursor: Any):
+        with self._lock:
+            self._cursores[seq] = cursor
+            inicio = self._marca.valor
+            if not self._marca.concluir(seq):
+                return
+            for s in range(inicio + 1, self._marca.valor + 1):
+                self.cursor = self._cursores.pop(s)
+
+            agora = time.monotonic()
+            if agora - self._gravado_em >= 1.0:
+                self._gravar()
+                self._gravado_em = agora
+
+    def _gravar(self):
+        if not self.caminho:
+            return
+        tmp = self.caminho + ".tmp"
+        with open(tmp, "wb") as f:
+            f.write(codec_json.dumps({"origem": self.origem, "cursor": self.cursor}))
+        os.replace(tmp, self.caminho)
+
+    def finalizar(self):
+        with self._lock:
+            self._gravar()
+
+
+# ======================================================
+# REPLAY
+# ======================================================
+
+class Replay:
+
+    def __init__(
+        self,
+        pipeline,
+        *,
+        workers: int,
+        checkpoint: Checkpoint,
+        rejeitados: Optional[str] = None,
+        dry_run: bool = False,
+        tentativas: int = REPLAY_TENTATIVAS
+    ):
+        self.pipeline = pipeline
+        self.workers = max(1, workers)
+        self.checkpoint = checkpoint
+        self.dry_run = dry_run
+        self.tentativas = max(1, tentativas)
+
+        self._rejeitados = open(rejeitados, "a", encoding="utf-8") if rejeitados else None
+        self._lock = threading.Lock()
+        # Limita o que está em voo: leitura nunca dispara à frente do pool
+        self._vagas = threading.BoundedSemaphore(self.workers * 4)
+
+        self.lidos = 0
+        self.gravados = 0
+        self.duplicados = 0
+        self.invalidos = 0
+        self.falhas = 0
+
+    def _contar(self, campo: str):
+        with self._lock:
+            setattr(self, campo, getattr(self, campo) + 1)
+
+    def _rejeitar(self, cursor: Any, plataforma: Optional[str], payload: Any, motivo: str):
+        if self._rejeitados is None:
+            return
+        linha = codec_json.dumps_str({
+            "cursor": cursor,
+            "plataforma": plataforma,
+            "corpo": payload if not isinstance(payload, Exception) else None,
+            "erro": motivo
+        })
+        with self._lock:
+            self._rejeitados.write(linha + "\n")
+
+    def _processar(self, cursor: Any, plataforma: Optional[str], payload: Any, instante: Optional[datetime] = None):
+        if payload is None:
+            return
+
+        if isinstance(payload, Exception) or plataforma not in EXTRATORES:
+            self._contar("invalidos")
+            self._rejeitar(cursor, plataforma, payload, str(payload) if isinstance(payload, Exception)
+                           else f"plataforma desconhecida: {plataforma}")
+            return
+
+        try:
+            venda, _ = extrair_evento(plataforma, payload)
+        except (KeyError, TypeError, ValueError) as e:
+            self._contar("invalidos")
+            self._rejeitar(cursor, plataforma, payload, f"extração: {e!r}")
+            return
+
+        if self.dry_run:
+            self._contar("gravados")
+            return
+
+        occurred_at = instante_evento(plataforma, payload) or instante
+
+        for tentativa in range(1, self.tentativas + 1):
+            try:
+                gravada = self.pipeline.processar_venda(**venda, payload=payload, occurred_at=occurred_at)
+                self._contar("gravados" if gravada else "duplicados")
+                return
+            except Exception as e:
+                if tentativa == self.tentativas:
+                    self._contar("falhas")
+                    self._rejeitar(cursor, plataforma, payload, str(e))
+                    log("WARN", f"{plataforma} | {venda.get('external_sale_id')} falhou: {e}")
+                    return
+                time.sleep(min(2 ** tentativa * 0.1, 5.0))
+
+    def _tarefa(self, seq: int, cursor: Any, plataforma: Optional[str], payload: Any, instante: Optional[datetime]):
+        try:
+            self._processar(cursor, plataforma, payload, instante)
+        finally:
+            self.checkpoint.concluir(seq, cursor)
+            self._vagas.release()
+
+    def executar(self, entradas: Iterator[Entrada], progresso_s: float = 5.0):
+        inicio = time.monotonic()
+        ultimo_relatorio = inicio
+
+        with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="replay") as pool:
+            for seq, cursor, plataforma, payload, instante in entradas:
+                self._vagas.acquire()
+                self.lidos += 1
+                pool.submit(self._tarefa, seq, cursor, plataforma, payload, instante)
+
+                agora = time.monotonic()
+                if agora - ultimo_relatorio >= progresso_s:
+                    self._relatorio(agora - inicio)
+                    ultimo_relatorio = agora
+
+        self.checkpoint.finalizar()
+        if self._rejeitados is not None:
+            self._rejeitados.close()
+
+        resumo = self._relatorio(time.monotonic() - inicio)
+        return resumo
+
+    def _relatorio(self, decorrido: float) -> Dict[str, Any]:
+        concluidos = self.gravados + self.duplicados + self.invalidos + self.falhas
+        resumo = {
+            "lidos": self.lidos,
+            "gravados": self.gravados,
+            "duplicados": self.duplicados,
+            "invalidos": self.invalidos,
+            "falhas": self.falhas,
+            "eventos_por_minuto": round(concluidos / decorrido * 60) if decorrido else 0,
+            "cursor": self.checkpoint.cursor,
+        }
+        log("INFO", " | ".join(f"{k}={v}" for k, v in resumo.items()))
+        return resumo
+
+
+# ======================================================
+# CLI
+# ======================================================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Replay em massa de webhooks pelo pipeline financeiro real")
+    origem = parser.add_mutually_exclusive_group(required=True)
+    origem.add_argument("--arquivo", help="NDJSON (journal/dead-letter da fila, export de sales ou payloads brutos)")
+    origem.add_argument("--tabela", help="Tabela com colunas id, platform, event_payload")
+    parser.add_argument("--plataforma", help="Plataforma dos payloads brutos / filtro da tabela")
+    parser.add_argument("--workers", type=int, default=16)
+    parser.add_argument("--checkpoint", help="Arquivo de checkpoint (retoma se existir)")
+    parser.add_argument("--rejeitados", help="NDJSON das entregas inválidas ou que esgotaram as tentativas")
+    parser.add_argument("--lote", action="store_true", help="Inserção de vendas via EscritorEmLote")
+    parser.add_argument("--janela-saldos-ms", type=int, default=0,
+                        help="Soma créditos por parceiro e descarrega a cada N ms (0 = um incremento por venda)")
+    parser.add_argument("--aquecer", action="store_true", help="Aquece o filtro de idempotência a partir de sales")
+    parser.add_argument("--dry-run", action="store_true", help="Somente lê e extrai; nada é gravado")
+    args = parser.parse_args(argv)
+
+    if args.plataforma:
+        args.plataforma = args.plataforma.upper()
+
+    descricao_origem = f"arquivo:{os.path.abspath(args.arquivo)}" if args.arquivo else f"tabela:{args.tabela}"
+    checkpoint = Checkpoint(args.checkpoint, descricao_origem)
+    if checkpoint.cursor is not None:
+        log("INFO", f"Retomando de {descricao_origem} após cursor {checkpoint.cursor}")
+
+    supabase = None
+    pipeline = None
+    escritor = None
+    agregador = None
+
+    if args.tabela or not args.dry_run:
+        from supabase_client import get_supabase
+        supabase = get_supabase()
+
+    if not args.dry_run:
+        from pipeline_financeiro import PipelineFinanceiro
+        from idempotency_service import DedupeVendas
+
+        dedupe = DedupeVendas()
+        if args.aquecer:
+            dedupe.carregar(supabase)
+
+        if args.lote:
+            from escritor_lote import EscritorEmLote
+            from sales_service import configurar_escritor_vendas
+            escritor = EscritorEmLote(supabase)
+            configurar_escritor_vendas(escritor)
+
+        if args.janela_saldos_ms:
+            from agregador_saldos import AgregadorSaldos
+            agregador = AgregadorSaldos(supabase, janela_ms=args.janela_saldos_ms)
+
+        from taxas_comissao import TabelaTaxas
+
+        pipeline = PipelineFinanceiro(
+            supabase,
+            dedupe=dedupe,
+            escritor=escritor,
+            agregador=agregador,
+            taxas=TabelaTaxas(supabase)
+        )
+
+    if args.arquivo:
+        # Linha = seq: MarcaDagua precisa de sequência contígua a partir do cursor
+        inicio = checkpoint.cursor or 0
+        checkpoint.posicionar(inicio)
+        entradas = ler_arquivo(args.arquivo, args.plataforma, inicio)
+    else:
+        entradas = ler_tabela(supabase, args.tabela, args.plataforma, checkpoint.cursor)
+
+    replay = Replay(
+        pipeline,
+        workers=args.workers,
+        checkpoint=checkpoint,
+        rejeitados=args.rejeitados,
+        dry_run=args.dry_run
+    )
+
+    try:
+        resumo = replay.executar(entradas)
+    finally:
+        if escritor is not None:
+            escritor.encerrar()
+        if agregador is not None:
+            agregador.encerrar()
+
+    return 1 if resumo["falhas"] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
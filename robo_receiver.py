@@ -10,15 +10,15 @@
 # - Sem ações externas
 
 import os
-import json
 import uuid
 from datetime import datetime, timezone
 from typing import Optional, Dict, Any, Literal
 
 from fastapi import FastAPI, Header, HTTPException
-from fastapi.responses import JSONResponse
 from pydantic import BaseModel, Field, validator
 
+from codec_json import RespostaJSONRapida, RotaJSON, dumps_str
+
 # 🔗 IMPORTAÇÃO DO MOTOR INTERNO
 from motor_interno import MotorInterno
 
@@ -37,9 +37,13 @@ ROBO_SEEN_PATH = os.getenv("ROBO_SEEN_EVENTS_PATH", "./robo_seen_events.log")
 app = FastAPI(
     title="Robô Global — Receptor de Eventos",
     version="1.1.0",
-    description="Receptor oficial de eventos provenientes da CEN."
+    description="Receptor oficial de eventos provenientes da CEN.",
+    default_response_class=RespostaJSONRapida
 )
 
+# Corpo parseado uma única vez, pelo codec rápido
+app.router.route_class = RotaJSON
+
 motor = MotorInterno()
 
 # ======================================================
@@ -84,7 +88,7 @@ def utc_now_iso() -> str:
 
 def write_log(path: str, entry: Dict[str, Any]) -> None:
     with open(path, "a", encoding="utf-8") as f:
-        f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        f.write(dumps_str(entry) + "\n")
 
 def has_seen_event(event_id: str) -> bool:
     try:
@@ -122,7 +126,7 @@ def receive_from_cen(
             "event_id": payload.event_id,
             "status": "duplicate_ignored"
         })
-        return JSONResponse(status_code=202, content={"accepted": True, "duplicate": True})
+        return RespostaJSONRapida(status_code=202, content={"accepted": True, "duplicate": True})
 
     # 📝 Registro bruto
     raw_event = {
@@ -146,4 +150,4 @@ def receive_from_cen(
     # (processamento interno, sem ação externa)
     motor.process(raw_event)
 
-    return JSONResponse(status_code=202, content={"accepted": True})
+    return RespostaJSONRapida(status_code=202, content={"accepted": True})
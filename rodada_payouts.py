@@ -0,0 +1,214 @@
+# rodada_payouts.py — Rodada de Payouts por Limite Mínimo
+# ROBO GLOBAL AI
+#
+# Fechamento do mês sem loop manual de criar_payout:
+# 0. cauda do ledger compactada (partner_balances com o saldo disponível atual)
+# 1. partner_balances lido em páginas por id (keyset) — memória limitada à página
+# 2. parceiros com available_balance >= mínimo selecionados
+# 3. por página, UMA chamada reservar_payouts (sql/004_payouts_reserva.sql):
+#    reserva o saldo e cria os payouts em massa, na mesma transação
+#
+# Rodadas concorrentes não pagam em dobro: o saldo reservado sai de
+# available_balance sob trava de linha e a outra rodada pula o parceiro.
+#
+# --dry-run não grava nada (nem a compactação): o saldo disponível de cada
+# parceiro é o snapshot de partner_balances + a soma da cauda do ledger.
+#
+# USO:
+#   python rodada_payouts.py --minimo 50 --provider pix --dry-run
+#   python rodada_payouts.py --minimo 50 --provider pix
+
+import os
+import sys
+import time
+import argparse
+from decimal import Decimal
+from typing import Any, Dict, Iterator, List
+
+from supabase import Client
+
+from ledger_service import compactar_tudo
+
+PAYOUTS_MINIMO = os.getenv("PAYOUTS_MINIMO", "50")
+PAYOUTS_PAGINA = int(os.getenv("PAYOUTS_PAGINA", "1000"))
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[PAYOUTS] [{nivel}] {mensagem}", flush=True)
+
+
+class RodadaPayouts:
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        minimo: Decimal,
+        provider: str,
+        tamanho_pagina: int = PAYOUTS_PAGINA,
+        dry_run: bool = False
+    ):
+        self.supabase = supabase
+        self.minimo = Decimal(str(minimo))
+        self.provider = provider
+        self.tamanho_pagina = max(1, tamanho_pagina)
+        self.dry_run = dry_run
+
+    def paginas(self) -> Iterator[List[Dict[str, Any]]]:
+        """Saldos elegíveis em ordem de id; o filtro de mínimo roda no banco."""
+        ultimo_id = None
+        while True:
+            query = (
+                self.supabase
+                .table("partner_balances")
+                .select("id,partner_id,available_balance")
+                .gte("available_balance", str(self.minimo))
+                .order("id")
+                .limit(self.tamanho_pagina)
+            )
+            if ultimo_id is not None:
+                query = query.gt("id", ultimo_id)
+
+            linhas = query.execute().data or []
+            if not linhas:
+                return
+            yield linhas
+            ultimo_id = linhas[-1]["id"]
+
+    def executar(self) -> Dict[str, Any]:
+        resumo: Dict[str, Any] = {
+            "dry_run": self.dry_run,
+            "minimo": float(self.minimo),
+            "paginas": 0,
+            "elegiveis": 0,
+            "payouts_criados": 0,
+            "ignorados": 0,
+        }
+        total = Decimal("0")
+        inicio = time.perf_counter()
+
+        if self.dry_run:
+            self._simular(resumo)
+            return self._concluir(resumo, inicio)
+
+        resumo["parceiros_compactados"] = compactar_tudo(self.supabase)
+
+        for pagina in self.paginas():
+            resumo["paginas"] += 1
+            resumo["elegiveis"] += len(pagina)
+
+            resultado = (
+                self.supabase
+                .rpc("reservar_payouts", {
+                    "p_balance_ids": [l["id"] for l in pagina],
+                    "p_minimo": str(self.minimo),
+                    "p_provider": self.provider
+                })
+                .execute()
+                .data
+            )
+            resumo["payouts_criados"] += resultado["criados"]
+            resumo["ignorados"] += resultado["ignorados"]
+            total += Decimal(str(resultado["total"]))
+
+            log("INFO", f"Página {resumo['paginas']}: {resultado['criados']} payouts | {resultado['total']}")
+
+        resumo["total"] = float(total)
+        return self._concluir(resumo, inicio)
+
+    def _concluir(self, resumo: Dict[str, Any], inicio: float) -> Dict[str, Any]:
+        segundos = time.perf_counter() - inicio
+        resumo["segundos"] = round(segundos, 3)
+        resumo["parceiros_por_segundo"] = round(resumo["elegiveis"] / segundos, 1) if segundos else 0.0
+        return resumo
+
+    # --------------------------------------------------
+    # DRY-RUN (SOMENTE LEITURA)
+    # --------------------------------------------------
+
+    def _cauda(self) -> Dict[str, Decimal]:
+        """available_balance da cauda do ledger (snapshot_id nulo) somado por parceiro."""
+        cauda: Dict[str, Decimal] = {}
+        ultimo_id = None
+        while True:
+            query = (
+                self.supabase
+                .table("partner_ledger")
+                .select("id,partner_id,available_balance")
+                .is_("snapshot_id", "null")
+                .order("id")
+                .limit(self.tamanho_pagina)
+            )
+            if ultimo_id is not None:
+                query = query.gt("id", ultimo_id)
+
+            linhas = query.execute().data or []
+            for l in linhas:
+                cauda[l["partner_id"]] = cauda.get(l["partner_id"], Decimal("0")) + Decimal(str(l["available_balance"]))
+            if len(linhas) < self.tamanho_pagina:
+                return cauda
+            ultimo_id = linhas[-1]["id"]
+
+    def _simular(self, resumo: Dict[str, Any]):
+        """Totais da rodada sem compactar nem reservar: snapshot + cauda por parceiro."""
+        cauda = self._cauda()
+        total = Decimal("0")
+
+        def considerar(saldo: Decimal):
+            nonlocal total
+            if saldo >= self.minimo:
+                resumo["elegiveis"] += 1
+                total += saldo
+
+        # Snapshot já acima do mínimo (a cauda pode somar ou, com estornos, tirar)
+        for pagina in self.paginas():
+            resumo["paginas"] += 1
+            for l in pagina:
+                considerar(Decimal(str(l["available_balance"])) + cauda.pop(l["partner_id"], Decimal("0")))
+
+        # Snapshot abaixo do mínimo (ou inexistente) que a cauda pode levar acima
+        restantes = list(cauda)
+        for i in range(0, len(restantes), 100):
+            ids = restantes[i:i + 100]
+            snapshots = {
+                l["partner_id"]: Decimal(str(l["available_balance"] or 0))
+                for l in (
+                    self.supabase
+                    .table("partner_balances")
+                    .select("partner_id,available_balance")
+                    .in_("partner_id", ids)
+                    .execute()
+                    .data
+                ) or []
+            }
+            for partner_id in ids:
+                considerar(snapshots.get(partner_id, Decimal("0")) + cauda[partner_id])
+
+        resumo["parceiros_compactados"] = 0
+        resumo["total"] = float(total)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="Rodada de payouts por limite mínimo")
+    parser.add_argument("--minimo", default=PAYOUTS_MINIMO, help="Saldo disponível mínimo para pagar")
+    parser.add_argument("--provider", required=True, help="payout_provider dos payouts criados")
+    parser.add_argument("--pagina", type=int, default=PAYOUTS_PAGINA)
+    parser.add_argument("--dry-run", action="store_true", help="Somente calcula totais; nada é reservado")
+    args = parser.parse_args(argv)
+
+    from supabase_client import get_supabase
+
+    resumo = RodadaPayouts(
+        get_supabase(),
+        minimo=Decimal(args.minimo),
+        provider=args.provider,
+        tamanho_pagina=args.pagina,
+        dry_run=args.dry_run
+    ).executar()
+
+    log("INFO", " | ".join(f"{k}={v}" for k, v in resumo.items()))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -2,10 +2,10 @@
 from supabase import Client
 from decimal import Decimal
 from datetime import datetime
+from concurrent.futures import Future
 
 
-def registrar_venda(
-    supabase: Client,
+def montar_venda(
     *,
     platform: str,
     external_sale_id: str,
@@ -18,8 +18,8 @@ def registrar_venda(
     sale_status: str,
     occurred_at: datetime,
     payload: dict
-):
-    data = {
+) -> dict:
+    return {
         "platform": platform,
         "external_sale_id": external_sale_id,
         "product_id": product_id,
@@ -33,4 +33,35 @@ def registrar_venda(
         "event_payload": payload,
     }
 
-    return supabase.table("sales").insert(data).execute()
+
+def registrar_venda(supabase: Client, **venda):
+    data = montar_venda(**venda)
+
+    # Upsert idempotente: retry da plataforma não cria segunda venda.
+    # Resposta com data vazia = venda já existia (índice único no banco).
+    return (
+        supabase
+        .table("sales")
+        .upsert(
+            data,
+            on_conflict="platform,external_sale_id",
+            ignore_duplicates=True
+        )
+        .execute()
+    )
+
+
+def registrar_venda_em_lote(escritor, **venda) -> Future:
+    """
+    Mesma semântica de registrar_venda via EscritorEmLote.
+    Future → linha gravada, ou None se a venda já existia.
+    """
+    return escritor.enviar("sales", montar_venda(**venda))
+
+
+def configurar_escritor_vendas(escritor):
+    escritor.configurar_tabela(
+        "sales",
+        on_conflict="platform,external_sale_id",
+        ignore_duplicates=True
+    )
@@ -0,0 +1,321 @@
+# segmentos_eventos.py — Log Local de Eventos Legados em Segmentos Comprimidos
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# eventos_financeiros é registro LEGADO (auditoria humana / governança) e não
+# precisa custar uma ida ao Supabase por webhook. Aqui cada evento vira uma
+# linha em um segmento gzip local (append-only); segmentos fechados são
+# enviados em massa por uma thread e apagados depois de aceitos.
+#
+# SEGMENTOS (por slot = um por processo, com flock):
+# - eventos.<slot>.<n>.aberto.gz → segmento em escrita
+# - eventos.<slot>.<n>.gz        → fechado (rotação por tamanho ou idade), pronto para envio
+# SEGMENTOS_MAX_BYTES conta os bytes antes da compressão.
+#
+# GARANTIAS:
+# - Flush do gzip a cada SEGMENTOS_FLUSH_MS: queda perde no máximo essa janela
+# - Segmento aberto de processo morto é recuperado e fechado no boot seguinte
+# - evento_id único (sql/009_eventos_segmentos.sql): reenvio após falha não duplica
+# - /financeiro/auditoria lê a cauda em memória (últimos SEGMENTOS_CAUDA eventos)
+
+import os
+import gzip
+import time
+import uuid
+import zlib
+import fcntl
+import threading
+from collections import deque
+from typing import Any, Dict, List, Optional
+
+from supabase import Client
+
+import codec_json
+
+# ======================================================
+# CONFIGURAÇÕES
+# ======================================================
+
+SEGMENTOS_DIR = os.getenv("SEGMENTOS_DIR", "./segmentos_eventos")
+SEGMENTOS_MAX_BYTES = int(os.getenv("SEGMENTOS_MAX_BYTES", str(8 * 1024 * 1024)))
+SEGMENTOS_MAX_IDADE_S = float(os.getenv("SEGMENTOS_MAX_IDADE_S", "30"))
+SEGMENTOS_FLUSH_MS = int(os.getenv("SEGMENTOS_FLUSH_MS", "200"))
+SEGMENTOS_LOTE = int(os.getenv("SEGMENTOS_LOTE", "1000"))
+SEGMENTOS_CAUDA = int(os.getenv("SEGMENTOS_CAUDA", "1000"))
+SEGMENTOS_MAX_SLOTS = 64
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[SEGMENTOS] [{nivel}] {mensagem}")
+
+
+def ler_segmento(caminho: str) -> List[Dict[str, Any]]:
+    """Linhas íntegras de um segmento; cauda truncada (queda no meio do gzip) é descartada."""
+    linhas = []
+    with gzip.open(caminho, "rb") as f:
+        try:
+            for bruta in f:
+                try:
+                    linhas.append(codec_json.loads(bruta))
+                except ValueError:
+                    continue
+        except (EOFError, zlib.error):
+            pass
+    return linhas
+
+
+class LogSegmentos:
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        tabela: str = "eventos_financeiros",
+        diretorio: str = SEGMENTOS_DIR,
+        max_bytes: int = SEGMENTOS_MAX_BYTES,
+        max_idade_s: float = SEGMENTOS_MAX_IDADE_S,
+        flush_ms: int = SEGMENTOS_FLUSH_MS,
+        tamanho_lote: int = SEGMENTOS_LOTE,
+        tamanho_cauda: int = SEGMENTOS_CAUDA
+    ):
+        self.supabase = supabase
+        self.tabela = tabela
+        self.diretorio = diretorio
+        self.max_bytes = max_bytes
+        self.max_idade_s = max_idade_s
+        self.intervalo_flush = max(1, flush_ms) / 1000.0
+        self.tamanho_lote = max(1, tamanho_lote)
+
+        self.cauda: deque = deque(maxlen=tamanho_cauda)
+
+        self._lock = threading.Lock()
+        self._lock_envio = threading.Lock()
+        self._parar = threading.Event()
+
+        self.eventos = 0
+        self.segmentos_fechados = 0
+        self.segmentos_enviados = 0
+        self.linhas_enviadas = 0
+        self.falhas = 0
+
+        os.makedirs(self.diretorio, exist_ok=True)
+        self.slot, self._trava = self._adquirir_slot()
+        self._recuperar_orfaos()
+
+        self._numero = self._ultimo_numero() + 1
+        self._arquivo = None
+        self._bytes = 0
+        self._aberto_em = 0.0
+        self._abrir()
+
+        # Segmentos deixados por execuções anteriores sobem antes do primeiro webhook
+        try:
+            self.enviar()
+        except Exception as e:
+            self.falhas += 1
+            log("WARN", f"Envio inicial de segmentos falhou (nova tentativa em segundo plano): {e}")
+
+        self._thread = threading.Thread(target=self._loop, name="segmentos-eventos", daemon=True)
+        self._thread.start()
+
+    # --------------------------------------------------
+    # SLOTS / RECUPERAÇÃO
+    # --------------------------------------------------
+
+    def _caminho_trava(self, slot: int) -> str:
+        return os.path.join(self.diretorio, f"eventos.{slot}.lock")
+
+    def _adquirir_slot(self):
+        for slot in range(SEGMENTOS_MAX_SLOTS):
+            trava = open(self._caminho_trava(slot), "w")
+            try:
+                fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return slot, trava
+            except OSError:
+                trava.close()
+        raise RuntimeError("Nenhum slot de segmentos de eventos disponível")
+
+    def _fechar_orfao(self, caminho: str):
+        """Reescreve as linhas íntegras de um segmento aberto como segmento fechado."""
+        linhas = ler_segmento(caminho)
+        destino = caminho.replace(".aberto.gz", ".gz")
+        if linhas:
+            tmp = destino + ".tmp"
+            with gzip.open(tmp, "wb") as f:
+                for linha in linhas:
+                    f.write(codec_json.dumps(linha) + b"\n")
+            os.replace(tmp, destino)
+        os.remove(caminho)
+        log("WARN", f"Segmento órfão {os.path.basename(caminho)} recuperado: {len(linhas)} eventos")
+
+    def _recuperar_orfaos(self):
+        """Fecha segmentos abertos do próprio slot e de slots sem processo vivo."""
+        orfaos: Dict[int, List[str]] = {}
+        for nome in os.listdir(self.diretorio):
+            if nome.startswith("eventos.") and nome.endswith(".aberto.gz"):
+                orfaos.setdefault(int(nome.split(".")[1]), []).append(os.path.join(self.diretorio, nome))
+
+        for slot, caminhos in orfaos.items():
+            trava = None
+            if slot != self.slot:
+                trava = open(self._caminho_trava(slot), "w")
+                try:
+                    fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                except OSError:
+                    trava.close()
+                    continue  # slot vivo em outro worker
+            try:
+                for caminho in caminhos:
+                    self._fechar_orfao(caminho)
+            finally:
+                if trava is not None:
+                    trava.close()
+
+    def _ultimo_numero(self) -> int:
+        prefixo = f"eventos.{self.slot}."
+        numeros = [
+            int(nome.split(".")[2])
+            for nome in os.listdir(self.diretorio)
+            if nome.startswith(prefixo) and nome.endswith(".gz")
+        ]
+        return max(numeros, default=0)
+
+    # --------------------------------------------------
+    # ESCRITA (CAMINHO DO WEBHOOK)
+    # --------------------------------------------------
+
+    def _base(self, numero: int) -> str:
+        return os.path.join(self.diretorio, f"eventos.{self.slot}.{numero:08d}")
+
+    def _abrir(self):
+        self._arquivo = gzip.open(self._base(self._numero) + ".aberto.gz", "wb")
+        self._bytes = 0
+        self._aberto_em = time.monotonic()
+
+    def _rotacionar(self, reabrir: bool = True):
+        """Chamar com self._lock."""
+        self._arquivo.close()
+        base = self._base(self._numero)
+        if self._bytes:
+            os.replace(base + ".aberto.gz", base + ".gz")
+            self.segmentos_fechados += 1
+        else:
+            os.remove(base + ".aberto.gz")
+        self._numero += 1
+        if reabrir:
+            self._abrir()
+
+    def registrar(self, evento: Dict[str, Any]) -> Dict[str, Any]:
+        """Grava o evento no segmento aberto e na cauda. Sem I/O de rede."""
+        linha = {"evento_id": str(uuid.uuid4()), **evento}
+        bruta = codec_json.dumps(linha) + b"\n"
+        with self._lock:
+            self._arquivo.write(bruta)
+            self._bytes += len(bruta)
+            self.cauda.append(linha)
+            self.eventos += 1
+            if self._bytes >= self.max_bytes:
+                self._rotacionar()
+        return linha
+
+    def recentes(self, limite: int) -> List[Dict[str, Any]]:
+        """Eventos mais recentes primeiro (mesma ordem da consulta ao banco)."""
+        with self._lock:
+            return list(self.cauda)[-limite:][::-1] if limite > 0 else []
+
+    def semear_cauda(self, linhas: List[Dict[str, Any]]):
+        """Boot: cauda começa com os últimos eventos já no banco (mais antigos primeiro)."""
+        with self._lock:
+            recentes = list(self.cauda)
+            self.cauda.clear()
+            self.cauda.extend(linhas)
+            self.cauda.extend(recentes)
+
+    # --------------------------------------------------
+    # ENVIO EM MASSA
+    # --------------------------------------------------
+
+    def _enviar_segmento(self, caminho: str):
+        linhas = ler_segmento(caminho)
+        for i in range(0, len(linhas), self.tamanho_lote):
+            (
+                self.supabase
+                .table(self.tabela)
+                .upsert(linhas[i:i + self.tamanho_lote], on_conflict="evento_id", ignore_duplicates=True)
+                .execute()
+            )
+        os.remove(caminho)
+        self.segmentos_enviados += 1
+        self.linhas_enviadas += len(linhas)
+
+    def enviar(self) -> int:
+        """Envia todos os segmentos fechados do diretório (de qualquer slot). Retorna quantos."""
+        with self._lock_envio:
+            fechados = sorted(
+                nome for nome in os.listdir(self.diretorio)
+                if nome.startswith("eventos.") and nome.endswith(".gz") and not nome.endswith(".aberto.gz")
+            )
+            enviados = 0
+            for nome in fechados:
+                caminho = os.path.join(self.diretorio, nome)
+                # Outro worker pode estar enviando o mesmo segmento
+                try:
+                    arquivo = open(caminho, "rb")
+                except FileNotFoundError:
+                    continue
+                with arquivo:
+                    try:
+                        fcntl.flock(arquivo, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                    except OSError:
+                        continue
+                    if not os.path.exists(caminho):
+                        continue
+                    self._enviar_segmento(caminho)
+                    enviados += 1
+            return enviados
+
+    def _loop(self):
+        while not self._parar.wait(self.intervalo_flush):
+            with self._lock:
+                # Z_SYNC_FLUSH: o que já foi gravado é legível mesmo se o processo cair
+                self._arquivo.flush(zlib.Z_SYNC_FLUSH)
+                if self._bytes and time.monotonic() - self._aberto_em >= self.max_idade_s:
+                    self._rotacionar()
+            try:
+                self.enviar()
+            except Exception as e:
+                self.falhas += 1
+                log("WARN", f"Envio de segmentos falhou (nova tentativa no próximo ciclo): {e}")
+
+    # --------------------------------------------------
+    # CICLO DE VIDA / MÉTRICAS
+    # --------------------------------------------------
+
+    def encerrar(self):
+        """Fecha o segmento aberto e tenta um último envio."""
+        self._parar.set()
+        self._thread.join(timeout=5)
+        with self._lock:
+            self._rotacionar(reabrir=False)
+        try:
+            self.enviar()
+        except Exception as e:
+            log("WARN", f"Segmentos pendentes ficam em {self.diretorio} para o próximo boot: {e}")
+
+    def status(self) -> Dict[str, Any]:
+        pendentes = sum(
+            1 for nome in os.listdir(self.diretorio)
+            if nome.startswith("eventos.") and nome.endswith(".gz") and not nome.endswith(".aberto.gz")
+        )
+        return {
+            "diretorio": self.diretorio,
+            "slot": self.slot,
+            "eventos": self.eventos,
+            "bytes_segmento_atual": self._bytes,
+            "segmentos_fechados": self.segmentos_fechados,
+            "segmentos_pendentes": pendentes,
+            "segmentos_enviados": self.segmentos_enviados,
+            "linhas_enviadas": self.linhas_enviadas,
+            "cauda": len(self.cauda),
+            "falhas": self.falhas,
+        }
@@ -0,0 +1,10 @@
+-- 001_sales_idempotencia.sql
+-- Chave de idempotência das vendas: (platform, external_sale_id)
+-- Necessário para o upsert de registrar_venda (ON CONFLICT DO NOTHING).
+--
+-- Antes de aplicar, verificar duplicatas já existentes:
+--   select platform, external_sale_id, count(*)
+--   from sales group by 1, 2 having count(*) > 1;
+
+create unique index if not exists sales_platform_external_sale_id_uq
+    on sales (platform, external_sale_id);
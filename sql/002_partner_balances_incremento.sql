@@ -0,0 +1,34 @@
+-- 002_partner_balances_incremento.sql
+-- Crédito atômico de comissão: UMA ida ao banco por venda.
+-- Substitui select (+ insert) + update calculado no cliente, que perdia
+-- incrementos quando duas vendas do mesmo parceiro chegavam juntas.
+--
+-- Substituída em sql/007_ledger_parceiros.sql: a função SQL passa pelo
+-- ledger (e ainda retorna a linha de partner_balances), mas
+-- balance_service.incrementar_saldo_parceiro chama lancar_comissao direto e
+-- retorna o id do lançamento em partner_ledger, não os saldos novos.
+--
+-- Antes de aplicar, verificar saldos duplicados por parceiro:
+--   select partner_id, count(*)
+--   from partner_balances group by 1 having count(*) > 1;
+
+create unique index if not exists partner_balances_partner_id_uq
+    on partner_balances (partner_id);
+
+-- Upsert + incremento no mesmo comando (trava de linha do ON CONFLICT).
+-- Retorna a linha já atualizada (saldos novos).
+create or replace function incrementar_saldo_parceiro(
+    p_partner_id text,
+    p_valor numeric
+)
+returns partner_balances
+language sql
+as $$
+    insert into partner_balances as pb (partner_id, total_generated, available_balance, updated_at)
+    values (p_partner_id, p_valor, p_valor, now())
+    on conflict (partner_id) do update
+        set total_generated = coalesce(pb.total_generated, 0) + excluded.total_generated,
+            available_balance = coalesce(pb.available_balance, 0) + excluded.available_balance,
+            updated_at = excluded.updated_at
+    returning pb.*;
+$$;
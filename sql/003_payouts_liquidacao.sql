@@ -0,0 +1,76 @@
+-- 003_payouts_liquidacao.sql
+-- Liquidação em massa de payouts: UMA chamada transacional por lote.
+-- Entrada: [{"payout_id": "...", "provider_reference": "..."}, ...]
+--
+-- - marca cada payout como pago (payout já pago é ignorado → lote pode ser reenviado)
+-- - move o total pago de available_balance para paid_balance, uma vez por saldo
+-- - travas tomadas em ordem de id (lotes concorrentes não entram em deadlock)
+--
+-- payouts.id e partner_balances.id assumidos uuid (padrão do Supabase).
+
+create or replace function liquidar_payouts(p_itens jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_pagos integer;
+    v_saldos integer;
+    v_recebidos integer := jsonb_array_length(p_itens);
+begin
+    create temporary table _liquidacao on commit drop as
+    select distinct on (payout_id) payout_id, provider_reference
+      from jsonb_to_recordset(p_itens) as i(payout_id uuid, provider_reference text)
+     order by payout_id;
+
+    perform 1
+       from payouts p
+       join _liquidacao l on l.payout_id = p.id
+      order by p.id
+        for update of p;
+
+    perform 1
+       from partner_balances b
+      where b.id in (
+            select p.balance_id
+              from payouts p
+              join _liquidacao l on l.payout_id = p.id
+             where p.payout_status <> 'paid'
+      )
+      order by b.id
+        for update;
+
+    with pagos as (
+        update payouts p
+           set payout_status = 'paid',
+               provider_reference = l.provider_reference,
+               processed_at = now()
+          from _liquidacao l
+         where p.id = l.payout_id
+           and p.payout_status <> 'paid'
+        returning p.balance_id, p.amount
+    ),
+    por_saldo as (
+        select balance_id, sum(amount) as total
+          from pagos
+         group by balance_id
+    ),
+    saldos as (
+        update partner_balances b
+           set available_balance = coalesce(b.available_balance, 0) - s.total,
+               paid_balance = coalesce(b.paid_balance, 0) + s.total,
+               updated_at = now()
+          from por_saldo s
+         where b.id = s.balance_id
+        returning b.id
+    )
+    select (select count(*) from pagos), (select count(*) from saldos)
+      into v_pagos, v_saldos;
+
+    return jsonb_build_object(
+        'recebidos', v_recebidos,
+        'pagos', v_pagos,
+        'ignorados', v_recebidos - v_pagos,
+        'saldos_atualizados', v_saldos
+    );
+end;
+$$;
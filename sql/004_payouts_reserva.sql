@@ -0,0 +1,133 @@
+-- 004_payouts_reserva.sql
+-- Rodada de payouts por limite mínimo com RESERVA atômica do saldo.
+--
+-- reservar_payouts: para cada saldo do lote com available_balance >= mínimo,
+-- move available_balance → reserved_balance e cria o payout pendente no
+-- mesmo comando. A trava de linha (ordem de id) + a reavaliação do filtro
+-- fazem uma rodada concorrente ver o saldo já reservado e pular o parceiro.
+--
+-- liquidar_payouts (redefinida): payout reservado baixa de reserved_balance;
+-- payout antigo (sem reserva) continua baixando de available_balance.
+
+alter table partner_balances
+    add column if not exists reserved_balance numeric not null default 0;
+
+alter table payouts
+    add column if not exists reserved boolean not null default false;
+
+create or replace function reservar_payouts(
+    p_balance_ids uuid[],
+    p_minimo numeric,
+    p_provider text
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_criados integer;
+    v_total numeric;
+begin
+    with travados as (
+        select id, available_balance
+          from partner_balances
+         where id = any(p_balance_ids)
+           and available_balance >= p_minimo
+         order by id
+           for update
+    ),
+    reservados as (
+        update partner_balances b
+           set available_balance = b.available_balance - t.available_balance,
+               reserved_balance = b.reserved_balance + t.available_balance,
+               updated_at = now()
+          from travados t
+         where b.id = t.id
+        returning b.id, b.partner_id, t.available_balance as amount
+    ),
+    criados as (
+        insert into payouts (partner_id, balance_id, amount, payout_provider, payout_status, reserved)
+        select partner_id, id, amount, p_provider, 'pending', true
+          from reservados
+        returning amount
+    )
+    select count(*), coalesce(sum(amount), 0)
+      into v_criados, v_total
+      from criados;
+
+    return jsonb_build_object(
+        'criados', v_criados,
+        'total', v_total,
+        'ignorados', cardinality(p_balance_ids) - v_criados
+    );
+end;
+$$;
+
+create or replace function liquidar_payouts(p_itens jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_pagos integer;
+    v_saldos integer;
+    v_recebidos integer := jsonb_array_length(p_itens);
+begin
+    create temporary table _liquidacao on commit drop as
+    select distinct on (payout_id) payout_id, provider_reference
+      from jsonb_to_recordset(p_itens) as i(payout_id uuid, provider_reference text)
+     order by payout_id;
+
+    perform 1
+       from payouts p
+       join _liquidacao l on l.payout_id = p.id
+      order by p.id
+        for update of p;
+
+    perform 1
+       from partner_balances b
+      where b.id in (
+            select p.balance_id
+              from payouts p
+              join _liquidacao l on l.payout_id = p.id
+             where p.payout_status <> 'paid'
+      )
+      order by b.id
+        for update;
+
+    with pagos as (
+        update payouts p
+           set payout_status = 'paid',
+               provider_reference = l.provider_reference,
+               processed_at = now()
+          from _liquidacao l
+         where p.id = l.payout_id
+           and p.payout_status <> 'paid'
+        returning p.balance_id, p.amount, p.reserved
+    ),
+    por_saldo as (
+        select balance_id,
+               sum(amount) as total,
+               sum(amount) filter (where reserved) as reservado
+          from pagos
+         group by balance_id
+    ),
+    saldos as (
+        update partner_balances b
+           set available_balance = coalesce(b.available_balance, 0) - (s.total - coalesce(s.reservado, 0)),
+               reserved_balance = b.reserved_balance - coalesce(s.reservado, 0),
+               paid_balance = coalesce(b.paid_balance, 0) + s.total,
+               updated_at = now()
+          from por_saldo s
+         where b.id = s.balance_id
+        returning b.id
+    )
+    select (select count(*) from pagos), (select count(*) from saldos)
+      into v_pagos, v_saldos;
+
+    return jsonb_build_object(
+        'recebidos', v_recebidos,
+        'pagos', v_pagos,
+        'ignorados', v_recebidos - v_pagos,
+        'saldos_atualizados', v_saldos
+    );
+end;
+$$;
@@ -0,0 +1,79 @@
+-- 005_recalculo_comissoes.sql
+-- Recálculo retroativo de comissões: UMA chamada transacional por página.
+-- Entrada: somente as vendas cujo split mudou
+--   [{"id": "...",
+--     "partner_commission": "...", "master_commission": "...",
+--     "partner_commission_anterior": "...", "master_commission_anterior": "..."}, ...]
+--
+-- - grava o split novo apenas se a venda ainda tem o split lido (guarda otimista):
+--   reenviar a página após queda não aplica o ajuste duas vezes
+-- - ajusta partner_balances pela diferença (novo - anterior), UMA vez por parceiro
+-- - saldos ajustados em ordem de partner_id (páginas concorrentes sem deadlock)
+--
+-- sales.id assumido uuid (padrão do Supabase).
+
+create or replace function recalcular_comissoes(p_itens jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_atualizadas integer;
+    v_saldos integer;
+    v_ajuste numeric;
+    v_recebidos integer := jsonb_array_length(p_itens);
+begin
+    create temporary table _recalculo on commit drop as
+    select distinct on (id) *
+      from jsonb_to_recordset(p_itens) as i(
+            id uuid,
+            partner_commission numeric,
+            master_commission numeric,
+            partner_commission_anterior numeric,
+            master_commission_anterior numeric
+      )
+     order by id;
+
+    create temporary table _recalculo_ajustes on commit drop as
+    with alteradas as (
+        update sales s
+           set partner_commission = r.partner_commission,
+               master_commission = r.master_commission
+          from _recalculo r
+         where s.id = r.id
+           and s.partner_commission is not distinct from r.partner_commission_anterior
+           and s.master_commission is not distinct from r.master_commission_anterior
+        returning s.partner_id,
+                  r.partner_commission - coalesce(r.partner_commission_anterior, 0) as delta
+    )
+    select partner_id, count(*) as vendas, sum(delta) as delta
+      from alteradas
+     group by partner_id;
+
+    select coalesce(sum(vendas), 0), coalesce(sum(delta) filter (where partner_id is not null), 0)
+      into v_atualizadas, v_ajuste
+      from _recalculo_ajustes;
+
+    with saldos as (
+        insert into partner_balances as pb (partner_id, total_generated, available_balance, updated_at)
+        select partner_id, delta, delta, now()
+          from _recalculo_ajustes
+         where partner_id is not null
+           and delta <> 0
+         order by partner_id
+        on conflict (partner_id) do update
+            set total_generated = coalesce(pb.total_generated, 0) + excluded.total_generated,
+                available_balance = coalesce(pb.available_balance, 0) + excluded.available_balance,
+                updated_at = excluded.updated_at
+        returning 1
+    )
+    select count(*) into v_saldos from saldos;
+
+    return jsonb_build_object(
+        'recebidas', v_recebidos,
+        'atualizadas', v_atualizadas,
+        'ignoradas', v_recebidos - v_atualizadas,
+        'saldos_ajustados', v_saldos,
+        'ajuste_total', v_ajuste
+    );
+end;
+$$;
@@ -0,0 +1,25 @@
+-- 006_commission_rates.sql
+-- Taxas de comissão do parceiro por plataforma / produto / parceiro.
+-- Coluna nula = curinga. Resolução (taxas_comissao.py), do mais específico
+-- para o mais geral: parceiro > produto > plataforma; sem linha → 60%.
+--
+-- Exemplos:
+--   (null,      null,  null)      → padrão global
+--   ('HOTMART', null,  null)      → toda venda Hotmart
+--   (null,      '123', null)      → produto 123 em qualquer plataforma
+--   (null,      null,  'AFF-001') → parceiro AFF-001 em qualquer produto
+
+create table if not exists commission_rates (
+    id uuid primary key default gen_random_uuid(),
+    platform text,
+    product_id text,
+    partner_id text,
+    percentual_parceiro numeric not null check (percentual_parceiro between 0 and 1),
+    active boolean not null default true,
+    created_at timestamptz not null default now(),
+    updated_at timestamptz not null default now()
+);
+
+-- Uma taxa por combinação (nulos contam como iguais entre si)
+create unique index if not exists commission_rates_escopo_uq
+    on commission_rates (coalesce(platform, ''), coalesce(product_id, ''), coalesce(partner_id, ''));
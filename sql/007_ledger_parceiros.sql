@@ -0,0 +1,434 @@
+-- 007_ledger_parceiros.sql
+-- Ledger append-only de saldos de parceiros + snapshots compactados.
+--
+-- partner_ledger: um lançamento por crédito de comissão, estorno, ajuste,
+-- reserva e pagamento de payout. Cada linha carrega a VARIAÇÃO de cada
+-- coluna de saldo; nada é alterado depois de gravado, exceto a marcação
+-- snapshot_id feita pela compactação.
+--
+-- partner_balances passa a ser o snapshot corrente:
+--   saldo atual = partner_balances + lançamentos com snapshot_id nulo (cauda curta)
+-- compactar_saldos dobra a cauda no snapshot e registra uma cópia em
+-- partner_balance_snapshots. Saldo em uma data = último snapshot até a
+-- data + lançamentos entre ele e o snapshot seguinte.
+--
+-- Crédito de venda vira INSERT no ledger: vendas simultâneas do mesmo
+-- parceiro não disputam mais a linha de partner_balances.
+
+create table if not exists partner_ledger (
+    id bigserial primary key,
+    partner_id text not null,
+    tipo text not null check (tipo in ('credito', 'estorno', 'ajuste', 'payout_reserva', 'payout_pago')),
+    referencia text,
+    total_generated numeric not null default 0,
+    available_balance numeric not null default 0,
+    reserved_balance numeric not null default 0,
+    paid_balance numeric not null default 0,
+    snapshot_id bigint,
+    created_at timestamptz not null default now()
+);
+
+-- Mesma venda / mesmo payout não lança duas vezes (retry seguro)
+create unique index if not exists partner_ledger_tipo_referencia_uq
+    on partner_ledger (tipo, referencia)
+    where referencia is not null;
+
+-- Cauda ainda não compactada (saldo atual e compactação)
+create index if not exists partner_ledger_cauda_idx
+    on partner_ledger (partner_id, id)
+    where snapshot_id is null;
+
+-- Lançamentos por snapshot (saldo em uma data)
+create index if not exists partner_ledger_snapshot_idx
+    on partner_ledger (partner_id, snapshot_id);
+
+create table if not exists partner_balance_snapshots (
+    id bigserial primary key,
+    partner_id text not null,
+    total_generated numeric not null default 0,
+    available_balance numeric not null default 0,
+    reserved_balance numeric not null default 0,
+    paid_balance numeric not null default 0,
+    created_at timestamptz not null default now()
+);
+
+create index if not exists partner_balance_snapshots_data_idx
+    on partner_balance_snapshots (partner_id, created_at);
+
+alter table partner_balances
+    add column if not exists last_snapshot_id bigint;
+
+
+-- ==========================================================
+-- LANÇAMENTO DE COMISSÃO (caminho da venda)
+-- ==========================================================
+
+create or replace function lancar_comissao(
+    p_partner_id text,
+    p_valor numeric,
+    p_tipo text default 'credito',
+    p_referencia text default null
+)
+returns bigint
+language sql
+as $$
+    insert into partner_ledger (partner_id, tipo, referencia, total_generated, available_balance)
+    values (p_partner_id, p_tipo, p_referencia, p_valor, p_valor)
+    on conflict (tipo, referencia) where referencia is not null do nothing
+    returning id;
+$$;
+
+
+-- ==========================================================
+-- COMPACTAÇÃO (cauda → snapshot)
+-- ==========================================================
+
+-- p_partner_ids nulo = qualquer parceiro com cauda (até p_limite parceiros).
+-- Travas de partner_balances em ordem de partner_id.
+create or replace function compactar_saldos(
+    p_partner_ids text[] default null,
+    p_limite integer default 1000
+)
+returns integer
+language plpgsql
+as $$
+declare
+    v_parceiro text;
+    v_snapshot bigint;
+    v_compactados integer := 0;
+begin
+    for v_parceiro in
+        select distinct partner_id
+          from partner_ledger
+         where snapshot_id is null
+           and (p_partner_ids is null or partner_id = any(p_partner_ids))
+         order by partner_id
+         limit p_limite
+    loop
+        insert into partner_balances (partner_id)
+        values (v_parceiro)
+        on conflict (partner_id) do nothing;
+
+        perform 1 from partner_balances where partner_id = v_parceiro for update;
+
+        insert into partner_balance_snapshots (partner_id)
+        values (v_parceiro)
+        returning id into v_snapshot;
+
+        with dobrados as (
+            update partner_ledger
+               set snapshot_id = v_snapshot
+             where partner_id = v_parceiro
+               and snapshot_id is null
+            returning total_generated, available_balance, reserved_balance, paid_balance
+        ),
+        cauda as (
+            select coalesce(sum(total_generated), 0) as total_generated,
+                   coalesce(sum(available_balance), 0) as available_balance,
+                   coalesce(sum(reserved_balance), 0) as reserved_balance,
+                   coalesce(sum(paid_balance), 0) as paid_balance
+              from dobrados
+        ),
+        saldo as (
+            update partner_balances b
+               set total_generated = coalesce(b.total_generated, 0) + c.total_generated,
+                   available_balance = coalesce(b.available_balance, 0) + c.available_balance,
+                   reserved_balance = coalesce(b.reserved_balance, 0) + c.reserved_balance,
+                   paid_balance = coalesce(b.paid_balance, 0) + c.paid_balance,
+                   last_snapshot_id = v_snapshot,
+                   updated_at = now()
+              from cauda c
+             where b.partner_id = v_parceiro
+            returning b.total_generated, b.available_balance, b.reserved_balance, b.paid_balance
+        )
+        update partner_balance_snapshots s
+           set total_generated = saldo.total_generated,
+               available_balance = saldo.available_balance,
+               reserved_balance = saldo.reserved_balance,
+               paid_balance = saldo.paid_balance
+          from saldo
+         where s.id = v_snapshot;
+
+        v_compactados := v_compactados + 1;
+    end loop;
+
+    return v_compactados;
+end;
+$$;
+
+
+-- ==========================================================
+-- LEITURA: SALDO ATUAL E SALDO EM UMA DATA
+-- ==========================================================
+
+create or replace function saldo_parceiro(p_partner_id text)
+returns jsonb
+language sql
+stable
+as $$
+    with cauda as (
+        select coalesce(sum(total_generated), 0) as total_generated,
+               coalesce(sum(available_balance), 0) as available_balance,
+               coalesce(sum(reserved_balance), 0) as reserved_balance,
+               coalesce(sum(paid_balance), 0) as paid_balance,
+               count(*) as lancamentos
+          from partner_ledger
+         where partner_id = p_partner_id
+           and snapshot_id is null
+    )
+    select jsonb_build_object(
+        'partner_id', p_partner_id,
+        'total_generated', coalesce(b.total_generated, 0) + c.total_generated,
+        'available_balance', coalesce(b.available_balance, 0) + c.available_balance,
+        'reserved_balance', coalesce(b.reserved_balance, 0) + c.reserved_balance,
+        'paid_balance', coalesce(b.paid_balance, 0) + c.paid_balance,
+        'lancamentos_na_cauda', c.lancamentos
+    )
+      from cauda c
+      left join partner_balances b on b.partner_id = p_partner_id;
+$$;
+
+-- Último snapshot até p_momento + lançamentos até p_momento que entraram
+-- depois dele (no máximo até o primeiro snapshot após p_momento, ou na cauda).
+-- Lançamentos são INSERTs de um comando: criado antes de p_momento implica
+-- visível para a compactação seguinte.
+create or replace function saldo_parceiro_em(p_partner_id text, p_momento timestamptz)
+returns jsonb
+language sql
+stable
+as $$
+    with base as (
+        select id, total_generated, available_balance, reserved_balance, paid_balance
+          from partner_balance_snapshots
+         where partner_id = p_partner_id
+           and created_at <= p_momento
+         order by created_at desc, id desc
+         limit 1
+    ),
+    limite as (
+        select min(id) as id
+          from partner_balance_snapshots
+         where partner_id = p_partner_id
+           and created_at > p_momento
+    ),
+    entre as (
+        select coalesce(sum(l.total_generated), 0) as total_generated,
+               coalesce(sum(l.available_balance), 0) as available_balance,
+               coalesce(sum(l.reserved_balance), 0) as reserved_balance,
+               coalesce(sum(l.paid_balance), 0) as paid_balance
+          from partner_ledger l, limite
+         where l.partner_id = p_partner_id
+           and l.created_at <= p_momento
+           and (
+                (l.snapshot_id > coalesce((select id from base), 0)
+                 and (limite.id is null or l.snapshot_id <= limite.id))
+                or l.snapshot_id is null
+           )
+    )
+    select jsonb_build_object(
+        'partner_id', p_partner_id,
+        'momento', p_momento,
+        'total_generated', coalesce((select total_generated from base), 0) + e.total_generated,
+        'available_balance', coalesce((select available_balance from base), 0) + e.available_balance,
+        'reserved_balance', coalesce((select reserved_balance from base), 0) + e.reserved_balance,
+        'paid_balance', coalesce((select paid_balance from base), 0) + e.paid_balance
+    )
+      from entre e;
+$$;
+
+
+-- ==========================================================
+-- ESCRITORES EXISTENTES PASSAM PELO LEDGER
+-- ==========================================================
+
+-- Crédito avulso (002): mesmo contrato (retorna o saldo novo), agora via
+-- ledger. Compacta o parceiro na hora — o caminho da venda usa lancar_comissao.
+create or replace function incrementar_saldo_parceiro(
+    p_partner_id text,
+    p_valor numeric
+)
+returns partner_balances
+language plpgsql
+as $$
+declare
+    v_saldo partner_balances;
+begin
+    perform lancar_comissao(p_partner_id, p_valor);
+    perform compactar_saldos(array[p_partner_id], 1);
+    select * into v_saldo from partner_balances where partner_id = p_partner_id;
+    return v_saldo;
+end;
+$$;
+
+-- Reserva (004): compacta os saldos da página, reserva e lança no ledger
+create or replace function reservar_payouts(
+    p_balance_ids uuid[],
+    p_minimo numeric,
+    p_provider text
+)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_criados integer;
+    v_total numeric;
+    v_parceiros text[];
+begin
+    select array_agg(partner_id order by partner_id)
+      into v_parceiros
+      from partner_balances
+     where id = any(p_balance_ids);
+
+    perform compactar_saldos(v_parceiros, coalesce(cardinality(v_parceiros), 0));
+
+    with travados as (
+        select id, partner_id, available_balance
+          from partner_balances
+         where id = any(p_balance_ids)
+           and available_balance >= p_minimo
+         order by id
+           for update
+    ),
+    criados as (
+        insert into payouts (partner_id, balance_id, amount, payout_provider, payout_status, reserved)
+        select partner_id, id, available_balance, p_provider, 'pending', true
+          from travados
+        returning id, partner_id, amount
+    ),
+    lancados as (
+        insert into partner_ledger (partner_id, tipo, referencia, available_balance, reserved_balance)
+        select partner_id, 'payout_reserva', id::text, -amount, amount
+          from criados
+    )
+    select count(*), coalesce(sum(amount), 0)
+      into v_criados, v_total
+      from criados;
+
+    perform compactar_saldos(v_parceiros, coalesce(cardinality(v_parceiros), 0));
+
+    return jsonb_build_object(
+        'criados', v_criados,
+        'total', v_total,
+        'ignorados', cardinality(p_balance_ids) - v_criados
+    );
+end;
+$$;
+
+-- Liquidação (003/004): pagamento vira lançamento; saldos compactados em seguida
+create or replace function liquidar_payouts(p_itens jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_pagos integer;
+    v_saldos integer;
+    v_parceiros text[];
+    v_recebidos integer := jsonb_array_length(p_itens);
+begin
+    create temporary table _liquidacao on commit drop as
+    select distinct on (payout_id) payout_id, provider_reference
+      from jsonb_to_recordset(p_itens) as i(payout_id uuid, provider_reference text)
+     order by payout_id;
+
+    perform 1
+       from payouts p
+       join _liquidacao l on l.payout_id = p.id
+      order by p.id
+        for update of p;
+
+    create temporary table _liquidados on commit drop as
+    with pagos as (
+        update payouts p
+           set payout_status = 'paid',
+               provider_reference = l.provider_reference,
+               processed_at = now()
+          from _liquidacao l
+         where p.id = l.payout_id
+           and p.payout_status <> 'paid'
+        returning p.id, p.partner_id, p.amount, p.reserved
+    )
+    select * from pagos;
+
+    insert into partner_ledger (partner_id, tipo, referencia, available_balance, reserved_balance, paid_balance)
+    select partner_id,
+           'payout_pago',
+           id::text,
+           case when reserved then 0 else -amount end,
+           case when reserved then -amount else 0 end,
+           amount
+      from _liquidados;
+
+    select count(*), array_agg(distinct partner_id)
+      into v_pagos, v_parceiros
+      from _liquidados;
+
+    v_saldos := compactar_saldos(v_parceiros, coalesce(cardinality(v_parceiros), 0));
+
+    return jsonb_build_object(
+        'recebidos', v_recebidos,
+        'pagos', v_pagos,
+        'ignorados', v_recebidos - v_pagos,
+        'saldos_atualizados', v_saldos
+    );
+end;
+$$;
+
+-- Recálculo (005): ajuste por parceiro vira lançamento 'ajuste'
+create or replace function recalcular_comissoes(p_itens jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_atualizadas integer;
+    v_saldos integer;
+    v_ajuste numeric;
+    v_recebidos integer := jsonb_array_length(p_itens);
+begin
+    create temporary table _recalculo on commit drop as
+    select distinct on (id) *
+      from jsonb_to_recordset(p_itens) as i(
+            id uuid,
+            partner_commission numeric,
+            master_commission numeric,
+            partner_commission_anterior numeric,
+            master_commission_anterior numeric
+      )
+     order by id;
+
+    create temporary table _recalculo_ajustes on commit drop as
+    with alteradas as (
+        update sales s
+           set partner_commission = r.partner_commission,
+               master_commission = r.master_commission
+          from _recalculo r
+         where s.id = r.id
+           and s.partner_commission is not distinct from r.partner_commission_anterior
+           and s.master_commission is not distinct from r.master_commission_anterior
+        returning s.partner_id,
+                  r.partner_commission - coalesce(r.partner_commission_anterior, 0) as delta
+    )
+    select partner_id, count(*) as vendas, sum(delta) as delta
+      from alteradas
+     group by partner_id;
+
+    select coalesce(sum(vendas), 0), coalesce(sum(delta) filter (where partner_id is not null), 0)
+      into v_atualizadas, v_ajuste
+      from _recalculo_ajustes;
+
+    insert into partner_ledger (partner_id, tipo, total_generated, available_balance)
+    select partner_id, 'ajuste', delta, delta
+      from _recalculo_ajustes
+     where partner_id is not null
+       and delta <> 0;
+
+    get diagnostics v_saldos = row_count;
+
+    return jsonb_build_object(
+        'recebidas', v_recebidos,
+        'atualizadas', v_atualizadas,
+        'ignoradas', v_recebidos - v_atualizadas,
+        'saldos_ajustados', v_saldos,
+        'ajuste_total', v_ajuste
+    );
+end;
+$$;
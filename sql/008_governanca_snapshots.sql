@@ -0,0 +1,26 @@
+-- 008_governanca_snapshots.sql
+-- Reconstrução do estado de governança (caixa lógico / risco) no boot.
+--
+-- eventos_financeiros ganha uma sequência monotônica (keyset da reconstrução)
+-- e o instante de gravação no banco. Linhas existentes recebem seq na ordem
+-- física da tabela e registrado_em = momento da migração.
+--
+-- governanca_snapshots: estado dobrado até ultimo_seq. O boot parte do
+-- snapshot mais recente e reaplica só os eventos com seq > ultimo_seq.
+
+alter table eventos_financeiros
+    add column if not exists seq bigint generated by default as identity;
+
+alter table eventos_financeiros
+    add column if not exists registrado_em timestamptz not null default now();
+
+create unique index if not exists eventos_financeiros_seq_uq
+    on eventos_financeiros (seq);
+
+create table if not exists governanca_snapshots (
+    id bigserial primary key,
+    ultimo_seq bigint not null,
+    eventos bigint not null,
+    estado jsonb not null,
+    criado_em timestamptz not null default now()
+);
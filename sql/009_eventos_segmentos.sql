@@ -0,0 +1,10 @@
+-- 009_eventos_segmentos.sql
+-- Eventos legados gravados em segmentos locais (segmentos_eventos.py) e
+-- enviados em massa depois. Cada evento nasce com um evento_id; o envio
+-- faz upsert ignorando duplicatas, então reenviar um segmento é seguro.
+
+alter table eventos_financeiros
+    add column if not exists evento_id uuid;
+
+create unique index if not exists eventos_financeiros_evento_id_uq
+    on eventos_financeiros (evento_id);
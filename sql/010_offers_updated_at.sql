@@ -0,0 +1,26 @@
+-- 010_offers_updated_at.sql
+-- Marca d'água do índice de ofertas em memória (indice_ofertas.py): toda
+-- alteração em offers avança updated_at, inclusive mudança de status, e a
+-- recarga incremental lê só as linhas com updated_at após a última vista.
+
+alter table offers
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists offers_updated_at_idx
+    on offers (updated_at);
+
+create or replace function offers_tocar_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+drop trigger if exists offers_updated_at on offers;
+
+create trigger offers_updated_at
+    before update on offers
+    for each row execute function offers_tocar_updated_at();
@@ -0,0 +1,26 @@
+-- 011_produtos_gul_id.sql
+-- /go/{gul_id} procurava o produto com gul LIKE '%<id>': curinga à esquerda,
+-- varredura completa de produtos a cada clique. O id curto do GUL
+-- ("/go/<gul_id>") vira coluna gerada e indexada: busca por igualdade.
+--
+-- updated_at: marca d'água do índice em memória (indices_redirect.IndiceGul).
+
+alter table produtos
+    add column if not exists gul_id text
+    generated always as (substring(gul from '[^/]+$')) stored;
+
+create index if not exists produtos_gul_id_idx
+    on produtos (gul_id);
+
+alter table produtos
+    add column if not exists updated_at timestamptz not null default now();
+
+create index if not exists produtos_updated_at_idx
+    on produtos (updated_at);
+
+drop trigger if exists produtos_updated_at on produtos;
+
+-- Mesma função de sql/010_offers_updated_at.sql
+create trigger produtos_updated_at
+    before update on produtos
+    for each row execute function offers_tocar_updated_at();
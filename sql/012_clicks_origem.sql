@@ -0,0 +1,7 @@
+-- 012_clicks_origem.sql
+-- Cliques da ponte de aquisição (/go/eduzz/produtividade) entram em clicks
+-- pelo mesmo coletor em lote do /go. origem (ex: google_ads) é lida por
+-- interpretar_contexto_clique no /go/caminho.
+
+alter table clicks
+    add column if not exists origem text;
@@ -0,0 +1,10 @@
+-- 013_tabela_redirects.sql
+-- Tabela de redirects compilada em arquivo mmap (tabela_redirects.py):
+-- o compilador acompanha go_tracking de forma incremental pela data de
+-- criação (o link de destino de um go_id não muda depois de gerado).
+
+alter table go_tracking
+    add column if not exists criado_em timestamptz not null default now();
+
+create index if not exists go_tracking_criado_em_idx
+    on go_tracking (criado_em);
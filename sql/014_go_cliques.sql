@@ -0,0 +1,22 @@
+-- 014_go_cliques.sql
+-- Cliques dos go_ids assinados (tokens_rastreio.py, GO_TOKENS_ASSINADOS=1).
+-- O token carrega dor, solução e destino; não existe linha em go_tracking
+-- a marcar como clicada. Cada clique vira uma linha aqui, gravada em massa
+-- pelo coletor de cliques. go_id é a assinatura do token (identifica a
+-- recomendação sem repetir a carga).
+
+create table if not exists go_cliques (
+    id bigint generated always as identity primary key,
+    go_id text not null,
+    dor_id text not null,
+    solucao_id text not null,
+    link_destino text not null,
+    emitido_em timestamptz not null,
+    clicado_em timestamptz not null default now()
+);
+
+create index if not exists go_cliques_go_id_idx
+    on go_cliques (go_id);
+
+create index if not exists go_cliques_clicado_em_idx
+    on go_cliques (clicado_em);
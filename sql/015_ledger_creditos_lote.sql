@@ -0,0 +1,30 @@
+-- 015_ledger_creditos_lote.sql
+-- Créditos de venda do agregador de saldos (agregador_saldos.py) em uma
+-- chamada por parceiro por janela, mas com um lançamento por venda e a
+-- referência de cada uma (chave da venda). Reenvio da janela, retry do
+-- pipeline ou reconciliação de venda já gravada não creditam duas vezes.
+--
+-- p_itens: [{"referencia": "<platform>:<external_sale_id>" | null, "valor": "12.34"}, ...]
+-- Retorna quantos lançamentos foram inseridos (duplicatas ignoradas).
+
+create or replace function lancar_comissoes(
+    p_partner_id text,
+    p_itens jsonb
+)
+returns integer
+language sql
+as $$
+    with inseridos as (
+        insert into partner_ledger (partner_id, tipo, referencia, total_generated, available_balance)
+        select
+            p_partner_id,
+            'credito',
+            item ->> 'referencia',
+            (item ->> 'valor')::numeric,
+            (item ->> 'valor')::numeric
+        from jsonb_array_elements(p_itens) as item
+        on conflict (tipo, referencia) where referencia is not null do nothing
+        returning 1
+    )
+    select count(*)::integer from inseridos;
+$$;
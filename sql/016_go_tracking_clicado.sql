@@ -0,0 +1,30 @@
+-- 016_go_tracking_clicado.sql
+-- O /go/{go_id} deixa de fazer UPDATE go_tracking a cada clique: o clique
+-- entra em go_cliques pelo coletor em lote (sql/014_go_cliques.sql) e este
+-- trigger marca go_tracking.clicado uma vez por lote inserido. go_id de
+-- token assinado (não UUID) não corresponde a linha em go_tracking.
+
+create or replace function go_cliques_marcar_clicado()
+returns trigger
+language plpgsql
+as $$
+begin
+    update go_tracking
+       set clicado = true
+     where id in (
+               select n.go_id::uuid
+                 from novos n
+                where n.go_id ~* '^[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}$'
+           )
+       and clicado is distinct from true;
+    return null;
+end;
+$$;
+
+drop trigger if exists go_cliques_marcar_clicado on go_cliques;
+
+create trigger go_cliques_marcar_clicado
+    after insert on go_cliques
+    referencing new table as novos
+    for each statement
+    execute function go_cliques_marcar_clicado();
@@ -0,0 +1,423 @@
+# tabela_redirects.py — Tabela de Redirects Compartilhada (arquivo mmap)
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# Com N workers, N cópias dos índices de offers / produtos / go_tracking.
+# Aqui UM compilador por host exporta todos os redirects ativos para um
+# arquivo de hash com endereçamento aberto; cada worker mapeia o arquivo
+# (mmap, páginas compartilhadas pelo page cache) e consulta sem copiar.
+# Memória por host constante, qualquer que seja o número de workers.
+#
+# FORMATO (little-endian):
+#   cabeçalho  "<4sIIQ"   → b"RDT1", capacidade (potência de 2), quantidade, versão
+#   slots      "<QIHBxI"  → hash64, deslocamento, tamanho da chave, tipo (0 = vazio), tamanho do valor
+#   dados      chave + valor (JSON) de cada entrada, a partir do deslocamento
+# Sondagem linear; ocupação máxima de 50%.
+#
+# TROCA ATÔMICA: o compilador grava <arquivo>.tmp e faz os.replace. Os
+# workers verificam o inode a cada REDIRECTS_VERIFICAR_S e remapeiam; a
+# versão antiga continua válida para quem ainda a lê.
+#
+# COMPILADOR: o worker que obtém o flock de <arquivo>.compilador. Mantém
+# IndiceOfertas / IndiceGul / IndiceGoTracking (indices_redirect.py) e
+# regrava o arquivo quando algum muda. Invalidações de qualquer worker
+# chegam por <arquivo>.invalidacoes.
+#
+# go_tracking: só a janela recente (INDICES_GO_JANELA_S) entra na tabela, e
+# links novos (a cada /recomendar) só recompilam a cada REDIRECTS_COMPILAR_GO_S;
+# até lá o go_id novo resolve pelo banco. Mudança em offers / produtos ou
+# invalidação explícita recompila no ciclo normal.
+#
+# PULSO: a cada ciclo com todos os índices frescos o compilador toca
+# <arquivo>.pulso. Tabela com pulso recente (REDIRECTS_FRESCA_S) é completa
+# para offers e GULs: falta nela é ausência, sem consulta ao banco.
+
+import os
+import mmap
+import time
+import fcntl
+import struct
+import hashlib
+import threading
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from supabase import Client
+
+import codec_json
+from estado_compartilhado import arquivo_padrao
+
+# ======================================================
+# CONFIGURAÇÕES
+# ======================================================
+
+# Arquivo padrão por aplicação e processo-pai (como ESTADO_GLOBAL_ARQUIVO): os
+# workers de um mesmo uvicorn/gunicorn compartilham a tabela; outro deploy ou
+# outro ambiente no mesmo host (mesmo com pai 1, sob systemd ou container) não
+# disputa o compilador nem lê a tabela alheia.
+REDIRECTS_ARQUIVO = os.getenv("REDIRECTS_ARQUIVO", arquivo_padrao("robo_redirects", ".rdt"))
+REDIRECTS_COMPILAR_S = float(os.getenv("REDIRECTS_COMPILAR_S", "1"))
+REDIRECTS_VERIFICAR_S = float(os.getenv("REDIRECTS_VERIFICAR_S", "1"))
+REDIRECTS_COMPILAR_GO_S = float(os.getenv("REDIRECTS_COMPILAR_GO_S", "30"))
+REDIRECTS_FRESCA_S = float(os.getenv("REDIRECTS_FRESCA_S", "30"))
+
+MAGICO = b"RDT1"
+_CABECALHO = struct.Struct("<4sIIQ")
+_SLOT = struct.Struct("<QIHBxI")
+
+# Espaços de chave
+OFERTA = 1
+GUL = 2
+GO = 3
+
+# Colunas exportadas por tipo (o worker recebe o mesmo dicionário que viria do banco)
+COLUNAS = {
+    OFERTA: ("id", "slug", "url_afiliado"),
+    GUL: ("id", "nome", "link_afiliado", "plataforma", "gul"),
+    GO: ("id", "dor_id", "solucao_id", "link_destino", "criado_em"),
+}
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[REDIRECTS] [{nivel}] {mensagem}")
+
+
+def _hash(tipo: int, chave: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(bytes((tipo,)) + chave, digest_size=8).digest(), "little")
+
+
+# ======================================================
+# ESCRITA
+# ======================================================
+
+def gravar_tabela(caminho: str, entradas: Iterable[Tuple[int, str, Dict[str, Any]]]) -> int:
+    """Compila (tipo, chave, valor) em <caminho>.tmp e troca atomicamente. Retorna quantas entradas."""
+    itens = [(tipo, chave.encode(), codec_json.dumps(valor)) for tipo, chave, valor in entradas]
+
+    capacidade = 8
+    while capacidade < len(itens) * 2:
+        capacidade *= 2
+    mascara = capacidade - 1
+
+    slots = [None] * capacidade
+    dados = bytearray()
+    inicio_dados = _CABECALHO.size + capacidade * _SLOT.size
+    for tipo, chave, valor in itens:
+        h = _hash(tipo, chave)
+        i = h & mascara
+        while slots[i] is not None:
+            i = (i + 1) & mascara
+        slots[i] = (h, inicio_dados + len(dados), len(chave), tipo, len(valor))
+        dados += chave
+        dados += valor
+
+    vazio = _SLOT.pack(0, 0, 0, 0, 0)
+    tmp = f"{caminho}.{os.getpid()}.tmp"
+    with open(tmp, "wb") as f:
+        f.write(_CABECALHO.pack(MAGICO, capacidade, len(itens), time.time_ns()))
+        f.write(b"".join(_SLOT.pack(*s) if s is not None else vazio for s in slots))
+        f.write(dados)
+    os.replace(tmp, caminho)
+    return len(itens)
+
+
+# ======================================================
+# LEITURA (WORKERS)
+# ======================================================
+
+class TabelaRedirects:
+
+    def __init__(
+        self,
+        caminho: str = REDIRECTS_ARQUIVO,
+        *,
+        verificar_s: float = REDIRECTS_VERIFICAR_S,
+        fresca_s: float = REDIRECTS_FRESCA_S
+    ):
+        self.caminho = caminho
+        self.caminho_pulso = caminho + ".pulso"
+        self.verificar_s = verificar_s
+        self.fresca_s = fresca_s
+        self._pulso_em = 0.0
+
+        # (mmap, capacidade, inode) — trocados juntos, por referência
+        self._atual: Optional[Tuple[mmap.mmap, int, int]] = None
+        self._verificado_em = 0.0
+        self._lock = threading.Lock()
+
+        self.versao = 0
+        self.entradas = 0
+        self.acertos = 0
+        self.faltas = 0
+        self.trocas = 0
+        # Por espaço de chave (OFERTA / GUL / GO)
+        self.acertos_tipo = {OFERTA: 0, GUL: 0, GO: 0}
+        self.faltas_tipo = {OFERTA: 0, GUL: 0, GO: 0}
+
+        self._verificar()
+
+    def _verificar(self):
+        with self._lock:
+            self._verificado_em = time.monotonic()
+            try:
+                self._pulso_em = os.stat(self.caminho_pulso).st_mtime
+            except FileNotFoundError:
+                self._pulso_em = 0.0
+            try:
+                inode = os.stat(self.caminho).st_ino
+            except FileNotFoundError:
+                return
+            if self._atual is not None and self._atual[2] == inode:
+                return
+            with open(self.caminho, "rb") as f:
+                mapa = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magico, capacidade, quantidade, versao = _CABECALHO.unpack_from(mapa, 0)
+            if magico != MAGICO:
+                log("WARN", f"{self.caminho} não é uma tabela de redirects")
+                mapa.close()
+                return
+            # Mapa anterior fica com quem ainda o referencia (coletado depois)
+            self._atual = (mapa, capacidade, inode)
+            self.versao, self.entradas = versao, quantidade
+            self.trocas += 1
+
+    def buscar(self, tipo: int, chave: str) -> Optional[Dict[str, Any]]:
+        if time.monotonic() - self._verificado_em >= self.verificar_s:
+            self._verificar()
+
+        atual = self._atual
+        if atual is None:
+            self.faltas += 1
+            self.faltas_tipo[tipo] += 1
+            return None
+        mapa, capacidade, _ = atual
+
+        bruta = chave.encode()
+        h = _hash(tipo, bruta)
+        mascara = capacidade - 1
+        i = h & mascara
+        while True:
+            h_slot, deslocamento, tam_chave, tipo_slot, tam_valor = _SLOT.unpack_from(
+                mapa, _CABECALHO.size + i * _SLOT.size
+            )
+            if tipo_slot == 0:
+                self.faltas += 1
+                self.faltas_tipo[tipo] += 1
+                return None
+            if h_slot == h and tipo_slot == tipo and mapa[deslocamento:deslocamento + tam_chave] == bruta:
+                self.acertos += 1
+                self.acertos_tipo[tipo] += 1
+                inicio = deslocamento + tam_chave
+                return codec_json.loads(mapa[inicio:inicio + tam_valor])
+            i = (i + 1) & mascara
+
+    @property
+    def disponivel(self) -> bool:
+        return self._atual is not None
+
+    @property
+    def fresca(self) -> bool:
+        """Compilador vivo e com índices em dia: falta de OFERTA/GUL é ausência."""
+        if time.monotonic() - self._verificado_em >= self.verificar_s:
+            self._verificar()
+        return self.disponivel and time.time() - self._pulso_em <= self.fresca_s
+
+    def status_tipo(self, tipo: int) -> Dict[str, Any]:
+        acertos, faltas = self.acertos_tipo[tipo], self.faltas_tipo[tipo]
+        return {
+            "acertos": acertos,
+            "faltas": faltas,
+            "taxa_acerto": round(acertos / (acertos + faltas), 4) if acertos + faltas else None,
+        }
+
+    def status(self) -> Dict[str, Any]:
+        consultas = self.acertos + self.faltas
+        return {
+            "arquivo": self.caminho,
+            "disponivel": self.disponivel,
+            "fresca": self.fresca,
+            "versao": self.versao,
+            "entradas": self.entradas,
+            "bytes": len(self._atual[0]) if self._atual else 0,
+            "trocas": self.trocas,
+            "acertos": self.acertos,
+            "faltas": self.faltas,
+            "taxa_acerto": round(self.acertos / consultas, 4) if consultas else None,
+        }
+
+
+# ======================================================
+# COMPILADOR (UM POR HOST)
+# ======================================================
+
+class CompiladorRedirects:
+
+    def __init__(
+        self,
+        supabase: Client,
+        caminho: str = REDIRECTS_ARQUIVO,
+        *,
+        intervalo_s: float = REDIRECTS_COMPILAR_S,
+        intervalo_go_s: float = REDIRECTS_COMPILAR_GO_S
+    ):
+        self.supabase = supabase
+        self.caminho = caminho
+        self.intervalo_s = intervalo_s
+        self.intervalo_go_s = intervalo_go_s
+        self.caminho_invalidacoes = caminho + ".invalidacoes"
+        self.caminho_pulso = caminho + ".pulso"
+
+        self._trava_papel = None
+        self._indices: Dict[int, Any] = {}
+        self._versoes: Optional[Dict[int, int]] = None
+        self._compilado_em = 0.0
+        self._parar = threading.Event()
+
+        self.compilacoes = 0
+        self.adiadas = 0
+        self.entradas = 0
+        self.segundos_ultima = 0.0
+        self.falhas = 0
+
+        self._tentar_assumir()
+        self._thread = threading.Thread(target=self._loop, name="compilador-redirects", daemon=True)
+        self._thread.start()
+
+    @property
+    def ativo(self) -> bool:
+        """True no worker que compila para o host."""
+        return self._trava_papel is not None
+
+    def _tentar_assumir(self):
+        trava = open(self.caminho + ".compilador", "w")
+        try:
+            fcntl.flock(trava, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            trava.close()
+            return
+
+        from indices_redirect import IndiceGoTracking, IndiceGul, IndiceOfertas
+
+        self._trava_papel = trava
+        self._indices = {
+            OFERTA: IndiceOfertas(self.supabase),
+            GUL: IndiceGul(self.supabase),
+            GO: IndiceGoTracking(self.supabase),
+        }
+        log("INFO", f"Worker {os.getpid()} compila {self.caminho}")
+        self.compilar()
+
+    # --------------------------------------------------
+    # COMPILAÇÃO
+    # --------------------------------------------------
+
+    def compilar(self) -> int:
+        inicio = time.perf_counter()
+        versoes = self._versoes_indices()
+
+        entradas = []
+        for tipo, indice in self._indices.items():
+            colunas = COLUNAS[tipo]
+            for chave, linha in indice.linhas().items():
+                entradas.append((tipo, str(chave), {c: linha.get(c) for c in colunas}))
+
+        self.entradas = gravar_tabela(self.caminho, entradas)
+        self._versoes = versoes
+        self._compilado_em = time.monotonic()
+        self.compilacoes += 1
+        self.segundos_ultima = round(time.perf_counter() - inicio, 3)
+        return self.entradas
+
+    def _versoes_indices(self) -> Dict[int, int]:
+        return {tipo: indice.versao for tipo, indice in self._indices.items()}
+
+    def _ler_invalidacoes(self) -> Iterable[Tuple[int, Optional[str]]]:
+        """Consome <arquivo>.invalidacoes (linhas "tipo\\tchave"; chave vazia = tudo)."""
+        try:
+            arquivo = open(self.caminho_invalidacoes, "r+", encoding="utf-8")
+        except FileNotFoundError:
+            return []
+        with arquivo:
+            fcntl.flock(arquivo, fcntl.LOCK_EX)
+            linhas = arquivo.read().splitlines()
+            arquivo.truncate(0)
+        pedidos = []
+        for linha in linhas:
+            tipo, _, chave = linha.partition("\t")
+            if tipo.isdigit():
+                pedidos.append((int(tipo), chave or None))
+        return pedidos
+
+    def invalidar(self, tipo: int, chave: Optional[str] = None):
+        """Qualquer worker: pede ao compilador para reler a chave (ou o tipo inteiro)."""
+        with open(self.caminho_invalidacoes, "a", encoding="utf-8") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            f.write(f"{tipo}\t{chave or ''}\n")
+
+    def _ciclo(self):
+        if not self.ativo:
+            self._tentar_assumir()
+            return
+        invalidado = False
+        for tipo, chave in self._ler_invalidacoes():
+            indice = self._indices.get(tipo)
+            if indice is not None:
+                indice.invalidar(chave)
+                invalidado = True
+
+        versoes = self._versoes_indices()
+        if versoes != self._versoes:
+            so_go = self._versoes is not None and all(
+                versao == self._versoes.get(tipo) for tipo, versao in versoes.items() if tipo != GO
+            )
+            if so_go and not invalidado and time.monotonic() - self._compilado_em < self.intervalo_go_s:
+                self.adiadas += 1
+            else:
+                self.compilar()
+        self._pulsar()
+
+    def _pulsar(self):
+        """Arquivo em dia com offers / produtos e índices frescos: toca <arquivo>.pulso."""
+        if all(indice.fresco for indice in self._indices.values()):
+            with open(self.caminho_pulso, "a"):
+                os.utime(self.caminho_pulso)
+
+    def _ha_invalidacoes(self) -> bool:
+        try:
+            return os.path.getsize(self.caminho_invalidacoes) > 0
+        except FileNotFoundError:
+            return False
+
+    def _loop(self):
+        # Invalidação pendente é atendida em até 100ms; o resto a cada intervalo_s
+        ultima = 0.0
+        while not self._parar.wait(0.1):
+            urgente = self.ativo and self._ha_invalidacoes()
+            if not urgente and time.monotonic() - ultima < self.intervalo_s:
+                continue
+            ultima = time.monotonic()
+            try:
+                self._ciclo()
+            except Exception as e:
+                self.falhas += 1
+                log("WARN", f"Falha ao compilar redirects: {e}")
+
+    def encerrar(self):
+        self._parar.set()
+        self._thread.join(timeout=5)
+        for indice in self._indices.values():
+            indice.encerrar()
+        if self._trava_papel is not None:
+            self._trava_papel.close()
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "compilador": self.ativo,
+            "intervalo_s": self.intervalo_s,
+            "intervalo_go_s": self.intervalo_go_s,
+            "compilacoes": self.compilacoes,
+            "adiadas": self.adiadas,
+            "entradas": self.entradas,
+            "segundos_ultima": self.segundos_ultima,
+            "indices": {t: indice.status() for t, indice in self._indices.items()},
+            "falhas": self.falhas,
+        }
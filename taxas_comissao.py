@@ -0,0 +1,184 @@
+# taxas_comissao.py — Resolução de Taxas de Comissão (cache em memória)
+# ROBO GLOBAL AI
+#
+# Tabela commission_rates (sql/006_commission_rates.sql) carregada inteira
+# em um dicionário (platform, product_id, partner_id) → percentual.
+# Nenhuma ida ao banco no caminho da venda.
+#
+# Resolução: combinação exata primeiro, depois a mais específica disponível
+# (parceiro > produto > plataforma), por fim PERCENTUAL_PARCEIRO_PADRAO.
+# Recarga a cada TAXAS_TTL_S em segundo plano (a venda nunca espera) ou
+# imediata via invalidar(). Falha de recarga mantém as taxas atuais.
+
+import os
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+from supabase import Client
+
+PERCENTUAL_PARCEIRO_PADRAO = 0.60
+
+TAXAS_TTL_S = float(os.getenv("TAXAS_TTL_S", "300"))
+TAXAS_PAGINA = 1000
+
+Escopo = Tuple[Optional[str], Optional[str], Optional[str]]
+
+# (platform, product_id, partner_id) — do mais específico para o mais geral
+ESPECIFICIDADE: Tuple[Tuple[bool, bool, bool], ...] = (
+    (True, True, True),
+    (False, True, True),
+    (True, False, True),
+    (False, False, True),
+    (True, True, False),
+    (False, True, False),
+    (True, False, False),
+    (False, False, False),
+)
+
+
+def log(nivel: str, mensagem: str):
+    print(f"[TAXAS] [{nivel}] {mensagem}")
+
+
+def _texto(valor: Any) -> Optional[str]:
+    return None if valor is None or valor == "" else str(valor)
+
+
+class TabelaTaxas:
+
+    def __init__(
+        self,
+        supabase: Client,
+        *,
+        ttl_s: float = TAXAS_TTL_S,
+        padrao: float = PERCENTUAL_PARCEIRO_PADRAO,
+        carregar: bool = True
+    ):
+        self.supabase = supabase
+        self.ttl_s = ttl_s
+        self.padrao = padrao
+
+        # (índice, máscaras presentes) — trocados juntos, por referência, a cada recarga
+        self._tabela: Tuple[Dict[Escopo, float], Tuple[Tuple[bool, bool, bool], ...]] = ({}, ())
+
+        self._lock = threading.Lock()
+        self._renovando = False
+        self._expira_em = 0.0
+        self.carregado_em: Optional[float] = None
+
+        self.consultas = 0
+        self.especificas = 0
+        self.recargas = 0
+        self.falhas = 0
+
+        if carregar:
+            self.carregar()
+
+    # --------------------------------------------------
+    # CARGA
+    # --------------------------------------------------
+
+    def _ler_tabela(self) -> Dict[Escopo, float]:
+        indice: Dict[Escopo, float] = {}
+        ultimo_id = None
+        while True:
+            query = (
+                self.supabase
+                .table("commission_rates")
+                .select("id,platform,product_id,partner_id,percentual_parceiro")
+                .eq("active", True)
+                .order("id")
+                .limit(TAXAS_PAGINA)
+            )
+            if ultimo_id is not None:
+                query = query.gt("id", ultimo_id)
+
+            linhas = query.execute().data or []
+            for linha in linhas:
+                escopo = (_texto(linha.get("platform")), _texto(linha.get("product_id")), _texto(linha.get("partner_id")))
+                indice[escopo] = float(linha["percentual_parceiro"])
+
+            if len(linhas) < TAXAS_PAGINA:
+                return indice
+            ultimo_id = linhas[-1]["id"]
+
+    def carregar(self) -> int:
+        """Lê commission_rates inteira e troca o índice. Retorna quantas taxas ficaram ativas."""
+        try:
+            indice = self._ler_tabela()
+        except Exception as e:
+            self.falhas += 1
+            log("WARN", f"Falha ao carregar commission_rates; mantendo {len(self._tabela[0])} taxas atuais: {e}")
+            with self._lock:
+                self._expira_em = time.monotonic() + self.ttl_s
+                self._renovando = False
+            return len(self._tabela[0])
+
+        presentes = {tuple(v is not None for v in escopo) for escopo in indice}
+        mascaras = tuple(m for m in ESPECIFICIDADE if m in presentes)
+
+        with self._lock:
+            self._tabela = (indice, mascaras)
+            self.carregado_em = time.time()
+            self._expira_em = time.monotonic() + self.ttl_s
+            self._renovando = False
+            self.recargas += 1
+        return len(indice)
+
+    def invalidar(self) -> int:
+        """Recarga imediata (após alterar commission_rates)."""
+        return self.carregar()
+
+    def _renovar_se_expirado(self):
+        if time.monotonic() < self._expira_em:
+            return
+        with self._lock:
+            if self._renovando or time.monotonic() < self._expira_em:
+                return
+            self._renovando = True
+        threading.Thread(target=self.carregar, name="taxas-comissao", daemon=True).start()
+
+    # --------------------------------------------------
+    # RESOLUÇÃO (CAMINHO DA VENDA)
+    # --------------------------------------------------
+
+    def percentual(
+        self,
+        platform: Optional[str],
+        product_id: Optional[Any],
+        partner_id: Optional[str]
+    ) -> float:
+        self._renovar_se_expirado()
+        self.consultas += 1
+
+        indice, mascaras = self._tabela
+        valores = (_texto(platform), _texto(product_id), _texto(partner_id))
+
+        for mascara in mascaras:
+            if any(usar and v is None for v, usar in zip(valores, mascara)):
+                continue
+            escopo = tuple(v if usar else None for v, usar in zip(valores, mascara))
+            taxa = indice.get(escopo)
+            if taxa is not None:
+                if any(mascara):
+                    self.especificas += 1
+                return taxa
+
+        return self.padrao
+
+    # --------------------------------------------------
+    # MÉTRICAS
+    # --------------------------------------------------
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "taxas": len(self._tabela[0]),
+            "padrao": self.padrao,
+            "ttl_s": self.ttl_s,
+            "idade_s": round(time.time() - self.carregado_em, 1) if self.carregado_em else None,
+            "consultas": self.consultas,
+            "especificas": self.especificas,
+            "recargas": self.recargas,
+            "falhas": self.falhas,
+        }
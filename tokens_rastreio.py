@@ -0,0 +1,202 @@
+# tokens_rastreio.py — Tokens de Rastreamento Assinados (/recomendar → /go/{go_id})
+# ROBO GLOBAL AI
+#
+# OBJETIVO:
+# O go_id deixa de ser chave de uma linha em go_tracking e passa a carregar
+# o próprio rastreio: dor_id, solucao_id, destino e instante de emissão,
+# assinados com HMAC-SHA256. Emitir não grava nada; o redirect valida só
+# com CPU (sem ida ao banco) e o clique segue pelo coletor em lote.
+#
+# FORMATO: <carga base64url>.<assinatura base64url>
+# - carga: versão (1 byte) + emitido_em (segundos, 4 bytes) + dor_id +
+#   solucao_id (16 bytes quando UUID, texto caso contrário) + destino
+# - assinatura: HMAC-SHA256 da carga truncado em GO_TOKENS_BYTES_ASSINATURA
+# O "." nunca aparece em GUL nem em UUID: o /go distingue o formato pelo texto.
+#
+# CONFIGURAÇÃO:
+#   GO_TOKENS_SEGREDO            → segredo atual (obrigatório)
+#   GO_TOKENS_SEGREDO_ANTERIOR   → segredo anterior (aceito durante a rotação)
+#   GO_TOKENS_VALIDADE_S         → validade do token (0 = sem expiração)
+
+import os
+import hmac
+import time
+import uuid
+import base64
+import struct
+import hashlib
+import binascii
+import threading
+from typing import Any, Dict, List, Optional
+
+GO_TOKENS_VALIDADE_S = int(os.getenv("GO_TOKENS_VALIDADE_S", str(90 * 24 * 3600)))
+GO_TOKENS_BYTES_ASSINATURA = 16
+
+_VERSAO = 1
+_CABECALHO = struct.Struct(">BI")
+_CAMPO_UUID = 0x01
+_CAMPO_TEXTO = 0x00
+
+
+def _b64(dados: bytes) -> str:
+    return base64.urlsafe_b64encode(dados).rstrip(b"=").decode("ascii")
+
+
+def _de_b64(texto: str) -> bytes:
+    return base64.urlsafe_b64decode(texto + "=" * (-len(texto) % 4))
+
+
+def _codificar_campo(valor: str) -> bytes:
+    """UUID canônico vira 16 bytes; qualquer outro id vai como texto (até 255 bytes)."""
+    try:
+        if str(uuid.UUID(valor)) == valor:
+            return bytes([_CAMPO_UUID]) + uuid.UUID(valor).bytes
+    except ValueError:
+        pass
+    bruto = valor.encode("utf-8")
+    if len(bruto) > 255:
+        raise ValueError("id longo demais para o token de rastreamento")
+    return bytes([_CAMPO_TEXTO, len(bruto)]) + bruto
+
+
+def _decodificar_campo(carga: bytes, pos: int):
+    tipo = carga[pos]
+    if tipo == _CAMPO_UUID:
+        return str(uuid.UUID(bytes=carga[pos + 1:pos + 17])), pos + 17
+    if tipo == _CAMPO_TEXTO:
+        tamanho = carga[pos + 1]
+        return carga[pos + 2:pos + 2 + tamanho].decode("utf-8"), pos + 2 + tamanho
+    raise ValueError("campo desconhecido")
+
+
+class TokensRastreio:
+
+    def __init__(
+        self,
+        segredo_atual: str,
+        segredo_anterior: Optional[str] = None,
+        *,
+        validade_s: int = GO_TOKENS_VALIDADE_S
+    ):
+        if not segredo_atual:
+            raise RuntimeError("GO_TOKENS_SEGREDO não configurado")
+
+        # Estados HMAC pré-computados (mesmo esquema de assinaturas.py): copy() + update() por token
+        self._estados = [
+            hmac.new(segredo.encode(), digestmod=hashlib.sha256)
+            for segredo in (segredo_atual, segredo_anterior)
+            if segredo
+        ]
+        self.validade_s = validade_s
+        self._lock = threading.Lock()
+
+        self.emitidos = 0
+        self.validos = 0
+        self.validos_segredo_anterior = 0
+        self.invalidos = 0
+        self.expirados = 0
+
+    @classmethod
+    def do_ambiente(cls) -> "TokensRastreio":
+        return cls(
+            os.getenv("GO_TOKENS_SEGREDO", ""),
+            os.getenv("GO_TOKENS_SEGREDO_ANTERIOR", "")
+        )
+
+    def _assinar(self, estado, carga: bytes) -> bytes:
+        calculado = estado.copy()
+        calculado.update(carga)
+        return calculado.digest()[:GO_TOKENS_BYTES_ASSINATURA]
+
+    # --------------------------------------------------
+    # EMISSÃO
+    # --------------------------------------------------
+
+    def emitir(self, dor_id: str, solucao_id: str, destino: str, emitido_em: Optional[int] = None) -> str:
+        carga = (
+            _CABECALHO.pack(_VERSAO, int(time.time() if emitido_em is None else emitido_em))
+            + _codificar_campo(str(dor_id))
+            + _codificar_campo(str(solucao_id))
+            + destino.encode("utf-8")
+        )
+        token = f"{_b64(carga)}.{_b64(self._assinar(self._estados[0], carga))}"
+        with self._lock:
+            self.emitidos += 1
+        return token
+
+    def emitir_lote(self, itens: List[Dict[str, Any]]) -> List[str]:
+        """itens: dicts com dor_id, solucao_id e destino. Mesmo instante de emissão para o lote."""
+        agora = int(time.time())
+        return [self.emitir(i["dor_id"], i["solucao_id"], i["destino"], agora) for i in itens]
+
+    # --------------------------------------------------
+    # VALIDAÇÃO (CAMINHO DO CLIQUE)
+    # --------------------------------------------------
+
+    def validar(self, token: str) -> Optional[Dict[str, Any]]:
+        """Rastreio contido no token; None para token adulterado, malformado ou expirado."""
+        resultado, rastreio = self._validar(token)
+        with self._lock:
+            if resultado == "ATUAL":
+                self.validos += 1
+            elif resultado == "ANTERIOR":
+                self.validos += 1
+                self.validos_segredo_anterior += 1
+            elif resultado == "EXPIRADO":
+                self.expirados += 1
+            else:
+                self.invalidos += 1
+        return rastreio
+
+    def _validar(self, token: str):
+        carga_b64, _, assinatura_b64 = token.partition(".")
+        try:
+            carga = _de_b64(carga_b64)
+            recebida = _de_b64(assinatura_b64)
+        except (binascii.Error, ValueError):
+            return "INVALIDO", None
+
+        resultado = "INVALIDO"
+        for i, estado in enumerate(self._estados):
+            if hmac.compare_digest(self._assinar(estado, carga), recebida):
+                resultado = "ATUAL" if i == 0 else "ANTERIOR"
+                break
+        if resultado == "INVALIDO":
+            return resultado, None
+
+        try:
+            versao, emitido_em = _CABECALHO.unpack_from(carga)
+            if versao != _VERSAO:
+                return "INVALIDO", None
+            dor_id, pos = _decodificar_campo(carga, _CABECALHO.size)
+            solucao_id, pos = _decodificar_campo(carga, pos)
+            destino = carga[pos:].decode("utf-8")
+        except (IndexError, ValueError, struct.error):
+            return "INVALIDO", None
+
+        if self.validade_s and time.time() - emitido_em > self.validade_s:
+            return "EXPIRADO", None
+
+        return resultado, {
+            "dor_id": dor_id,
+            "solucao_id": solucao_id,
+            "link_destino": destino,
+            "emitido_em": emitido_em,
+            # Assinatura identifica o token no registro do clique sem repetir a carga
+            "go_id": assinatura_b64,
+        }
+
+    # --------------------------------------------------
+    # MÉTRICAS
+    # --------------------------------------------------
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "segredos_ativos": len(self._estados),
+            "validade_s": self.validade_s,
+            "emitidos": self.emitidos,
+            "validos": self.validos,
+            "validos_segredo_anterior": self.validos_segredo_anterior,
+            "invalidos": self.invalidos,
+            "expirados": self.expirados,
+        }